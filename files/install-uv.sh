@@ -89,6 +89,7 @@ uv add \
   fastexcel \
   polars \
   connectorx \
+  adbc-driver-postgresql \
   --default-index https://pypi.org/simple/
 
 # Install math and simulation packages
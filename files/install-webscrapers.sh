@@ -17,7 +17,8 @@ crawl4ai-setup
 crawl4ai-doctor
 
 # install playwright (client only - server runs in Docker container)
-uv add playwright
+# httpx is used by cdp_client.py to probe the CDP endpoint without blocking
+uv add playwright httpx
 # Note: No need for playwright install or install-deps when using Docker container
 # The browser binaries will run in the container, not locally
 
@@ -40,6 +40,13 @@ echo "Installing PostgreSQL ${POSTGRES_VERSION}..."
 apt update
 apt install -y postgresql-${POSTGRES_VERSION} postgresql-contrib-${POSTGRES_VERSION}
 
+# Install PgBouncer (transaction pooling on port 6432, see pgbouncer.ini)
+echo "Installing PgBouncer..."
+apt install -y pgbouncer
+mkdir -p /etc/pgbouncer /var/log/pgbouncer
+chown -R postgres:postgres /etc/pgbouncer /var/log/pgbouncer
+chmod 750 /etc/pgbouncer /var/log/pgbouncer
+
 # Create required directories
 echo "Creating PostgreSQL directories..."
 mkdir -p /etc/postgresql/${POSTGRES_VERSION}/main/conf.d
@@ -101,6 +108,8 @@ fi
 # Create user and database
 echo "Creating PostgreSQL user and database..."
 su - postgres -c "PGPASSWORD=$(cat /tmp/pwfile) /usr/lib/postgresql/${POSTGRES_VERSION}/bin/psql -p 8765 --command \"CREATE USER ${NB_USER} WITH SUPERUSER PASSWORD '${PGPASSWORD}';\""
+# pg_stat_statements in template1 so every database created later has the view
+su - postgres -c "PGPASSWORD=$(cat /tmp/pwfile) /usr/lib/postgresql/${POSTGRES_VERSION}/bin/psql -p 8765 -d template1 --command \"CREATE EXTENSION IF NOT EXISTS pg_stat_statements;\""
 su - postgres -c "PGPASSWORD=$(cat /tmp/pwfile) /usr/lib/postgresql/${POSTGRES_VERSION}/bin/createdb -p 8765 -O ${NB_USER} rsm-docker"
 
 echo "Database and user created successfully"
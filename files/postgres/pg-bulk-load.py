@@ -0,0 +1,743 @@
+#!/usr/bin/env python3
+"""
+Bulk load a plain SQL dump into Postgres
+
+A faster replacement for `psql dbname < dump.sql` for the course databases:
+
+- the dump is read in chunks and split into statements without loading the
+  whole file into memory
+- INSERT ... VALUES statements are converted to COPY FROM STDIN batches and
+  existing COPY blocks are streamed as they are
+- batches for different tables are loaded over parallel connections
+- CREATE INDEX, primary/unique keys, foreign keys, triggers and sequence
+  setval calls are held back until all data is in, then indexes are built
+  in parallel (one connection per table) and constraints are added
+- rows/sec is reported for every table
+
+Works from a local file only (no network). Connection settings follow psql
+(-h, -p, -U and the PG* environment variables, including PGPASSWORD).
+
+    pg-bulk-load ~/sql_data/Northwind_DB_Dump.sql -d Northwind -h 127.0.0.1 -p 8765 -U jovyan
+    pg-bulk-load dump.sql --dry-run      # parse only, report tables and rows
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# statement kinds
+SESSION, DDL, BARRIER, INSERT, COPY, INDEX, CONSTRAINT, FINAL = (
+    "session",
+    "ddl",
+    "barrier",
+    "insert",
+    "copy",
+    "index",
+    "constraint",
+    "final",
+)
+
+SPECIAL = re.compile(r"""['";]|--|/\*|\$(?:[A-Za-z_][A-Za-z_0-9]*)?\$""")
+LEADING_COMMENTS = re.compile(r"\A(?:\s+|--[^\n]*(?:\n|\Z)|/\*.*?\*/)*", re.S)
+COPY_FROM_STDIN = re.compile(
+    r"COPY\s+(?P<table>(?:\"[^\"]+\"|[\w$]+)(?:\.(?:\"[^\"]+\"|[\w$]+))?)\s*"
+    r"(?P<columns>\([^)]*\))?\s+FROM\s+stdin\b",
+    re.I,
+)
+INSERT_HEAD = re.compile(
+    r"INSERT\s+INTO\s+(?P<table>(?:\"[^\"]+\"|[\w$]+)(?:\.(?:\"[^\"]+\"|[\w$]+))?)\s*"
+    r"(?P<columns>\([^)]*\))?\s*VALUES\s*",
+    re.I,
+)
+VALUE_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<str>'[^']*(?:''[^']*)*')
+      | (?P<null>NULL)\b
+      | (?P<bool>TRUE|FALSE)\b
+      | (?P<num>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+      | (?P<cast>::\s*[A-Za-z_][\w.]*(?:\s+(?:varying|precision|without\s+time\s+zone|with\s+time\s+zone))*(?:\s*\([\d,\s]*\))?(?:\[\])?)
+      | (?P<punct>[(),;])
+    )""",
+    re.I | re.X,
+)
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+# settings that change how COPY data is parsed or where names resolve; loading
+# waits for earlier batches before these change (others apply to new batches)
+DATA_SETTINGS = {
+    "search_path",
+    "standard_conforming_strings",
+    "client_encoding",
+    "datestyle",
+    "intervalstyle",
+    "timezone",
+    "bytea_output",
+    "session_replication_role",
+}
+
+
+def classify(sql):
+    """Return the statement kind for the loader"""
+    head = LEADING_COMMENTS.sub("", sql, count=1)
+    upper = head[:200].upper()
+    words = upper.split()
+    first = words[0] if words else ""
+
+    if first == "INSERT":
+        return INSERT
+    if first == "COPY" and COPY_FROM_STDIN.match(head):
+        return COPY
+    if first in ("SET", "RESET") or upper.startswith("SELECT PG_CATALOG.SET_CONFIG"):
+        return SESSION
+    if re.match(r"CREATE\s+(UNIQUE\s+)?INDEX\b", upper):
+        return INDEX
+    normalized = " ".join(head.upper().split())
+    if first == "ALTER" and " ADD CONSTRAINT " in normalized:
+        if "PRIMARY KEY" in normalized or " UNIQUE " in normalized or " UNIQUE(" in normalized:
+            return INDEX
+        return CONSTRAINT
+    # statements that need the deferred indexes, triggers or final sequence values
+    if (
+        re.match(r"CREATE\s+(CONSTRAINT\s+)?TRIGGER\b", upper)
+        or re.match(r"SELECT\s+(PG_CATALOG\.)?SETVAL\b", upper)
+        or re.match(r"COMMENT\s+ON\s+(INDEX|CONSTRAINT|TRIGGER)\b", upper)
+        or re.match(r"ALTER\s+INDEX\b", upper)
+        or first == "ALTER"
+        and any(
+            clause in normalized
+            for clause in (" CLUSTER ON ", " USING INDEX ", " ATTACH PARTITION ", " TRIGGER ")
+        )
+    ):
+        return FINAL
+    if first in ("UPDATE", "DELETE", "TRUNCATE", "SELECT", "DO", "CALL", "DROP") or (
+        first == "ALTER" and " OWNER TO " not in normalized
+    ):
+        return BARRIER
+    return DDL
+
+
+def setting_name(sql):
+    head = LEADING_COMMENTS.sub("", sql, count=1)
+    match = re.match(r"(?:SET\s+(?:SESSION\s+|LOCAL\s+)?|RESET\s+)([\w.]+)", head, re.I)
+    if match is None:
+        match = re.search(r"set_config\(\s*'([^']+)'", head, re.I)
+    return match.group(1).lower() if match else ""
+
+
+def index_table(sql):
+    """Table an index or table constraint belongs to, to build them per table"""
+    head = " ".join(LEADING_COMMENTS.sub("", sql, count=1).split())
+    match = re.search(r"\bON\s+(?:ONLY\s+)?([\w.\"$]+)", head, re.I)
+    if head.upper().startswith("ALTER"):
+        match = re.search(r"ALTER\s+TABLE\s+(?:ONLY\s+)?(?:IF\s+EXISTS\s+)?([\w.\"$]+)", head, re.I)
+    return match.group(1) if match else head
+
+
+def insert_to_copy(sql):
+    """Convert INSERT ... VALUES to (table, columns, COPY text lines)
+
+    Returns None for anything that is not plain literals (function calls,
+    DEFAULT, E'' strings, sub-selects, ON CONFLICT), which then runs as is.
+    """
+    head = LEADING_COMMENTS.sub("", sql, count=1)
+    match = INSERT_HEAD.match(head)
+    if not match:
+        return None
+    pos = match.end()
+    lines = []
+    row = []
+    depth = 0
+    expect_value = False
+    n = len(head)
+    while pos < n:
+        token = VALUE_TOKEN.match(head, pos)
+        if token is None:
+            if head[pos:].strip() == "":
+                break
+            return None
+        pos = token.end()
+        kind = token.lastgroup
+        value = token.group(kind)
+        if kind == "punct":
+            if value == "(":
+                if depth:
+                    return None
+                depth, row, expect_value = 1, [], True
+            elif value == ")":
+                if depth != 1 or expect_value and row:
+                    return None
+                depth = 0
+                lines.append("\t".join(row))
+            elif value == ",":
+                if depth:
+                    if expect_value:
+                        return None
+                    expect_value = True
+            else:  # ;
+                if depth or head[pos:].strip():
+                    return None
+                break
+            continue
+        if kind == "cast":
+            if depth != 1 or expect_value:
+                return None
+            continue
+        if depth != 1 or not expect_value:
+            return None
+        expect_value = False
+        if kind == "str":
+            if token.start(kind) > 0 and head[token.start(kind) - 1] in "eEbBxXuU&":
+                return None
+            row.append(value[1:-1].replace("''", "'").translate(COPY_ESCAPES))
+        elif kind == "null":
+            row.append("\\N")
+        elif kind == "bool":
+            row.append("t" if value.upper() == "TRUE" else "f")
+        else:
+            row.append(value)
+    if depth or not lines:
+        return None
+    return match.group("table"), match.group("columns") or "", lines
+
+
+class DumpReader:
+    """Split a SQL dump into statements and COPY data, reading in chunks
+
+    Yields (kind, sql, data) where data is a block of COPY text lines for
+    COPY statements (several blocks for a long COPY) and None otherwise.
+    """
+
+    def __init__(self, f, chunk_size=4 * 2**20, copy_batch_bytes=8 * 2**20):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.copy_batch_bytes = copy_batch_bytes
+        self.buf = ""
+        self.start = 0  # start of the current statement in buf
+        self.eof = False
+        self.bytes_read = 0
+
+    def _fill(self):
+        """Read another chunk; returns how far buf was shifted"""
+        if self.eof:
+            return None
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return None
+        self.bytes_read += len(chunk)
+        shift = self.start
+        self.buf = self.buf[shift:] + chunk
+        self.start = 0
+        return shift
+
+    def _find(self, needle, pos):
+        """buf.find that reads more data as needed; returns (index, pos shift)"""
+        shifted = 0
+        while True:
+            index = self.buf.find(needle, pos)
+            if index != -1:
+                return index, shifted
+            pos = max(pos, len(self.buf) - len(needle) + 1)
+            shift = self._fill()
+            if shift is None:
+                return -1, shifted
+            pos -= shift
+            shifted += shift
+
+    def _skip_string(self, pos, quote, backslash):
+        """pos is just after the opening quote; return the position after the close"""
+        while True:
+            if backslash:
+                # E'' strings: step over \x escapes
+                index, shift = self._find(quote, pos)
+                pos -= shift
+                if index == -1:
+                    return len(self.buf)
+                run = 0
+                while index - run - 1 >= pos and self.buf[index - run - 1] == "\\":
+                    run += 1
+                if run % 2:
+                    pos = index + 1
+                    continue
+            else:
+                index, shift = self._find(quote, pos)
+                pos -= shift
+                if index == -1:
+                    return len(self.buf)
+            if index + 1 >= len(self.buf):
+                shift = self._fill()
+                if shift:
+                    index -= shift
+            if self.buf[index + 1 : index + 2] == quote:
+                pos = index + 2
+                continue
+            return index + 1
+
+    def _copy_blocks(self, pos):
+        """Yield COPY data blocks starting after the COPY statement at pos"""
+        # data starts on the line after the statement
+        newline, shift = self._find("\n", pos)
+        pos = newline + 1 if newline != -1 else len(self.buf)
+        self.start = pos
+        while True:
+            end, shift = self._find_copy_end(pos)
+            pos -= shift
+            if end is not None:
+                block = self.buf[pos:end]
+                if block:
+                    yield block
+                after = self.buf.find("\n", end)
+                self.start = after + 1 if after != -1 else len(self.buf)
+                return
+            # no terminator yet: hand over the complete lines we have
+            last = self.buf.rfind("\n", pos)
+            if last != -1 and last + 1 - pos >= self.copy_batch_bytes:
+                yield self.buf[pos : last + 1]
+                pos = self.start = last + 1
+            shift = self._fill()
+            if shift is None:
+                block = self.buf[pos:]
+                if block:
+                    yield block
+                self.start = len(self.buf)
+                return
+            pos -= shift
+
+    def _find_copy_end(self, pos):
+        """Index of the \\. terminator line within buf (or None), no reading"""
+        if self.buf.startswith("\\.", pos) and self.buf[pos + 2 : pos + 3] in ("\n", "\r", ""):
+            if self.buf[pos + 2 : pos + 3] or self.eof:
+                return pos, 0
+        search = pos
+        while True:
+            index = self.buf.find("\n\\.", search)
+            if index == -1:
+                return None, 0
+            tail = self.buf[index + 3 : index + 4]
+            if tail in ("\n", "\r") or (tail == "" and self.eof):
+                return index + 1, 0
+            if tail == "":
+                return None, 0
+            search = index + 1
+
+    def __iter__(self):
+        pos = 0
+        while True:
+            match = SPECIAL.search(self.buf, pos)
+            if match is None:
+                # a dollar-quote tag may be split across chunks
+                pos = max(pos, self.start, len(self.buf) - 64)
+                shift = self._fill()
+                if shift is None:
+                    rest = self.buf[self.start :]
+                    if LEADING_COMMENTS.sub("", rest, count=1).strip():
+                        yield classify(rest), rest, None
+                    return
+                pos -= shift
+                continue
+
+            token = match.group()
+            if match.end() == len(self.buf) and not self.eof and token != ";":
+                # a token at the very end may continue in the next chunk
+                pos = match.start()
+                shift = self._fill()
+                if shift is not None:
+                    pos -= shift
+                    continue
+            pos = match.end()
+
+            if token == ";":
+                sql = self.buf[self.start : pos]
+                self.start = pos
+                kind = classify(sql)
+                if kind == COPY:
+                    for block in self._copy_blocks(pos):
+                        yield COPY, sql, block
+                    pos = self.start
+                else:
+                    yield kind, sql, None
+            elif token == "'":
+                before = self.buf[match.start() - 1 : match.start()]
+                before2 = self.buf[match.start() - 2 : match.start() - 1]
+                backslash = before in ("E", "e") and not (before2.isalnum() or before2 == "_")
+                pos = self._skip_string(pos, "'", backslash)
+            elif token == '"':
+                pos = self._skip_string(pos, '"', False)
+            elif token == "--":
+                index, shift = self._find("\n", pos)
+                pos = (index + 1) if index != -1 else len(self.buf)
+            elif token == "/*":
+                index, shift = self._find("*/", pos)
+                pos = (index + 2) if index != -1 else len(self.buf)
+            else:
+                # dollar quote; ignore $ inside identifiers such as a$b$
+                before = self.buf[match.start() - 1 : match.start()]
+                if before.isalnum() or before == "_":
+                    pos = match.start() + 1
+                    continue
+                index, shift = self._find(token, pos)
+                pos = (index + len(token)) if index != -1 else len(self.buf)
+
+
+class TableStats:
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.first = None
+        self.last = None
+        self.copy_seconds = 0.0
+
+    def add(self, rows, start, end):
+        self.rows += rows
+        self.batches += 1
+        self.first = start if self.first is None else min(self.first, start)
+        self.last = end if self.last is None else max(self.last, end)
+        self.copy_seconds += end - start
+
+    def as_dict(self):
+        wall = (self.last - self.first) if self.first is not None else 0.0
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "seconds": round(wall, 3),
+            "rows_per_sec": round(self.rows / wall) if wall > 0 else None,
+        }
+
+
+class BulkLoader:
+    def __init__(self, connect, jobs=4, batch_rows=50000, maintenance_work_mem="512MB", verbose=True):
+        self.connect = connect
+        self.jobs = max(1, jobs)
+        self.batch_rows = batch_rows
+        self.maintenance_work_mem = maintenance_work_mem
+        self.verbose = verbose
+        self.session_sql = []
+        self.session_version = 0
+        self.tables = defaultdict(TableStats)
+        self.deferred = {INDEX: [], CONSTRAINT: [], FINAL: []}
+        self.errors = []
+        self.phases = OrderedDict()
+        self._buffers = {}  # (table, columns) -> list of COPY lines
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(self.jobs)
+        self._slots = threading.Semaphore(self.jobs * 2)
+        self._pending = set()
+        self._main = None
+
+    def log(self, message):
+        if self.verbose:
+            print(message, flush=True)
+
+    # --- connections ---
+
+    def _worker_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.connect()
+            with conn.cursor() as cur:
+                cur.execute("SET synchronous_commit = off")
+                cur.execute("SET maintenance_work_mem = %s", (self.maintenance_work_mem,))
+            conn.commit()
+            self._local.conn = conn
+            self._local.version = -1
+            with self._lock:
+                self._connections.append(conn)
+        if self._local.version != self.session_version:
+            with conn.cursor() as cur:
+                for sql in self.session_sql:
+                    cur.execute(sql)
+            conn.commit()
+            self._local.version = self.session_version
+        return conn
+
+    def _record_error(self, what, error):
+        message = f"{what}: {str(error).strip()}"
+        with self._lock:
+            self.errors.append(message)
+        self.log(f"ERROR {message}")
+
+    # --- data ---
+
+    def _copy_job(self, table, columns, data, rows):
+        conn = self._worker_connection()
+        start = time.perf_counter()
+        try:
+            with conn.cursor() as cur:
+                cur.copy_expert(f"COPY {table} {columns} FROM STDIN", io.StringIO(data))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            self._record_error(f"COPY {table}", e)
+            return
+        with self._lock:
+            self.tables[table].add(rows, start, time.perf_counter())
+
+    def _sql_job(self, sql, table=None):
+        conn = self._worker_connection()
+        start = time.perf_counter()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                rows = max(cur.rowcount, 0)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            self._record_error(sql.strip()[:80], e)
+            return
+        if table is not None:
+            with self._lock:
+                self.tables[table].add(rows, start, time.perf_counter())
+
+    def _run_job(self, func, *args):
+        try:
+            func(*args)
+        except Exception as e:
+            # e.g. a worker that could not connect
+            self._record_error(func.__name__.strip("_"), e)
+        finally:
+            self._slots.release()
+
+    def _submit(self, func, *args):
+        self._slots.acquire()  # backpressure: at most 2 x jobs batches in memory
+        future = self._pool.submit(self._run_job, func, *args)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+    def _flush(self, key):
+        lines = self._buffers.pop(key, None)
+        if lines:
+            table, columns = key
+            self._submit(self._copy_job, table, columns, "\n".join(lines) + "\n", len(lines))
+
+    def _flush_all(self):
+        for key in list(self._buffers):
+            self._flush(key)
+
+    def barrier(self):
+        """Wait until every submitted batch is loaded"""
+        self._flush_all()
+        wait(list(self._pending))
+
+    def _execute_main(self, sql):
+        try:
+            with self._main.cursor() as cur:
+                cur.execute(sql)
+        except Exception as e:
+            self._record_error(sql.strip()[:80], e)
+
+    def handle(self, kind, sql, data):
+        if kind == COPY:
+            match = COPY_FROM_STDIN.match(LEADING_COMMENTS.sub("", sql, count=1))
+            table, columns = match.group("table"), match.group("columns") or ""
+            rows = data.count("\n") + (0 if data.endswith("\n") else 1)
+            if not data.endswith("\n"):
+                data += "\n"
+            self._submit(self._copy_job, table, columns, data, rows)
+        elif kind == INSERT:
+            converted = insert_to_copy(sql)
+            if converted is None:
+                table_match = INSERT_HEAD.match(LEADING_COMMENTS.sub("", sql, count=1))
+                table = table_match.group("table") if table_match else None
+                self._submit(self._sql_job, sql, table)
+                return
+            table, columns, lines = converted
+            key = (table, " ".join(columns.split()))
+            buffer = self._buffers.setdefault(key, [])
+            buffer.extend(lines)
+            if len(buffer) >= self.batch_rows:
+                self._flush(key)
+        elif kind in self.deferred:
+            self.deferred[kind].append(sql)
+        elif kind == SESSION:
+            if setting_name(sql) in DATA_SETTINGS:
+                self.barrier()
+            self._execute_main(sql)
+            self.session_sql.append(sql)
+            self.session_version += 1
+        elif kind == BARRIER:
+            self.barrier()
+            self._execute_main(sql)
+        else:
+            self._execute_main(sql)
+
+    # --- post data ---
+
+    def _run_group(self, statements):
+        conn = self._worker_connection()
+        for sql in statements:
+            start = time.perf_counter()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                self._record_error(sql.strip()[:80], e)
+            self.log(f"  {time.perf_counter() - start:7.2f}s  {' '.join(LEADING_COMMENTS.sub('', sql, count=1).split())[:90]}")
+
+    def _phase(self, name, func):
+        start = time.perf_counter()
+        func()
+        self.phases[name] = round(time.perf_counter() - start, 3)
+
+    def post_data(self):
+        def build_indexes():
+            # one connection per table; index builds on a table run in sequence
+            by_table = OrderedDict()
+            for sql in self.deferred[INDEX]:
+                by_table.setdefault(index_table(sql), []).append(sql)
+            futures = [self._pool.submit(self._run_group, group) for group in by_table.values()]
+            for future in futures:
+                future.result()
+
+        def add_constraints():
+            # foreign keys lock both tables, so they are added one at a time
+            self._run_group(self.deferred[CONSTRAINT])
+
+        def finish():
+            self._run_group(self.deferred[FINAL])
+            self._execute_main("ANALYZE")
+
+        if self.deferred[INDEX]:
+            self.log(f"Building {len(self.deferred[INDEX])} indexes and keys")
+        self._phase("indexes", build_indexes)
+        if self.deferred[CONSTRAINT]:
+            self.log(f"Adding {len(self.deferred[CONSTRAINT])} constraints")
+        self._phase("constraints", add_constraints)
+        self._phase("finalize", finish)
+
+    def load(self, reader):
+        self._main = self.connect()
+        self._main.autocommit = True
+        try:
+            start = time.perf_counter()
+            for kind, sql, data in reader:
+                self.handle(kind, sql, data)
+            self.barrier()
+            self.phases["data"] = round(time.perf_counter() - start, 3)
+            self.post_data()
+        finally:
+            self._pool.shutdown(wait=True)
+            for conn in self._connections + [self._main]:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    def report(self):
+        return {
+            "tables": {name: stats.as_dict() for name, stats in sorted(self.tables.items())},
+            "phases": self.phases,
+            "deferred": {kind: len(statements) for kind, statements in self.deferred.items()},
+            "errors": self.errors,
+        }
+
+
+def dry_run(reader):
+    """Parse only: count statements by kind and rows by table"""
+    kinds = defaultdict(int)
+    tables = defaultdict(int)
+    fallbacks = 0
+    for kind, sql, data in reader:
+        kinds[kind] += 1
+        if kind == COPY:
+            match = COPY_FROM_STDIN.match(LEADING_COMMENTS.sub("", sql, count=1))
+            tables[match.group("table")] += data.count("\n") + (0 if data.endswith("\n") else 1)
+        elif kind == INSERT:
+            converted = insert_to_copy(sql)
+            if converted is None:
+                fallbacks += 1
+            else:
+                tables[converted[0]] += len(converted[2])
+    return {"statements": dict(kinds), "rows": dict(tables), "insert_fallbacks": fallbacks}
+
+
+def print_report(report, total_seconds):
+    print(f"\n{'table':<40} {'rows':>10} {'seconds':>9} {'rows/sec':>10}")
+    total_rows = 0
+    for name, stats in report["tables"].items():
+        total_rows += stats["rows"]
+        rate = f"{stats['rows_per_sec']:,}" if stats["rows_per_sec"] else "-"
+        print(f"{name:<40} {stats['rows']:>10,} {stats['seconds']:>9.2f} {rate:>10}")
+    print(
+        f"{'total':<40} {total_rows:>10,} {total_seconds:>9.2f} "
+        f"{round(total_rows / total_seconds) if total_seconds else 0:>10,}"
+    )
+    print("Phases: " + ", ".join(f"{k} {v:.2f}s" for k, v in report["phases"].items()))
+    if report["errors"]:
+        print(f"{len(report['errors'])} statements failed, see the ERROR lines above")
+
+
+def main():
+    # -h is the host, as in psql
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0], add_help=False)
+    parser.add_argument("dump", help="plain SQL dump file, or - for stdin")
+    parser.add_argument("-d", "--dbname", default=os.getenv("PGDATABASE"))
+    parser.add_argument("-h", "--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    # postgres itself rather than PGPORT, which points at PgBouncer in the image;
+    # the loader's session settings do not survive transaction pooling
+    parser.add_argument("-p", "--port", default=os.getenv("PG_DIRECT_PORT", "8765"))
+    parser.add_argument("-U", "--username", default=os.getenv("PGUSER", os.getenv("NB_USER", "jovyan")))
+    parser.add_argument("-j", "--jobs", type=int, default=min(8, os.cpu_count() or 1))
+    parser.add_argument("--batch-rows", type=int, default=50000, help="rows per COPY batch")
+    parser.add_argument("--chunk-mb", type=float, default=4, help="read size in MB")
+    parser.add_argument("--maintenance-work-mem", default="512MB", help="for index builds")
+    parser.add_argument("--create", action="store_true", help="create the database if missing")
+    parser.add_argument("--json", help="write the per-table report to this file")
+    parser.add_argument("--dry-run", action="store_true", help="parse the dump without loading")
+    parser.add_argument("--help", action="help", help="show this help message and exit")
+    args = parser.parse_args()
+
+    f = sys.stdin if args.dump == "-" else open(args.dump, encoding="utf-8", errors="replace", newline="")
+    reader = DumpReader(f, chunk_size=int(args.chunk_mb * 2**20))
+
+    if args.dry_run:
+        print(json.dumps(dry_run(reader), indent=2))
+        return
+
+    if not args.dbname:
+        parser.error("--dbname is required (or set PGDATABASE)")
+    try:
+        import psycopg2
+    except ImportError:
+        sys.exit("psycopg2 is required: uv add psycopg2-binary (or use psql < dump.sql)")
+
+    def connect(dbname=args.dbname):
+        return psycopg2.connect(
+            host=args.host, port=args.port, user=args.username, dbname=dbname
+        )
+
+    if args.create:
+        conn = connect("postgres")
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (args.dbname,))
+            if cur.fetchone() is None:
+                cur.execute(f'CREATE DATABASE "{args.dbname}"')
+        conn.close()
+
+    loader = BulkLoader(connect, args.jobs, args.batch_rows, args.maintenance_work_mem)
+    start = time.perf_counter()
+    print(f"Loading {args.dump} into {args.dbname} with {args.jobs} connections")
+    loader.load(reader)
+    total = time.perf_counter() - start
+    report = loader.report()
+    print_report(report, total)
+    if args.json:
+        report["total_seconds"] = round(total, 3)
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+    if report["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
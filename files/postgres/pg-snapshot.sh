@@ -0,0 +1,162 @@
+#!/bin/bash
+# Snapshot and restore course databases with template databases
+#
+# A snapshot is a copy of a database kept as a read-only template
+# (IS_TEMPLATE, no connections allowed). Restoring drops the working
+# database and recreates it with CREATE DATABASE ... TEMPLATE, which copies
+# the data files directly (STRATEGY FILE_COPY) instead of replaying a SQL
+# dump, so a reset takes seconds instead of minutes.
+#
+#   pg-snapshot save Northwind                 # snapshot "pristine"
+#   pg-snapshot save Northwind before-hw3      # a named snapshot
+#   pg-snapshot restore Northwind              # back to "pristine"
+#   pg-snapshot restore Northwind before-hw3
+#   pg-snapshot list
+#   pg-snapshot drop Northwind before-hw3
+#
+# Connects to postgres directly (port 8765), not through PgBouncer, because
+# DROP/CREATE DATABASE need the sessions on the database to be closed.
+# PgBouncer reopens its min_pool_size server connections as soon as they are
+# terminated, so the database is also PAUSEd on the PgBouncer admin console
+# (as postgres, port 6432) for the copy and RESUMEd afterwards.
+# PG_SNAPSHOT_STRATEGY=wal_log copies through the WAL instead, which avoids
+# the checkpoint FILE_COPY forces but is slower for large databases.
+
+PGHOST=${PGHOST:-127.0.0.1}
+PG_DIRECT_PORT=${PG_DIRECT_PORT:-8765}
+PGUSER=${PGUSER:-${NB_USER:-jovyan}}
+STRATEGY=${PG_SNAPSHOT_STRATEGY:-file_copy}
+PGBOUNCER_PORT=${PGBOUNCER_PORT:-6432}
+
+run_psql() {
+    psql -h "$PGHOST" -p "$PG_DIRECT_PORT" -U "$PGUSER" -d postgres -X -q -v ON_ERROR_STOP=1 "$@"
+}
+
+now_ms() { date +%s%3N; }
+
+snapshot_name() {
+    echo "${1}_snap_${2:-pristine}"
+}
+
+usage() {
+    sed -n '2,/^$/s/^# \{0,1\}//p' "$0"
+    exit 1
+}
+
+# close other sessions on a database (the course notebooks reconnect)
+disconnect() {
+    run_psql -tA -v db="$1" <<'SQL'
+SELECT count(pg_terminate_backend(pid)) || ' session(s) closed'
+FROM pg_stat_activity
+WHERE datname = :'db' AND pid <> pg_backend_pid();
+SQL
+}
+
+# PgBouncer admin command; fails quietly when PgBouncer is not running or
+# has not served the database yet
+pgbouncer_admin() {
+    PGCONNECT_TIMEOUT=3 timeout 30 psql -h "$PGHOST" -p "$PGBOUNCER_PORT" -U postgres -d pgbouncer \
+        -X -q -c "$1" > /dev/null 2>&1
+}
+
+# stop PgBouncer from opening server connections to a database until resume
+# (PAUSE waits for running transactions, at most 30s, then disconnect closes them)
+pause_pooler() {
+    PAUSED=$1
+    trap resume_pooler EXIT
+    pgbouncer_admin "PAUSE $1"
+}
+
+resume_pooler() {
+    [ -n "$PAUSED" ] && pgbouncer_admin "RESUME $PAUSED"
+    PAUSED=
+}
+
+exists() {
+    [ "$(run_psql -tA -v db="$1" <<'SQL'
+SELECT count(*) FROM pg_database WHERE datname = :'db';
+SQL
+)" = "1" ]
+}
+
+save() {
+    local db=$1 snap
+    snap=$(snapshot_name "$1" "$2")
+    [ -z "$db" ] && usage
+    exists "$db" || { echo "Database $db does not exist"; exit 1; }
+    if exists "$snap"; then
+        echo "Snapshot $snap already exists, drop it first: pg-snapshot drop $db ${2:-pristine}"
+        exit 1
+    fi
+    echo "Saving $db as $snap ..."
+    pause_pooler "$db"
+    disconnect "$db"
+    local start
+    start=$(now_ms)
+    run_psql -v db="$db" -v snap="$snap" -v strategy="$STRATEGY" <<'SQL' || exit 1
+CREATE DATABASE :"snap" TEMPLATE :"db" STRATEGY :strategy;
+ALTER DATABASE :"snap" WITH IS_TEMPLATE true ALLOW_CONNECTIONS false;
+SQL
+    resume_pooler
+    local seconds
+    seconds=$(awk -v ms=$(($(now_ms) - start)) 'BEGIN {printf "%.1f", ms / 1000}')
+    run_psql -v snap="$snap" -v note="pg-snapshot of $db, $(date '+%Y-%m-%d %H:%M:%S'), took ${seconds}s" <<'SQL'
+COMMENT ON DATABASE :"snap" IS :'note';
+SQL
+    echo "Saved $snap in ${seconds}s"
+}
+
+restore() {
+    local db=$1 snap
+    snap=$(snapshot_name "$1" "$2")
+    [ -z "$db" ] && usage
+    exists "$snap" || { echo "No snapshot $snap, create it with: pg-snapshot save $db ${2:-}"; exit 1; }
+    echo "Restoring $db from $snap ..."
+    pause_pooler "$db"
+    local start
+    start=$(now_ms)
+    run_psql -v db="$db" -v snap="$snap" -v strategy="$STRATEGY" <<'SQL' || exit 1
+DROP DATABASE IF EXISTS :"db" WITH (FORCE);
+CREATE DATABASE :"db" TEMPLATE :"snap" STRATEGY :strategy;
+SQL
+    resume_pooler
+    local seconds
+    seconds=$(awk -v ms=$(($(now_ms) - start)) 'BEGIN {printf "%.1f", ms / 1000}')
+    run_psql -v db="$db" -v note="restored from $snap, $(date '+%Y-%m-%d %H:%M:%S'), took ${seconds}s" <<'SQL'
+COMMENT ON DATABASE :"db" IS :'note';
+SQL
+    echo "Restored $db in ${seconds}s"
+}
+
+drop() {
+    local snap
+    snap=$(snapshot_name "$1" "$2")
+    [ -z "$1" ] && usage
+    exists "$snap" || { echo "No snapshot $snap"; exit 1; }
+    run_psql -v snap="$snap" <<'SQL' || exit 1
+ALTER DATABASE :"snap" WITH IS_TEMPLATE false;
+DROP DATABASE :"snap";
+SQL
+    echo "Dropped $snap"
+}
+
+list() {
+    run_psql <<'SQL'
+SELECT d.datname AS database,
+       CASE WHEN d.datistemplate THEN 'snapshot' ELSE 'working copy' END AS kind,
+       pg_size_pretty(pg_database_size(d.datname)) AS size,
+       coalesce(shobj_description(d.oid, 'pg_database'), '') AS history
+FROM pg_database d
+WHERE d.datname LIKE '%\_snap\_%'
+   OR EXISTS (SELECT 1 FROM pg_database s WHERE s.datname LIKE d.datname || '\_snap\_%')
+ORDER BY regexp_replace(d.datname, '_snap_.*$', ''), d.datistemplate, d.datname;
+SQL
+}
+
+case "$1" in
+    save) save "$2" "$3" ;;
+    restore) restore "$2" "$3" ;;
+    drop) drop "$2" "$3" ;;
+    list) list ;;
+    *) usage ;;
+esac
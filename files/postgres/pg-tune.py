@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Write a Postgres tuning include file from the container's resource limits
+
+start-container.sh runs this before launching postgres. It reads the cgroup
+(v2 or v1) memory and CPU limits, falls back to the host values when there is
+no limit, and renders an analytics profile into conf.d, which postgresql.conf
+includes after its own settings. Every value is logged with the reasoning
+behind it.
+
+Postgres shares the container with Jupyter, R and Spark, so it is sized
+against a fraction of the memory limit rather than all of it.
+
+Environment overrides:
+  PG_TUNE=off                     skip tuning (and remove an old include file)
+  PG_TUNE_MEMORY_FRACTION=0.25    share of the memory limit for postgres
+  PG_TUNE_MEMORY=8GB              use this instead of the detected limit
+  PG_TUNE_CPUS=4                  use this instead of the detected CPU limit
+  PG_TUNE_SESSIONS=10             concurrently active queries to plan work_mem for
+
+    pg-tune --output /etc/postgresql/16/main/conf.d/00-pg-tune.conf
+    pg-tune --dry-run
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+
+# cgroup v1 reports "no limit" as a huge number rather than "max"
+UNLIMITED = 2**60
+
+
+def read_first(*paths):
+    for path in paths:
+        try:
+            with open(path) as f:
+                return f.read().strip()
+        except OSError:
+            continue
+    return None
+
+
+def parse_size(text):
+    """'8GB', '512MB', '1048576' (bytes) -> bytes"""
+    text = text.strip().upper().replace("I", "")
+    for suffix, factor in (("TB", 1024 * GB), ("GB", GB), ("MB", MB), ("KB", KB), ("B", 1)):
+        if text.endswith(suffix):
+            return int(float(text[: -len(suffix)]) * factor)
+    return int(text)
+
+
+def host_memory():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * KB
+    except OSError:
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def memory_limit():
+    """(bytes, source) for the container memory limit"""
+    override = os.getenv("PG_TUNE_MEMORY")
+    if override:
+        return parse_size(override), "PG_TUNE_MEMORY"
+    host = host_memory()
+    v2 = read_first("/sys/fs/cgroup/memory.max")
+    if v2 is not None and v2 != "max":
+        return min(int(v2), host), "cgroup v2 memory.max"
+    v1 = read_first("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+    if v1 is not None and int(v1) < UNLIMITED:
+        return min(int(v1), host), "cgroup v1 memory.limit_in_bytes"
+    return host, "host MemTotal (no cgroup limit)"
+
+
+def cpu_limit():
+    """(cpus, source) for the container CPU limit, rounded up"""
+    override = os.getenv("PG_TUNE_CPUS")
+    if override:
+        return max(1, math.ceil(float(override))), "PG_TUNE_CPUS"
+    try:
+        host = len(os.sched_getaffinity(0))
+    except AttributeError:
+        host = os.cpu_count() or 1
+    v2 = read_first("/sys/fs/cgroup/cpu.max")
+    if v2 is not None:
+        quota, _, period = v2.partition(" ")
+        if quota != "max":
+            return max(1, min(host, math.ceil(int(quota) / int(period or 100000)))), "cgroup v2 cpu.max"
+    quota = read_first("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us")
+    period = read_first("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_period_us")
+    if quota is not None and int(quota) > 0 and period:
+        return max(1, min(host, math.ceil(int(quota) / int(period)))), "cgroup v1 cfs quota"
+    return host, "host CPUs (no cgroup limit)"
+
+
+def shm_size():
+    try:
+        stat = os.statvfs("/dev/shm")
+        return stat.f_blocks * stat.f_frsize
+    except OSError:
+        return None
+
+
+def pg_size(value):
+    """Bytes -> a postgres memory setting in MB or GB"""
+    mb = max(1, int(value // MB))
+    if mb >= 1024 and mb % 1024 == 0:
+        return f"{mb // 1024}GB"
+    return f"{mb}MB"
+
+
+def clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def analytics_profile(memory, cpus, sessions, fraction, shm):
+    """Return [(setting, value, reason)] for a read-mostly analytics workload"""
+    budget = int(memory * fraction)
+    settings = []
+
+    def add(name, value, reason):
+        settings.append((name, value, reason))
+
+    shared_buffers = clamp(budget // 4, 128 * MB, 16 * GB)
+    add(
+        "shared_buffers",
+        pg_size(shared_buffers),
+        f"25% of the {pg_size(budget)} postgres budget ({fraction:.0%} of {pg_size(memory)}), "
+        "128MB-16GB; the OS page cache holds the rest",
+    )
+
+    effective_cache = clamp(memory // 2, shared_buffers * 2, memory)
+    add(
+        "effective_cache_size",
+        pg_size(effective_cache),
+        "half of the container limit is expected to be page cache; planner hint only, "
+        "favours index and parallel plans",
+    )
+
+    workers_per_gather = clamp(math.ceil(cpus / 2), 1, 8)
+    work_mem = clamp((budget - shared_buffers) // (sessions * 3 * workers_per_gather), 4 * MB, 1 * GB)
+    add(
+        "work_mem",
+        pg_size(work_mem),
+        f"(budget - shared_buffers) / ({sessions} sessions x 3 sort/hash nodes x "
+        f"{workers_per_gather} workers per gather), 4MB-1GB",
+    )
+    add(
+        "hash_mem_multiplier",
+        "2.0",
+        "hash joins and aggregates on wide analytics tables may use 2 x work_mem",
+    )
+
+    maintenance_work_mem = clamp(budget // 8, 64 * MB, 2 * GB)
+    add(
+        "maintenance_work_mem",
+        pg_size(maintenance_work_mem),
+        "1/8 of the budget, 64MB-2GB, for CREATE INDEX after bulk loads and VACUUM",
+    )
+
+    add(
+        "max_worker_processes",
+        str(max(8, cpus)),
+        f"{cpus} CPUs, at least the default 8 (background workers share this pool)",
+    )
+    add("max_parallel_workers", str(cpus), "one parallel worker per CPU")
+    add(
+        "max_parallel_workers_per_gather",
+        str(workers_per_gather),
+        "half the CPUs per query so two large queries can run side by side",
+    )
+    add(
+        "max_parallel_maintenance_workers",
+        str(clamp(math.ceil(cpus / 2), 1, 4)),
+        "parallel CREATE INDEX, at most 4",
+    )
+
+    add("wal_buffers", "16MB", "the useful maximum; fewer WAL writes during bulk loads")
+    add("min_wal_size", "1GB", "keep WAL segments around between loads")
+    add(
+        "max_wal_size",
+        pg_size(clamp(budget // 2, 2 * GB, 16 * GB)),
+        "fewer forced checkpoints while loading course databases, 2GB-16GB",
+    )
+    add(
+        "checkpoint_completion_target",
+        "0.9",
+        "spread checkpoint writes over the interval",
+    )
+    add("wal_compression", "on", "smaller full-page images at some CPU cost")
+
+    add("random_page_cost", "1.1", "SSD or network block storage, random reads are cheap")
+    add("effective_io_concurrency", "200", "SSD or network block storage")
+    add(
+        "default_statistics_target",
+        "500",
+        "better row estimates for joins and group-bys on skewed analytics data",
+    )
+
+    if shm is not None and shm < 1 * GB:
+        add(
+            "dynamic_shared_memory_type",
+            "mmap",
+            f"/dev/shm is only {pg_size(shm)}; parallel hash joins could fail with "
+            "'could not resize shared memory segment' (docker run --shm-size to raise it)",
+        )
+    return settings
+
+
+def render(settings, memory, memory_source, cpus, cpu_source):
+    lines = [
+        "# Generated by pg-tune at container start; edits are overwritten.",
+        f"# {time.strftime('%Y-%m-%d %H:%M:%S %Z')}",
+        f"# memory {pg_size(memory)} ({memory_source}), cpus {cpus} ({cpu_source})",
+        "# Set PG_TUNE=off to skip, or put overrides in a later conf.d file.",
+        "",
+    ]
+    for name, value, reason in settings:
+        lines.append(f"# {reason}")
+        lines.append(f"{name} = '{value}'" if not value.replace(".", "").isdigit() else f"{name} = {value}")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="include file to write, e.g. conf.d/00-pg-tune.conf")
+    parser.add_argument("--dry-run", action="store_true", help="log the settings without writing")
+    parser.add_argument(
+        "--memory-fraction",
+        type=float,
+        default=float(os.getenv("PG_TUNE_MEMORY_FRACTION", "0.25")),
+    )
+    parser.add_argument("--sessions", type=int, default=int(os.getenv("PG_TUNE_SESSIONS", "10")))
+    args = parser.parse_args()
+
+    if os.getenv("PG_TUNE", "on").lower() in ("off", "false", "0", "no"):
+        print("pg-tune: PG_TUNE=off, using postgresql.conf as is")
+        if args.output and os.path.exists(args.output) and not args.dry_run:
+            os.remove(args.output)
+        return
+
+    memory, memory_source = memory_limit()
+    cpus, cpu_source = cpu_limit()
+    settings = analytics_profile(
+        memory, cpus, max(1, args.sessions), clamp(args.memory_fraction, 0.05, 0.9), shm_size()
+    )
+
+    print(f"pg-tune: memory {pg_size(memory)} from {memory_source}, {cpus} CPUs from {cpu_source}")
+    for name, value, reason in settings:
+        print(f"pg-tune:   {name} = {value}  ({reason})")
+
+    if args.dry_run or not args.output:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    tmp = f"{args.output}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render(settings, memory, memory_source, cpus, cpu_source))
+    os.replace(tmp, args.output)
+    print(f"pg-tune: wrote {args.output}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        # never block postgres from starting
+        print(f"pg-tune: skipped ({type(e).__name__}: {e})", file=sys.stderr)
@@ -0,0 +1,288 @@
+"""
+Fetch Postgres query results as Arrow, then as pandas, Polars or Spark DataFrames
+
+pd.read_sql goes through a row-by-row cursor: every value becomes a Python
+object before pandas copies it again into columns. On the larger course
+tables (WestCoastImporters) that is slow and needs several times the size of
+the result in memory. Here the server streams the result and Arrow builds
+the columns directly:
+
+- with the ADBC Postgres driver (adbc-driver-postgresql) installed, results
+  arrive over binary COPY and are decoded into Arrow record batches in C++
+- otherwise `COPY (query) TO STDOUT (FORMAT csv)` over psycopg2 is parsed by
+  Arrow's multi-threaded CSV reader, with column types taken from the query's
+  result description rather than guessed
+
+    from pg_arrow import read_arrow, read_pandas, read_polars, iter_batches, to_parquet
+
+    df = read_pandas("SELECT * FROM sales.orders")
+    pl_df = read_polars("SELECT * FROM sales.orders WHERE orderdate >= %s", params=("2016-01-01",))
+    sdf = read_spark(spark, "SELECT * FROM sales.invoicelines")
+
+    for batch in iter_batches("SELECT * FROM warehouse.stockitemtransactions"):
+        ...                                    # bounded memory, one batch at a time
+    to_parquet("SELECT * FROM warehouse.stockitemtransactions", "transactions.parquet")
+
+`conn` can be a postgresql:// URI, a libpq DSN, a psycopg2 connection or a
+SQLAlchemy engine. By default it connects to the in-container database as
+$NB_USER with $PGPASSWORD on $PGPORT.
+"""
+
+import os
+import threading
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+try:
+    import adbc_driver_postgresql.dbapi as adbc
+except ImportError:  # optional, falls back to COPY over psycopg2
+    adbc = None
+
+# Postgres type OIDs -> Arrow types for the COPY fallback; anything else is
+# read as a string, as psql would show it
+OID_TYPES = {
+    16: pa.bool_(),
+    20: pa.int64(),
+    21: pa.int16(),
+    23: pa.int32(),
+    26: pa.int64(),
+    700: pa.float32(),
+    701: pa.float64(),
+    1082: pa.date32(),
+    1114: pa.timestamp("us"),
+    1184: pa.timestamp("us", tz="UTC"),
+    1083: pa.time64("us"),
+}
+NUMERIC_OID = 1700
+
+
+def default_uri(dbname="rsm-docker"):
+    user = os.getenv("PGUSER", os.getenv("NB_USER", "jovyan"))
+    password = os.getenv("PGPASSWORD", "postgres")
+    host = os.getenv("PGHOST", "127.0.0.1")
+    port = os.getenv("PGPORT", "8765")
+    return f"postgresql://{user}:{password}@{host}:{port}/{os.getenv('PGDATABASE', dbname)}"
+
+
+def _is_uri(conn):
+    return isinstance(conn, str) and conn.startswith(("postgresql://", "postgres://"))
+
+
+def _use_adbc(conn, engine, params):
+    if engine == "copy":
+        return False
+    if engine == "adbc":
+        if adbc is None:
+            raise ImportError("engine='adbc' needs adbc-driver-postgresql: uv add adbc-driver-postgresql")
+        return True
+    # "auto": ADBC's placeholders are $1, $2; queries with %s params take the COPY path
+    return adbc is not None and _is_uri(conn) and params is None
+
+
+def _psycopg2_connection(conn):
+    """(connection, close function or None) for a DSN/URI, psycopg2 connection or SQLAlchemy engine"""
+    if isinstance(conn, str):
+        import psycopg2
+
+        connection = psycopg2.connect(conn)
+        return connection, connection.close
+    if hasattr(conn, "raw_connection"):
+        # closing the pool proxy returns the connection to the engine's pool
+        raw = conn.raw_connection()
+        return getattr(raw, "driver_connection", None) or raw.dbapi_connection, raw.close
+    return conn, None
+
+
+def _numeric_type(precision, scale):
+    """numeric(p, s) -> decimal128 when precision and scale are declared"""
+    if precision is None or scale is None or not 0 < precision <= 38:
+        return pa.float64()
+    return pa.decimal128(precision, scale)
+
+
+def _result_schema(cur, query):
+    """Column names and Arrow types from the result description, without running the query"""
+    cur.execute(f"SELECT * FROM ({query}) AS q LIMIT 0")
+    names, types = [], {}
+    for column in cur.description:
+        names.append(column.name)
+        if column.type_code == NUMERIC_OID:
+            types[column.name] = _numeric_type(column.precision, column.scale)
+        else:
+            types[column.name] = OID_TYPES.get(column.type_code, pa.string())
+    return names, types
+
+
+def _copy_batches(conn, query, params, block_size):
+    """Record batches from COPY ... TO STDOUT (FORMAT csv) parsed by Arrow
+
+    psycopg2 writes the COPY stream into a pipe from a helper thread while
+    Arrow reads and parses the other end, so only a few blocks are in memory.
+    """
+    connection, close = _psycopg2_connection(conn)
+    # the session settings below are SET LOCAL in a transaction of our own,
+    # so a connection passed in is left as it was
+    autocommit = connection.autocommit
+    own_transaction = autocommit or connection.get_transaction_status() == 0
+    connection.autocommit = False if own_transaction else autocommit
+    cur = connection.cursor()
+    if params is not None:
+        query = cur.mogrify(query, params).decode()
+    query = query.strip().rstrip(";")
+    try:
+        # ISO dates and UTC timestamps that Arrow's parser reads
+        cur.execute("SET LOCAL DateStyle = 'ISO, YMD'; SET LOCAL TimeZone = 'UTC'")
+        names, types = _result_schema(cur, query)
+        read_fd, write_fd = os.pipe()
+        errors = []
+
+        def produce():
+            try:
+                with os.fdopen(write_fd, "wb") as sink:
+                    cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", sink, size=block_size)
+            except Exception as e:  # re-raised in the reading thread
+                errors.append(e)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        schema = pa.schema([(name, types[name]) for name in names])
+        try:
+            with os.fdopen(read_fd, "rb") as source:
+                try:
+                    reader = pacsv.open_csv(
+                        source,
+                        read_options=pacsv.ReadOptions(column_names=names, block_size=block_size),
+                        convert_options=pacsv.ConvertOptions(
+                            column_types=types,
+                            # COPY writes NULL unquoted and empty strings as ""
+                            strings_can_be_null=True,
+                            quoted_strings_can_be_null=False,
+                            null_values=[""],
+                            true_values=["t"],
+                            false_values=["f"],
+                            timestamp_parsers=[pacsv.ISO8601],
+                        ),
+                    )
+                except pa.ArrowInvalid as e:
+                    if "Empty CSV" not in str(e):
+                        raise
+                    reader = None
+                if reader is None:
+                    # no rows: one empty batch so callers still get the columns
+                    yield pa.RecordBatch.from_pylist([], schema=schema)
+                else:
+                    yield from reader
+        finally:
+            # closing the read end makes an abandoned COPY fail with a broken pipe
+            producer.join()
+        if errors:
+            raise errors[0]
+    finally:
+        cur.close()
+        if own_transaction:
+            connection.rollback()
+            connection.autocommit = autocommit
+        if close:
+            close()
+
+
+def _adbc_numeric(data):
+    """ADBC returns numeric as an opaque string extension type; read it as float64
+    like the COPY path does for numeric without a declared precision"""
+    for i, field in enumerate(data.schema):
+        if getattr(field.type, "type_name", None) == "numeric":
+            column = data.column(i)
+            storage = column.storage if hasattr(column, "storage") else pa.chunked_array(
+                [chunk.storage for chunk in column.chunks], type=field.type.storage_type
+            )
+            data = data.set_column(i, field.name, storage.cast(pa.float64()))
+    return data
+
+
+def _adbc_batches(uri, query, params):
+    with adbc.connect(uri) as connection:
+        with connection.cursor() as cur:
+            cur.execute(query, params)
+            for batch in cur.fetch_record_batch():
+                yield _adbc_numeric(batch)
+
+
+def iter_batches(query, conn=None, params=None, engine="auto", block_size=16 * 2**20):
+    """Yield pyarrow RecordBatches for a query without holding the whole result
+
+    engine: "auto" (ADBC when installed, conn is a URI and there are no
+    params), "adbc" or "copy". ADBC uses $1-style placeholders, the COPY
+    path psycopg2's %s style.
+    """
+    conn = conn or default_uri()
+    if _use_adbc(conn, engine, params):
+        return _adbc_batches(conn, query, params)
+    return _copy_batches(conn, query, params, block_size)
+
+
+def read_arrow(query, conn=None, params=None, engine="auto"):
+    """Return the query result as a pyarrow Table"""
+    conn = conn or default_uri()
+    if _use_adbc(conn, engine, params):
+        with adbc.connect(conn) as connection:
+            with connection.cursor() as cur:
+                cur.execute(query, params)
+                return _adbc_numeric(cur.fetch_arrow_table())
+    return pa.Table.from_batches(list(_copy_batches(conn, query, params, 16 * 2**20)))
+
+
+def read_pandas(query, conn=None, params=None, engine="auto", arrow_dtypes=False):
+    """Return a pandas DataFrame
+
+    arrow_dtypes=True keeps the Arrow buffers (pd.ArrowDtype columns, no copy);
+    otherwise columns are converted to NumPy dtypes, freeing the Arrow
+    memory column by column as it goes.
+    """
+    table = read_arrow(query, conn, params, engine)
+    if arrow_dtypes:
+        import pandas as pd
+
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return table.to_pandas(self_destruct=True, split_blocks=True)
+
+
+def read_polars(query, conn=None, params=None, engine="auto"):
+    """Return a Polars DataFrame (zero-copy from Arrow)"""
+    import polars as pl
+
+    return pl.from_arrow(read_arrow(query, conn, params, engine))
+
+
+def read_spark(spark, query, conn=None, params=None, engine="auto"):
+    """Return a Spark DataFrame
+
+    Spark 4 takes the Arrow table directly; older versions go through pandas,
+    which is Arrow-backed when spark.sql.execution.arrow.pyspark.enabled is
+    set (spark_session.get_spark() does).
+    """
+    table = read_arrow(query, conn, params, engine)
+    if int(spark.version.split(".")[0]) >= 4:
+        return spark.createDataFrame(table)
+    return spark.createDataFrame(table.to_pandas())
+
+
+def to_parquet(query, path, conn=None, params=None, engine="auto", compression="zstd"):
+    """Stream a query result into a Parquet file batch by batch; returns the row count
+
+    For results bigger than memory: read the file back with pandas/Polars
+    column subsets, or with spark.read.parquet.
+    """
+    rows = 0
+    writer = None
+    try:
+        for batch in iter_batches(query, conn, params, engine):
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema, compression=compression)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
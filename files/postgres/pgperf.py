@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+Report on query performance in the container's Postgres
+
+Reads the statistics that postgresql.conf turns on: pg_stat_statements
+(per-query totals) and the auto_explain plans of slow statements in the
+server log, plus the cumulative table and buffer statistics.
+
+top      statements by total or mean execution time, with calls, rows and
+         the shared buffer cache hit ratio of each
+plan     the plan of one statement from `top` (by queryid); parameters stay
+         as $1, $2 with EXPLAIN (GENERIC_PLAN), so nothing is executed
+slow     recent statements over auto_explain.log_min_duration, with the
+         plan auto_explain logged for them (actual rows and buffers only
+         while auto_explain.log_analyze is on)
+cache    buffer cache hit ratios per database and per table
+indexes  likely missing indexes: large tables read mostly by sequential
+         scans, foreign keys without an index, and sequential scans with a
+         filter in the plans of the top statements
+report   top, cache and indexes together (the default)
+reset    clear pg_stat_statements, e.g. before a class exercise
+
+    pgperf                                   # report on rsm-docker
+    pgperf top --by mean -n 20 -d Northwind
+    pgperf plan 4203715187204541213
+    pgperf slow --minutes 30
+    pgperf report --format json > pgperf-$HOSTNAME.json
+
+--format json writes one JSON document with the host name and time, so
+reports from several pods can be collected and compared. Connection
+settings follow psql (-h, -p, -U, -d and the PG* environment variables);
+the port defaults to postgres itself (8765) rather than PgBouncer.
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import sys
+import time
+
+# a table smaller than this is cheaper to scan than to index
+MIN_ROWS = 10000
+
+# "2024-05-01 12:00:00.123 UTC [123] jovyan@Northwind LOG:  duration: 1234.567 ms  plan:"
+# (log_line_prefix '%m [%p] %q%u@%d ' in postgresql.conf)
+SLOW_ENTRY = re.compile(
+    r"^(?P<time>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d+)?(?: \S+)?) \[(?P<pid>\d+)\] "
+    r"(?:(?P<user>[^@\s]*)@(?P<database>\S*) )?LOG:  duration: (?P<ms>[\d.]+) ms  plan:\s*",
+    re.M,
+)
+# column compared in a plan filter: "(customerid = $1)", "((o.country)::text = 'UK'::text)"
+FILTER_COLUMN = re.compile(
+    r"\(*(?:\w+\.)?\"?(?P<column>[A-Za-z_][\w$]*)\"?\)*(?:::[\w ]+?\)*)?\s*(?:=|<>|<=|>=|<|>|~~\*?|!~~)\s"
+)
+
+
+def connect(args, dbname=None):
+    import psycopg2
+
+    conn = psycopg2.connect(
+        host=args.host, port=args.port, user=args.username, dbname=dbname or args.dbname
+    )
+    conn.autocommit = True
+    return conn
+
+
+def fetch(cur, sql, params=None):
+    """Rows as dicts"""
+    cur.execute(sql, params)
+    names = [column.name for column in cur.description]
+    return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+def ratio(hit, read):
+    total = (hit or 0) + (read or 0)
+    return round(hit / total, 4) if total else None
+
+
+def statements_available(cur):
+    """True when pg_stat_statements can be queried; otherwise says how to enable it
+
+    pgperf only reads; it does not create the extension itself.
+    """
+    cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'")
+    if cur.fetchone() is None:
+        cur.execute("SELECT current_database()")
+        print(
+            f"pgperf: pg_stat_statements is not installed in {cur.fetchone()[0]}; enable it with\n"
+            "    CREATE EXTENSION pg_stat_statements;\n"
+            "(databases created from template1 in the image already have it)",
+            file=sys.stderr,
+        )
+        return False
+    if not preloaded(cur, "pg_stat_statements"):
+        print(
+            "pgperf: pg_stat_statements is installed but not loaded; add it to "
+            "shared_preload_libraries (see postgresql.conf) and restart postgres",
+            file=sys.stderr,
+        )
+        return False
+    return True
+
+
+ORDER = {
+    "total": "s.total_exec_time",
+    "mean": "s.mean_exec_time",
+    "calls": "s.calls",
+    "rows": "s.rows",
+    "io": "s.shared_blks_read",
+}
+
+
+def top_statements(cur, by="total", limit=10, all_databases=False):
+    rows = fetch(
+        cur,
+        f"""
+        SELECT s.queryid, d.datname AS database, r.rolname AS user, s.calls,
+               s.total_exec_time, s.mean_exec_time, s.max_exec_time, s.stddev_exec_time,
+               s.rows, s.shared_blks_hit, s.shared_blks_read, s.temp_blks_written,
+               100 * s.total_exec_time / nullif(sum(s.total_exec_time) OVER (), 0) AS pct_time,
+               s.query
+        FROM pg_stat_statements s
+        JOIN pg_database d ON d.oid = s.dbid
+        JOIN pg_roles r ON r.oid = s.userid
+        WHERE (%(all)s OR d.datname = current_database())
+          AND s.query NOT LIKE '%%pg_stat_statements%%'
+        ORDER BY {ORDER[by]} DESC
+        LIMIT %(limit)s
+        """,
+        {"all": all_databases, "limit": limit},
+    )
+    for row in rows:
+        row["queryid"] = str(row["queryid"])
+        row["hit_ratio"] = ratio(row["shared_blks_hit"], row["shared_blks_read"])
+        for key in ("total_exec_time", "mean_exec_time", "max_exec_time", "stddev_exec_time", "pct_time"):
+            row[key] = round(row[key] or 0, 3)
+    return rows
+
+
+def explain(cur, query):
+    """Generic plan (no execution) of a normalized statement as JSON"""
+    options = "FORMAT JSON, GENERIC_PLAN" if re.search(r"\$\d", query) else "FORMAT JSON"
+    cur.execute(f"EXPLAIN ({options}) {query}")
+    plan = cur.fetchone()[0]
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def statement_plan(args, queryid):
+    conn = connect(args)
+    with conn.cursor() as cur:
+        if not statements_available(cur):
+            sys.exit(1)
+        rows = fetch(
+            cur,
+            """
+            SELECT d.datname AS database, s.query, s.calls, s.mean_exec_time
+            FROM pg_stat_statements s JOIN pg_database d ON d.oid = s.dbid
+            WHERE s.queryid = %s
+            ORDER BY s.calls DESC LIMIT 1
+            """,
+            (int(queryid),),
+        )
+    conn.close()
+    if not rows:
+        sys.exit(f"pgperf: no statement with queryid {queryid} (see pgperf top)")
+    result = rows[0]
+    result["queryid"] = queryid
+    conn = connect(args, result["database"])
+    with conn.cursor() as cur:
+        try:
+            result["plan"] = explain(cur, result["query"])
+        except Exception as e:  # e.g. a temporary table that no longer exists
+            result["error"] = str(e).strip().splitlines()[0]
+    conn.close()
+    return result
+
+
+def read_logs(cur, minutes, max_mb):
+    """Tail of the server log files written in the last `minutes` (superuser only)"""
+    files = fetch(
+        cur,
+        """
+        SELECT name, size FROM pg_ls_logdir()
+        WHERE modification > now() - make_interval(mins => %s) AND name LIKE '%%.log'
+        ORDER BY modification DESC
+        """,
+        (minutes,),
+    )
+    budget = int(max_mb * 2**20)
+    texts = []
+    for f in files:
+        if budget <= 0:
+            break
+        length = min(f["size"], budget)
+        cur.execute(
+            "SELECT pg_read_binary_file(current_setting('log_directory') || '/' || %s, %s, %s, true)",
+            (f["name"], f["size"] - length, length),
+        )
+        # the tail can start inside a multi-byte character
+        texts.append(bytes(cur.fetchone()[0] or b"").decode("utf-8", errors="replace"))
+        budget -= length
+    return texts
+
+
+def parse_slow(text):
+    """auto_explain entries (log_format json) from a server log"""
+    decoder = json.JSONDecoder()
+    entries = []
+    for match in SLOW_ENTRY.finditer(text):
+        try:
+            explained, _ = decoder.raw_decode(text, match.end())
+        except ValueError:  # cut off at the start of the tail we read
+            continue
+        plan = explained.get("Plan", {})
+        entries.append(
+            {
+                "time": match["time"],
+                "pid": int(match["pid"]),
+                "user": match["user"],
+                "database": match["database"],
+                "duration_ms": float(match["ms"]),
+                "query": explained.get("Query Text", "").strip(),
+                "rows": plan.get("Actual Rows"),
+                "shared_hit": plan.get("Shared Hit Blocks"),
+                "shared_read": plan.get("Shared Read Blocks"),
+                "plan": plan,
+            }
+        )
+    return entries
+
+
+def slow_statements(args):
+    import psycopg2
+
+    conn = connect(args)
+    with conn.cursor() as cur:
+        threshold = None
+        if preloaded(cur, "auto_explain"):
+            cur.execute("SHOW auto_explain.log_min_duration")
+            threshold = cur.fetchone()[0]
+        try:
+            texts = read_logs(cur, args.minutes, args.log_mb)
+        except psycopg2.Error as e:
+            sys.exit(f"pgperf: cannot read the server log: {str(e).strip().splitlines()[0]}")
+    conn.close()
+    entries = [entry for text in texts for entry in parse_slow(text)]
+    entries.sort(key=lambda e: e["duration_ms"], reverse=True)
+    return {"threshold": threshold, "minutes": args.minutes, "statements": entries[: args.limit]}
+
+
+def preloaded(cur, library):
+    cur.execute("SHOW shared_preload_libraries")
+    return library in [name.strip() for name in cur.fetchone()[0].split(",")]
+
+
+def cache_ratios(cur, limit=15):
+    databases = fetch(
+        cur,
+        """
+        SELECT datname AS database, blks_hit, blks_read, temp_bytes
+        FROM pg_stat_database
+        WHERE datname IS NOT NULL AND datname NOT LIKE 'template%%' AND blks_hit + blks_read > 0
+        ORDER BY blks_hit + blks_read DESC
+        """,
+    )
+    for row in databases:
+        row["hit_ratio"] = ratio(row["blks_hit"], row["blks_read"])
+    tables = fetch(
+        cur,
+        """
+        SELECT schemaname || '.' || relname AS table,
+               heap_blks_hit, heap_blks_read,
+               coalesce(idx_blks_hit, 0) AS idx_blks_hit, coalesce(idx_blks_read, 0) AS idx_blks_read,
+               pg_total_relation_size(relid) AS size
+        FROM pg_statio_user_tables
+        WHERE heap_blks_hit + heap_blks_read > 0
+        ORDER BY heap_blks_read + coalesce(idx_blks_read, 0) DESC, heap_blks_hit DESC
+        LIMIT %s
+        """,
+        (limit,),
+    )
+    for row in tables:
+        row["heap_hit_ratio"] = ratio(row["heap_blks_hit"], row["heap_blks_read"])
+        row["idx_hit_ratio"] = ratio(row["idx_blks_hit"], row["idx_blks_read"])
+    cur.execute("SHOW shared_buffers")
+    return {"shared_buffers": cur.fetchone()[0], "databases": databases, "tables": tables}
+
+
+def table_scan_hints(cur, min_rows):
+    rows = fetch(
+        cur,
+        """
+        SELECT schemaname || '.' || relname AS table, n_live_tup AS live_rows,
+               seq_scan, seq_tup_read, coalesce(idx_scan, 0) AS idx_scan
+        FROM pg_stat_user_tables
+        WHERE n_live_tup >= %s AND seq_scan > coalesce(idx_scan, 0)
+          AND seq_tup_read / greatest(seq_scan, 1) >= n_live_tup / 2
+        ORDER BY seq_tup_read DESC
+        """,
+        (min_rows,),
+    )
+    for row in rows:
+        row["kind"] = "sequential scans"
+        row["hint"] = (
+            f"{row['seq_scan']:,} sequential scans read {row['seq_tup_read']:,} rows "
+            f"vs {row['idx_scan']:,} index scans on {row['live_rows']:,} rows"
+        )
+    return rows
+
+
+def foreign_key_hints(cur):
+    """Foreign keys whose referencing columns are not the leading columns of an index"""
+    rows = fetch(
+        cur,
+        """
+        SELECT c.conrelid::regclass::text AS table, c.conname AS constraint,
+               array_agg(a.attname ORDER BY k.ord) AS columns,
+               c.confrelid::regclass::text AS references,
+               pg_relation_size(c.conrelid) AS size
+        FROM pg_constraint c
+        CROSS JOIN LATERAL unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+        WHERE c.contype = 'f'
+          AND c.connamespace NOT IN ('pg_catalog'::regnamespace, 'information_schema'::regnamespace)
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_index i
+              WHERE i.indrelid = c.conrelid
+                AND (i.indkey::int2[])[0:cardinality(c.conkey) - 1] @> c.conkey
+          )
+        GROUP BY c.conrelid, c.conname, c.confrelid
+        ORDER BY pg_relation_size(c.conrelid) DESC
+        """,
+    )
+    for row in rows:
+        row["kind"] = "foreign key"
+        row["hint"] = (
+            f"CREATE INDEX ON {row['table']} ({', '.join(row['columns'])});  "
+            f"-- joins and deletes on {row['references']}"
+        )
+    return rows
+
+
+def plan_hints(cur, statements, min_rows):
+    """Seq Scans with a filter on large tables in the generic plans of the top statements"""
+    hints = {}
+    for statement in statements:
+        try:
+            plan = explain(cur, statement["query"])
+        except Exception:
+            continue
+        for node in plan_nodes(plan):
+            if node.get("Node Type") != "Seq Scan" or "Filter" not in node:
+                continue
+            table = f"{node.get('Schema', 'public')}.{node['Relation Name']}"
+            key = (table, node["Filter"])
+            if key in hints:
+                hints[key]["queryids"].append(statement["queryid"])
+                continue
+            hints[key] = {"table": table, "filter": node["Filter"], "queryids": [statement["queryid"]]}
+    if not hints:
+        return []
+
+    tables = {hint["table"] for hint in hints.values()}
+    sizes = {}
+    columns = {}
+    for row in fetch(
+        cur,
+        """
+        SELECT n.nspname || '.' || c.relname AS table, c.reltuples::bigint AS rows,
+               array_agg(a.attname) AS columns
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        WHERE n.nspname || '.' || c.relname = ANY(%s)
+        GROUP BY n.nspname, c.relname, c.reltuples
+        """,
+        (list(tables),),
+    ):
+        sizes[row["table"]] = row["rows"]
+        columns[row["table"]] = set(row["columns"])
+
+    results = []
+    for hint in hints.values():
+        rows = sizes.get(hint["table"], 0)
+        if rows < min_rows:
+            continue
+        filtered = []
+        for match in FILTER_COLUMN.finditer(hint["filter"]):
+            column = match["column"]
+            if column in columns.get(hint["table"], ()) and column not in filtered:
+                filtered.append(column)
+        hint.update(kind="plan", live_rows=rows, columns=filtered)
+        target = f"CREATE INDEX ON {hint['table']} ({', '.join(filtered)})" if filtered else "an index"
+        hint["hint"] = f"Seq Scan on {rows:,} rows filtering {hint['filter']}; consider {target}"
+        results.append(hint)
+    return sorted(results, key=lambda h: h["live_rows"], reverse=True)
+
+
+def index_hints(cur, min_rows, statements=None):
+    hints = table_scan_hints(cur, min_rows) + foreign_key_hints(cur)
+    if statements:
+        hints += plan_hints(cur, statements, min_rows)
+    return hints
+
+
+def header(title):
+    print(f"\n{title}\n{'-' * len(title)}")
+
+
+def short(query, width=70):
+    query = " ".join(query.split())
+    return query if len(query) <= width else query[: width - 3] + "..."
+
+
+def pct(value):
+    return f"{value:.1%}" if value is not None else "-"
+
+
+def print_top(statements):
+    header("Top statements")
+    if not statements:
+        print("no statements recorded yet")
+        return
+    print(f"{'queryid':>20} {'calls':>8} {'total ms':>11} {'mean ms':>9} {'% time':>7} {'rows':>9} {'hit':>7}  query")
+    for s in statements:
+        print(
+            f"{s['queryid']:>20} {s['calls']:>8,} {s['total_exec_time']:>11,.1f} {s['mean_exec_time']:>9,.2f} "
+            f"{s['pct_time']:>6.1f}% {s['rows']:>9,} {pct(s['hit_ratio']):>7}  {short(s['query'])}"
+        )
+
+
+def print_plan_tree(node, depth=0):
+    detail = node.get("Relation Name") or node.get("Index Name") or ""
+    rows = node.get("Actual Rows", node.get("Plan Rows"))
+    line = f"{'  ' * depth}-> {node['Node Type']}{' on ' + detail if detail else ''}"
+    print(f"{line}  (cost={node.get('Total Cost', 0):,.0f} rows={rows:,})")
+    for key in ("Index Cond", "Hash Cond", "Join Filter", "Filter"):
+        if key in node:
+            print(f"{'  ' * depth}     {key}: {node[key]}")
+    for child in node.get("Plans", []):
+        print_plan_tree(child, depth + 1)
+
+
+def print_plan(result):
+    header(f"Statement {result['queryid']} on {result['database']}")
+    print(f"{result['calls']:,} calls, {result['mean_exec_time']:,.2f} ms mean\n")
+    print(result["query"].strip() + "\n")
+    if "error" in result:
+        print(f"EXPLAIN failed: {result['error']}")
+    else:
+        print_plan_tree(result["plan"])
+
+
+def print_slow(result):
+    header(f"Statements over {result['threshold'] or 'the auto_explain threshold'} in the last {result['minutes']} minutes")
+    if not result["statements"]:
+        print("none logged")
+        return
+    for entry in result["statements"]:
+        print(
+            f"\n{entry['time']}  {entry['user']}@{entry['database']}  {entry['duration_ms']:,.1f} ms  "
+            f"hit {pct(ratio(entry['shared_hit'] or 0, entry['shared_read'] or 0))}"
+        )
+        print(short(entry["query"], 110))
+        if entry["plan"]:
+            print_plan_tree(entry["plan"], 1)
+
+
+def print_cache(cache):
+    header(f"Buffer cache hit ratios (shared_buffers {cache['shared_buffers']})")
+    for row in cache["databases"]:
+        print(f"{row['database']:<30} {pct(row['hit_ratio']):>7}  {row['blks_read']:>12,} blocks read from disk")
+    if cache["tables"]:
+        print(f"\n{'table':<40} {'heap hit':>9} {'index hit':>10} {'size':>10}")
+        for row in cache["tables"]:
+            print(
+                f"{row['table']:<40} {pct(row['heap_hit_ratio']):>9} {pct(row['idx_hit_ratio']):>10} "
+                f"{row['size'] / 2**20:>8.1f}MB"
+            )
+
+
+def print_indexes(hints):
+    header("Possible missing indexes")
+    if not hints:
+        print("none found")
+        return
+    for hint in hints:
+        print(f"{hint['table']:<40} {hint['kind']:<16} {hint['hint']}")
+
+
+def output(args, result, printer):
+    if args.format == "json":
+        result = {
+            "host": socket.gethostname(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "database": args.dbname,
+            **result,
+        }
+        json.dump(result, sys.stdout, indent=2, default=str)
+        print()
+    else:
+        printer(result)
+
+
+def add_common(parser, defaults=True):
+    """Connection and output options, accepted before or after the command
+
+    The copies on the subcommands have no defaults of their own, so they do
+    not overwrite values given before the command name.
+    """
+
+    def default(value):
+        return value if defaults else argparse.SUPPRESS
+
+    # -h is the host, as in psql
+    parser.add_argument("-d", "--dbname", default=default(os.getenv("PGDATABASE", "rsm-docker")))
+    parser.add_argument("-h", "--host", default=default(os.getenv("PGHOST", "127.0.0.1")))
+    parser.add_argument("-p", "--port", default=default(os.getenv("PG_DIRECT_PORT", "8765")))
+    parser.add_argument(
+        "-U", "--username", default=default(os.getenv("PGUSER", os.getenv("NB_USER", "jovyan")))
+    )
+    parser.add_argument("--format", choices=["text", "json"], default=default("text"))
+    parser.add_argument("--help", action="help", help="show this help message and exit")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0], add_help=False)
+    add_common(parser)
+    sub = parser.add_subparsers(dest="command")
+
+    def command(name, help):
+        subparser = sub.add_parser(name, help=help, add_help=False)
+        add_common(subparser, defaults=False)
+        return subparser
+
+    top = command("top", "statements by execution time")
+    top.add_argument("--by", choices=list(ORDER), default="total")
+    top.add_argument("-n", "--limit", type=int, default=10)
+    top.add_argument("--all-databases", action="store_true")
+    plan = command("plan", "plan of a statement from top")
+    plan.add_argument("queryid")
+    slow = command("slow", "slow statements logged by auto_explain")
+    slow.add_argument("--minutes", type=int, default=60)
+    slow.add_argument("-n", "--limit", type=int, default=20)
+    slow.add_argument("--log-mb", type=float, default=50, help="read at most this much of the logs")
+    cache = command("cache", "buffer cache hit ratios")
+    cache.add_argument("-n", "--limit", type=int, default=15)
+    indexes = command("indexes", "likely missing indexes")
+    indexes.add_argument("--min-rows", type=int, default=MIN_ROWS)
+    indexes.add_argument("--statements", type=int, default=20, help="top statements whose plans are checked")
+    report = command("report", "top, cache and indexes")
+    report.add_argument("-n", "--limit", type=int, default=10)
+    report.add_argument("--min-rows", type=int, default=MIN_ROWS)
+    command("reset", "clear pg_stat_statements")
+    parser.set_defaults(limit=10, min_rows=MIN_ROWS)
+    args = parser.parse_args()
+    args.command = args.command or "report"
+
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        sys.exit("psycopg2 is required: uv add psycopg2-binary")
+
+    if args.command == "plan":
+        result = statement_plan(args, args.queryid)
+        return output(args, result, print_plan)
+    if args.command == "slow":
+        return output(args, slow_statements(args), print_slow)
+
+    conn = connect(args)
+    with conn.cursor() as cur:
+        if args.command == "reset":
+            if statements_available(cur):
+                cur.execute("SELECT pg_stat_statements_reset()")
+                print("pg_stat_statements reset")
+            return
+        if args.command == "top":
+            statements = top_statements(cur, args.by, args.limit, args.all_databases) if statements_available(cur) else []
+            return output(args, {"statements": statements}, lambda r: print_top(r["statements"]))
+        if args.command == "cache":
+            return output(args, cache_ratios(cur, args.limit), print_cache)
+        if args.command == "indexes":
+            statements = top_statements(cur, "total", args.statements) if statements_available(cur) else []
+            return output(args, {"indexes": index_hints(cur, args.min_rows, statements)}, lambda r: print_indexes(r["indexes"]))
+
+        statements = top_statements(cur, "total", args.limit) if statements_available(cur) else []
+        result = {
+            "statements": statements,
+            "cache": cache_ratios(cur),
+            "indexes": index_hints(cur, args.min_rows, statements),
+        }
+    conn.close()
+
+    def print_report(r):
+        print_top(r["statements"])
+        print_cache(r["cache"])
+        print_indexes(r["indexes"])
+
+    output(args, result, print_report)
+
+
+if __name__ == "__main__":
+    main()
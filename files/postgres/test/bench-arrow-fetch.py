@@ -0,0 +1,156 @@
+"""
+Compare pd.read_sql with the Arrow fetch paths in pg_arrow
+
+Creates a table shaped like the WestCoastImporters fact tables (ints,
+numeric money columns, text, dates and timestamps) with --rows rows, then
+fetches it with each method in a fresh Python process:
+
+  read_sql   pd.read_sql over SQLAlchemy + psycopg2 (the current notebook path)
+  copy       pg_arrow.read_pandas with COPY csv parsed by Arrow
+  adbc       pg_arrow.read_pandas with the ADBC driver (binary COPY), if installed
+  polars     pg_arrow.read_polars
+  parquet    pg_arrow.to_parquet, streaming batches to a file
+
+and reports wall time, rows/sec and peak memory above the imports.
+
+    python files/postgres/test/bench-arrow-fetch.py --rows 2000000
+    python files/postgres/test/bench-arrow-fetch.py -p 5432 -U postgres --dbname postgres --output fetch.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+TABLE = "bench_arrow_fetch"
+METHODS = ["read_sql", "copy", "adbc", "polars", "parquet"]
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def create_table(uri, rows):
+    import psycopg2
+
+    conn = psycopg2.connect(uri)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT count(*) FROM pg_class WHERE relname = '{TABLE}'")
+        if cur.fetchone()[0]:
+            cur.execute(f"SELECT count(*) FROM {TABLE}")
+            if cur.fetchone()[0] == rows:
+                conn.close()
+                return
+            cur.execute(f"DROP TABLE {TABLE}")
+        print(f"Creating {TABLE} with {rows:,} rows ...", flush=True)
+        cur.execute(
+            f"""
+            CREATE TABLE {TABLE} AS
+            SELECT
+                i AS invoice_line_id,
+                (i / 4)::bigint AS invoice_id,
+                (random() * 227)::int AS stock_item_id,
+                'Item description ' || (i % 1000) AS description,
+                (random() * 100)::int AS quantity,
+                round((random() * 500)::numeric, 2)::numeric(18, 2) AS unit_price,
+                round((random() * 15)::numeric, 3)::numeric(18, 3) AS tax_rate,
+                round((random() * 5000)::numeric, 2)::numeric(18, 2) AS extended_price,
+                random() < 0.1 AS is_finalized,
+                DATE '2013-01-01' + (i % 1500) AS invoice_date,
+                TIMESTAMP '2013-01-01' + make_interval(secs => i) AS last_edited_when
+            FROM generate_series(1, {rows}) AS i
+            """
+        )
+        cur.execute(f"ANALYZE {TABLE}")
+    conn.close()
+
+
+def run_method(method, uri):
+    """Runs in a child process; returns rows, seconds and peak memory"""
+    import pandas as pd  # noqa: F401  (import cost is not measured)
+    import pg_arrow
+
+    query = f"SELECT * FROM {TABLE}"
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if method == "read_sql":
+        from sqlalchemy import create_engine
+
+        engine = create_engine(uri.replace("postgresql://", "postgresql+psycopg2://", 1))
+        rows = len(pd.read_sql(query, engine))
+    elif method == "copy":
+        rows = len(pg_arrow.read_pandas(query, uri, engine="copy"))
+    elif method == "adbc":
+        rows = len(pg_arrow.read_pandas(query, uri, engine="adbc"))
+    elif method == "polars":
+        rows = pg_arrow.read_polars(query, uri, engine="copy").height
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = pg_arrow.to_parquet(query, os.path.join(tmp, "out.parquet"), uri, engine="copy")
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": round(seconds, 3), "peak_mb": round(peak_rss_mb() - baseline, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0], add_help=False)
+    parser.add_argument("-h", "--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", default=os.getenv("PG_DIRECT_PORT", "8765"))
+    parser.add_argument("-U", "--user", default=os.getenv("NB_USER", "jovyan"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD", "postgres"))
+    parser.add_argument("--dbname", default="rsm-docker")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=METHODS)
+    parser.add_argument("--output", help="JSON results file")
+    parser.add_argument("--worker", choices=METHODS, help=argparse.SUPPRESS)
+    parser.add_argument("--uri", help=argparse.SUPPRESS)
+    parser.add_argument("--help", action="help", help="show this help message and exit")
+    args = parser.parse_args()
+
+    if args.worker:
+        print("RESULT " + json.dumps(run_method(args.worker, args.uri)))
+        return
+
+    uri = f"postgresql://{args.user}:{args.password}@{args.host}:{args.port}/{args.dbname}"
+    create_table(uri, args.rows)
+
+    results = []
+    print(f"{'method':<10} {'rows':>10} {'seconds':>9} {'rows/s':>12} {'peak MB':>9}")
+    for method in args.methods:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", method, "--uri", uri], capture_output=True, text=True
+        )
+        found = [line[7:] for line in proc.stdout.splitlines() if line.startswith("RESULT ")]
+        if proc.returncode or not found:
+            error = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+            print(f"{method:<10} skipped: {error}")
+            continue
+        result = json.loads(found[0])
+        result["method"] = method
+        results.append(result)
+        print(
+            f"{method:<10} {result['rows']:>10,} {result['seconds']:>9.2f} "
+            f"{result['rows'] / result['seconds']:>12,.0f} {result['peak_mb']:>9.1f}"
+        )
+
+    baseline = next((r for r in results if r["method"] == "read_sql"), None)
+    if baseline:
+        for result in results:
+            if result is not baseline:
+                print(f"{result['method']}: {baseline['seconds'] / result['seconds']:.1f}x faster than read_sql")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rows": args.rows, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Connect-heavy workloads against postgres directly (8765) and via PgBouncer (6432)
+
+Each worker thread repeatedly opens a connection, runs a short query and
+closes it, the pattern of notebooks that call create_engine/read_sql per
+cell. Concurrency levels above max_connections (100) show the "too many
+clients" failures that the pooler queues instead.
+
+    python files/postgres/test/bench-connections.py --concurrency 1 8 32 150 --iterations 50
+
+Reports connections/sec, p50/p95/p99 connect+query latency and errors per
+port and concurrency level, and optionally writes them to a JSON file.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+
+import psycopg2
+
+QUERIES = {
+    "select1": "SELECT 1",
+    # a small catalog query, typical of notebook metadata lookups
+    "catalog": "SELECT count(*) FROM pg_class WHERE relkind = 'r'",
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_level(dsn, concurrency, iterations, query, hold):
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    start_gate = threading.Event()
+
+    def worker():
+        start_gate.wait()
+        for _ in range(iterations):
+            start = time.perf_counter()
+            try:
+                conn = psycopg2.connect(dsn)
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(query)
+                        cur.fetchall()
+                        if hold:
+                            cur.execute("SELECT pg_sleep(%s)", (hold,))
+                    conn.commit()
+                finally:
+                    conn.close()
+            except psycopg2.Error as e:
+                message = str(e).strip().splitlines()[0][:80]
+                with lock:
+                    errors[message] = errors.get(message, 0) + 1
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    start_gate.set()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "attempts": concurrency * iterations,
+        "succeeded": len(latencies),
+        "failed": sum(errors.values()),
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "connections_per_sec": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+        "mean_ms": round(statistics.mean(latencies), 2) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--user", default=os.getenv("NB_USER", "jovyan"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD", "postgres"))
+    parser.add_argument("--dbname", default="rsm-docker")
+    parser.add_argument("--ports", nargs="+", type=int, default=[8765, 6432], help="direct, pooled")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32, 150])
+    parser.add_argument("--iterations", type=int, default=50, help="connections per worker")
+    parser.add_argument("--query", choices=list(QUERIES), default="select1")
+    parser.add_argument("--hold", type=float, default=0.0, help="seconds to keep each connection busy")
+    parser.add_argument(
+        "--sslmode", default="prefer", help="libpq default; postgres has ssl = on, PgBouncer no TLS"
+    )
+    parser.add_argument("--output", help="JSON results file")
+    args = parser.parse_args()
+
+    labels = {8765: "direct", 6432: "pgbouncer"}
+    results = []
+    print(
+        f"{'target':<10} {'port':>5} {'conc':>5} {'conn/s':>8} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'p99 ms':>8} {'failed':>7}"
+    )
+    for port in args.ports:
+        dsn = (
+            f"host={args.host} port={port} user={args.user} "
+            f"password={args.password} dbname={args.dbname} sslmode={args.sslmode}"
+        )
+        try:
+            psycopg2.connect(dsn).close()
+        except psycopg2.Error as e:
+            print(f"{labels.get(port, port)}: cannot connect on port {port} ({str(e).strip()})")
+            continue
+        for concurrency in args.concurrency:
+            result = run_level(dsn, concurrency, args.iterations, QUERIES[args.query], args.hold)
+            result.update(target=labels.get(port, str(port)), port=port)
+            results.append(result)
+
+            def fmt(value):
+                return f"{value:>8.2f}" if value is not None else f"{'-':>8}"
+
+            print(
+                f"{result['target']:<10} {port:>5} {concurrency:>5} "
+                f"{result['connections_per_sec']:>8.1f} {fmt(result['p50_ms'])} "
+                f"{fmt(result['p95_ms'])} {fmt(result['p99_ms'])} {result['failed']:>7}"
+            )
+            for message, count in result["errors"].items():
+                print(f"{'':<17} {count} x {message}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k != "password"}, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Convert a directory of CSV/JSON files to Parquet on HDFS in parallel
+
+A replacement for `hdfs dfs -put` of raw text files for course data: every
+CSV (.csv, .csv.gz, .tsv) and newline-delimited JSON (.json, .jsonl,
+.ndjson) file under the source directory is read in fixed-size blocks with
+PyArrow, and each block is written straight to HDFS as compressed Parquet.
+Neither the whole file nor the whole table is ever held in memory. Files
+are converted by a pool of workers; PyArrow releases the GIL while parsing
+and writing, so threads keep all CPUs busy.
+
+Each input file becomes a Parquet dataset directory named after the file,
+optionally hive-partitioned on one or more columns:
+
+    hdfs-ingest ~/data/airlines hdfs://localhost:9100/data/airlines
+    hdfs-ingest ~/data/sales hdfs://localhost:9100/data/sales --partition-by year month
+    hdfs-ingest ~/data /tmp/parquet-out --jobs 4      # local output for testing
+
+    spark.read.parquet("hdfs://localhost:9100/data/airlines/flights")
+
+For hdfs:// destinations libhdfs needs JAVA_HOME and the Hadoop CLASSPATH;
+the CLASSPATH is taken from `hadoop classpath --glob` when it is not set.
+"""
+
+import argparse
+import math
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.json as pajson
+
+MB = 1024**2
+
+CSV_SUFFIXES = (".csv", ".tsv", ".txt")
+JSON_SUFFIXES = (".json", ".jsonl", ".ndjson")
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".zst", ".lz4")
+
+
+def source_format(path):
+    name = path.lower()
+    for suffix in COMPRESSED_SUFFIXES:
+        name = name.removesuffix(suffix)
+    if name.endswith(CSV_SUFFIXES):
+        return "csv"
+    if name.endswith(JSON_SUFFIXES):
+        return "json"
+    return None
+
+
+def dataset_name(path, root):
+    """data/2024/flights.csv.gz -> 2024/flights"""
+    relative = os.path.relpath(path, root)
+    for suffix in COMPRESSED_SUFFIXES:
+        relative = relative.removesuffix(suffix)
+    return os.path.splitext(relative)[0]
+
+
+def find_sources(root):
+    if os.path.isfile(root):
+        return [root] if source_format(root) else []
+    sources = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            if not filename.startswith(".") and source_format(path):
+                sources.append(path)
+    return sources
+
+
+def read_first(*paths):
+    for path in paths:
+        try:
+            with open(path) as f:
+                return f.read().strip()
+        except OSError:
+            continue
+    return None
+
+
+def cpu_limit():
+    """CPUs this container may use, rounded up: the cgroup quota when there
+    is one, otherwise the CPUs the process is allowed to run on. os.cpu_count()
+    is the host's count, far more than a 2-CPU pod on a large node gets."""
+    try:
+        host = len(os.sched_getaffinity(0))
+    except AttributeError:
+        host = os.cpu_count() or 1
+    v2 = read_first("/sys/fs/cgroup/cpu.max")
+    if v2 is not None:
+        quota, _, period = v2.partition(" ")
+        if quota != "max":
+            return max(1, min(host, math.ceil(int(quota) / int(period or 100000))))
+    quota = read_first("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us")
+    period = read_first("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_period_us")
+    if quota is not None and int(quota) > 0 and period:
+        return max(1, min(host, math.ceil(int(quota) / int(period))))
+    return host
+
+
+def hdfs_environment():
+    """libhdfs is loaded over JNI and needs the Hadoop jars on CLASSPATH"""
+    if not os.getenv("CLASSPATH"):
+        try:
+            out = subprocess.run(
+                ["hadoop", "classpath", "--glob"], capture_output=True, text=True, check=True, timeout=60
+            ).stdout
+            os.environ["CLASSPATH"] = out.strip()
+        except (OSError, subprocess.SubprocessError) as e:
+            sys.exit(f"hdfs-ingest: CLASSPATH is not set and `hadoop classpath --glob` failed ({e})")
+    hadoop_home = os.getenv("HADOOP_HOME", "/opt/hadoop")
+    os.environ.setdefault("ARROW_LIBHDFS_DIR", os.path.join(hadoop_home, "lib", "native"))
+
+
+def open_batches(path, fmt, block_size, column_types=None, delimiter=None):
+    """(schema, iterator of record batches) read block by block"""
+    stream = pa.input_stream(path, compression="detect")
+    if fmt == "csv":
+        if delimiter is None:
+            delimiter = "\t" if ".tsv" in path.lower() else ","
+        reader = pacsv.open_csv(
+            stream,
+            read_options=pacsv.ReadOptions(block_size=block_size),
+            parse_options=pacsv.ParseOptions(delimiter=delimiter),
+            convert_options=pacsv.ConvertOptions(column_types=column_types or {}),
+        )
+    else:
+        reader = pajson.open_json(stream, read_options=pajson.ReadOptions(block_size=block_size))
+    return reader.schema, reader
+
+
+def widened_type(schema, error):
+    """(column, wider type) for the column a CSV conversion error names, or None
+
+    Integers become float64 first (ints that turn into decimals), anything
+    else becomes a string; a string column cannot be widened further.
+    """
+    match = re.search(r"In CSV column #(\d+)", str(error))
+    if match is None or int(match.group(1)) >= len(schema):
+        return None
+    field = schema.field(int(match.group(1)))
+    if pa.types.is_integer(field.type):
+        return field.name, pa.float64()
+    if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+        return None
+    return field.name, pa.string()
+
+
+class Ingest:
+    def __init__(self, args, filesystem, dest_path):
+        self.args = args
+        self.filesystem = filesystem
+        self.dest_path = dest_path.rstrip("/")
+        self.lock = threading.Lock()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.rows = 0
+
+    def convert(self, source):
+        fmt = self.args.format if self.args.format != "auto" else source_format(source)
+        name = dataset_name(source, self.args.source if os.path.isdir(self.args.source) else os.path.dirname(source))
+        target = f"{self.dest_path}/{name}"
+        start = time.perf_counter()
+
+        # the schema is inferred from the first block; if a later block does
+        # not fit it (ints that turn into decimals, empty columns), retry with
+        # the failing column widened, leaving the other columns' types alone
+        column_types = {}
+        schema = None
+        while True:
+            written = []
+            try:
+                schema, batches = open_batches(source, fmt, self.args.block_mb * MB, column_types, self.args.delimiter)
+                rows = self.write(target, name, schema, batches, written)
+                break
+            except pa.ArrowInvalid as e:
+                widened = widened_type(schema, e) if fmt == "csv" and schema is not None else None
+                if widened is None:
+                    raise
+                column, column_type = widened
+                print(f"hdfs-ingest: {name}: {str(e).splitlines()[0]}; retrying with {column} as {column_type}")
+                column_types[column] = column_type
+
+        seconds = time.perf_counter() - start
+        size_in = os.path.getsize(source)
+        size_out = sum(written)
+        with self.lock:
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+            self.rows += rows
+        return name, rows, size_in, size_out, seconds
+
+    def write(self, target, name, schema, batches, written):
+        counted = [0]
+
+        def counting():
+            for batch in batches:
+                counted[0] += batch.num_rows
+                yield batch
+
+        partitioning = None
+        if self.args.partition_by:
+            missing = [column for column in self.args.partition_by if column not in schema.names]
+            if missing:
+                raise ValueError(f"partition column(s) {', '.join(missing)} not in {name}")
+            partitioning = ds.partitioning(
+                pa.schema([schema.field(column) for column in self.args.partition_by]), flavor="hive"
+            )
+
+        parquet = ds.ParquetFileFormat()
+        ds.write_dataset(
+            counting(),
+            target,
+            schema=schema,
+            format=parquet,
+            file_options=parquet.make_write_options(compression=self.args.compression),
+            filesystem=self.filesystem,
+            partitioning=partitioning,
+            basename_template="part-{i}.parquet",
+            max_rows_per_file=self.args.rows_per_file,
+            max_rows_per_group=min(self.args.rows_per_group, self.args.rows_per_file),
+            max_open_files=256,
+            existing_data_behavior="delete_matching",
+            file_visitor=lambda f: written.append(f.size or 0),
+            use_threads=False,  # parallelism comes from the file workers
+        )
+        return counted[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", help="local directory (or single file) with CSV/JSON files")
+    parser.add_argument("dest", help="hdfs://localhost:9100/path, or a local path")
+    parser.add_argument("--format", choices=["auto", "csv", "json"], default="auto")
+    parser.add_argument("--delimiter", help="CSV delimiter (default , or tab for .tsv)")
+    parser.add_argument("--partition-by", nargs="+", help="hive-partition the output on these columns")
+    parser.add_argument("--compression", default="zstd", choices=["zstd", "snappy", "gzip", "lz4", "none"])
+    parser.add_argument("-j", "--jobs", type=int, default=min(8, cpu_limit()), help="files in parallel")
+    parser.add_argument("--block-mb", type=int, default=16, help="read block size per worker")
+    parser.add_argument("--rows-per-file", type=int, default=10_000_000)
+    parser.add_argument("--rows-per-group", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    sources = find_sources(args.source)
+    if not sources:
+        sys.exit(f"hdfs-ingest: no CSV or JSON files under {args.source}")
+
+    if args.dest.startswith("hdfs://"):
+        hdfs_environment()
+    try:
+        filesystem, dest_path = pafs.FileSystem.from_uri(args.dest)
+    except (pa.ArrowInvalid, OSError):
+        filesystem, dest_path = pafs.LocalFileSystem(), os.path.abspath(args.dest)
+
+    ingest = Ingest(args, filesystem, dest_path)
+    total_in = sum(os.path.getsize(source) for source in sources)
+    print(f"hdfs-ingest: {len(sources)} files, {total_in / MB:.1f} MB -> {args.dest} with {args.jobs} workers")
+
+    start = time.perf_counter()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {pool.submit(ingest.convert, source): source for source in sources}
+        for future in as_completed(futures):
+            try:
+                name, rows, size_in, size_out, seconds = future.result()
+            except (pa.ArrowException, OSError, ValueError) as e:
+                failed += 1
+                print(f"hdfs-ingest: {futures[future]} failed: {str(e).splitlines()[0]}")
+                continue
+            print(
+                f"  {name:<40} {rows:>12,} rows {size_in / MB:>9.1f} MB -> {size_out / MB:>8.1f} MB "
+                f"{seconds:>7.1f}s {size_in / MB / seconds if seconds else 0:>7.1f} MB/s"
+            )
+    wall = time.perf_counter() - start
+
+    ratio = ingest.bytes_in / ingest.bytes_out if ingest.bytes_out else 0
+    print(
+        f"hdfs-ingest: {ingest.rows:,} rows, {ingest.bytes_in / MB:.1f} MB in, {ingest.bytes_out / MB:.1f} MB "
+        f"Parquet ({ratio:.1f}x smaller), {wall:.1f}s, {ingest.bytes_in / MB / wall if wall else 0:.1f} MB/s"
+    )
+    if failed:
+        sys.exit(f"hdfs-ingest: {failed} file(s) failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Build a SparkSession sized to the container's CPU and memory limits
+
+The pyspark-notebook defaults assume a whole machine: 200 shuffle
+partitions, a 1g driver, and Arrow conversion switched off. In a pod with
+2 CPUs and a 64Gi limit that means hundreds of tiny tasks per shuffle, and
+toPandas() that either runs slowly or runs out of heap. This reads the
+cgroup (v2 or v1) limits the same way pg-tune does and builds a local-mode
+session for them:
+
+    from spark_session import get_spark
+
+    spark = get_spark("my-analysis")
+    spark = get_spark("big-join", memory_fraction=0.6, **{"spark.sql.shuffle.partitions": "64"})
+
+    python -m spark_session          # print the settings and the reasoning
+
+Spark shares the container with Postgres (25% of memory by default, see
+pg-tune), Jupyter and R, so the driver gets SPARK_MEMORY_FRACTION (default
+0.5) of the memory limit. spark.driver.memory only takes effect when the JVM
+starts, so call get_spark() before anything else creates a session.
+
+Environment overrides: SPARK_MEMORY_FRACTION, SPARK_MEMORY (e.g. 16g),
+SPARK_CPUS, SPARK_LOCAL_DIRS.
+"""
+
+import math
+import os
+
+MB = 1024**2
+GB = 1024**3
+
+# cgroup v1 reports "no limit" as a huge number rather than "max"
+UNLIMITED = 2**60
+
+
+def _read_first(*paths):
+    for path in paths:
+        try:
+            with open(path) as f:
+                return f.read().strip()
+        except OSError:
+            continue
+    return None
+
+
+def _parse_size(text):
+    """'16g', '512m', '8GB', '1048576' (bytes) -> bytes"""
+    text = text.strip().lower().rstrip("ib")
+    for suffix, factor in (("t", 1024 * GB), ("g", GB), ("m", MB), ("k", 1024)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def memory_limit():
+    """(bytes, source) for the container memory limit"""
+    if os.getenv("SPARK_MEMORY"):
+        return None, "SPARK_MEMORY"
+    host = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    v2 = _read_first("/sys/fs/cgroup/memory.max")
+    if v2 is not None and v2 != "max":
+        return min(int(v2), host), "cgroup v2 memory.max"
+    v1 = _read_first("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+    if v1 is not None and int(v1) < UNLIMITED:
+        return min(int(v1), host), "cgroup v1 memory.limit_in_bytes"
+    return host, "host memory (no cgroup limit)"
+
+
+def cpu_limit():
+    """(cpus, source) for the container CPU limit, rounded up"""
+    if os.getenv("SPARK_CPUS"):
+        return max(1, math.ceil(float(os.environ["SPARK_CPUS"]))), "SPARK_CPUS"
+    try:
+        host = len(os.sched_getaffinity(0))
+    except AttributeError:
+        host = os.cpu_count() or 1
+    v2 = _read_first("/sys/fs/cgroup/cpu.max")
+    if v2 is not None:
+        quota, _, period = v2.partition(" ")
+        if quota != "max":
+            return max(1, min(host, math.ceil(int(quota) / int(period or 100000)))), "cgroup v2 cpu.max"
+    quota = _read_first("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us")
+    period = _read_first("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_period_us")
+    if quota is not None and int(quota) > 0 and period:
+        return max(1, min(host, math.ceil(int(quota) / int(period)))), "cgroup v1 cfs quota"
+    return host, "host CPUs (no cgroup limit)"
+
+
+def _jvm_size(value):
+    """Bytes -> a JVM size such as '24g' or '768m'"""
+    mb = max(512, int(value // MB))
+    return f"{mb // 1024}g" if mb >= 4096 else f"{mb}m"
+
+
+def spark_config(memory_fraction=None):
+    """Return [(key, value, reason)] for a local-mode session in this container"""
+    if memory_fraction is None:
+        memory_fraction = float(os.getenv("SPARK_MEMORY_FRACTION", "0.5"))
+    memory_fraction = max(0.1, min(0.9, memory_fraction))
+    memory, memory_source = memory_limit()
+    cpus, cpu_source = cpu_limit()
+    settings = []
+
+    def add(key, value, reason):
+        settings.append((key, str(value), reason))
+
+    add("spark.master", f"local[{cpus}]", f"{cpus} CPUs from {cpu_source}")
+    if memory is None:
+        driver = _parse_size(os.environ["SPARK_MEMORY"])
+        add("spark.driver.memory", _jvm_size(driver), "SPARK_MEMORY")
+    else:
+        driver = int(memory * memory_fraction)
+        add(
+            "spark.driver.memory",
+            _jvm_size(driver),
+            f"{memory_fraction:.0%} of {memory / GB:.1f}GB from {memory_source}; "
+            "the rest is for Postgres, Python workers and the OS",
+        )
+    add(
+        "spark.driver.maxResultSize",
+        _jvm_size(driver // 4),
+        "a quarter of the heap for collect()/toPandas() results",
+    )
+    add(
+        "spark.sql.shuffle.partitions",
+        max(8, cpus * 4),
+        "4 tasks per CPU instead of 200; AQE coalesces them further",
+    )
+    add("spark.default.parallelism", max(8, cpus * 4), "same for RDD operations")
+    add("spark.sql.adaptive.enabled", "true", "re-plan shuffles from runtime statistics")
+    add("spark.sql.adaptive.coalescePartitions.enabled", "true", "merge small shuffle partitions")
+    add("spark.sql.adaptive.advisoryPartitionSizeInBytes", "64m", "target size after coalescing")
+    add("spark.sql.adaptive.skewJoin.enabled", "true", "split skewed join partitions")
+    add(
+        "spark.sql.execution.arrow.pyspark.enabled",
+        "true",
+        "columnar toPandas()/createDataFrame(pandas_df) instead of row-by-row pickling",
+    )
+    add(
+        "spark.sql.execution.arrow.pyspark.fallback.enabled",
+        "true",
+        "fall back to the slow path for types Arrow cannot convert",
+    )
+    add(
+        "spark.serializer",
+        "org.apache.spark.serializer.KryoSerializer",
+        "faster and smaller than Java serialization for shuffles and caching",
+    )
+    local_dir = os.getenv("SPARK_LOCAL_DIRS") or f"/tmp/spark-{os.getenv('NB_USER', os.getenv('USER', 'jovyan'))}"
+    add(
+        "spark.local.dir",
+        local_dir,
+        "shuffle and spill files on local disk, not the home directory volume",
+    )
+    add("spark.ui.showConsoleProgress", "false", "progress bars clutter notebook output")
+    return settings
+
+
+def get_spark(app_name="rsm-msba", memory_fraction=None, **overrides):
+    """Return a SparkSession configured by spark_config(), with overrides applied last"""
+    from pyspark.sql import SparkSession
+
+    active = SparkSession.getActiveSession()
+    if active is not None:
+        print("spark_session: a session is already running; stop it first to apply new memory settings")
+        return active
+
+    builder = SparkSession.builder.appName(app_name)
+    for key, value, _ in spark_config(memory_fraction):
+        if key == "spark.local.dir":
+            os.makedirs(value, exist_ok=True)
+        builder = builder.config(key, value)
+    for key, value in overrides.items():
+        builder = builder.config(key, str(value))
+    return builder.getOrCreate()
+
+
+if __name__ == "__main__":
+    for key, value, reason in spark_config():
+        print(f"{key} = {value}\n    {reason}")
@@ -0,0 +1,217 @@
+"""
+Headless check-pyspark.ipynb plus a TPC-H-like benchmark, default vs tuned session
+
+Runs the notebook's smoke test (createDataFrame/show, versions) and then a
+generated lineitem/orders data set through:
+
+  q1      TPC-H Q1: filter on shipdate, group by returnflag/linestatus,
+          sums and averages over the line items
+  q3      TPC-H Q3-like: join orders and lineitem, revenue per order, top 10
+  pandas  toPandas() of a 1M row aggregate (Arrow on vs off)
+
+once with SparkSession.builder defaults and once with spark_session.get_spark().
+spark.driver.memory only applies at JVM start, so each mode runs in its own
+Python process.
+
+    python files/scalable_analytics/test/bench-pyspark.py --rows 5000000
+    python files/scalable_analytics/test/bench-pyspark.py --modes tuned --output tuned.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def make_session(mode):
+    from pyspark.sql import SparkSession
+
+    if mode == "tuned":
+        from spark_session import get_spark
+
+        return get_spark("bench-pyspark-tuned")
+    return SparkSession.builder.appName("bench-pyspark-default").getOrCreate()
+
+
+def smoke_test(spark):
+    import pyspark
+
+    df = spark.createDataFrame([("John", 28), ("Smith", 35), ("Sarah", 29)], ["Name", "Age"])
+    df.show()
+    print(f"pyspark {pyspark.__version__}, spark {spark.version}")
+
+
+def generate(spark, rows):
+    """lineitem with ~4 lines per order, columns as in TPC-H"""
+    from pyspark.sql import functions as F
+
+    lineitem = spark.range(rows).select(
+        (F.col("id") / 4).cast("long").alias("l_orderkey"),
+        (F.rand(1) * 50 + 1).cast("int").alias("l_quantity"),
+        (F.rand(2) * 100000 + 900).cast("decimal(12,2)").alias("l_extendedprice"),
+        (F.rand(3) * 0.1).cast("decimal(12,2)").alias("l_discount"),
+        (F.rand(4) * 0.08).cast("decimal(12,2)").alias("l_tax"),
+        F.element_at(F.array(F.lit("A"), F.lit("N"), F.lit("R")), (F.rand(5) * 3).cast("int") + 1).alias(
+            "l_returnflag"
+        ),
+        F.element_at(F.array(F.lit("F"), F.lit("O")), (F.rand(6) * 2).cast("int") + 1).alias("l_linestatus"),
+        F.date_add(F.lit("1992-01-01"), (F.rand(7) * 2500).cast("int")).alias("l_shipdate"),
+    )
+    orders = spark.range(rows // 4).select(
+        F.col("id").alias("o_orderkey"),
+        (F.rand(8) * 150000).cast("long").alias("o_custkey"),
+        F.date_add(F.lit("1992-01-01"), (F.rand(9) * 2400).cast("int")).alias("o_orderdate"),
+        F.element_at(
+            F.array(*[F.lit(s) for s in ("1-URGENT", "2-HIGH", "3-MEDIUM", "4-NOT SPECIFIED", "5-LOW")]),
+            (F.rand(10) * 5).cast("int") + 1,
+        ).alias("o_orderpriority"),
+    )
+    # materialize once so the queries measure query execution, not generation
+    return lineitem.cache(), orders.cache()
+
+
+def q1(lineitem):
+    from pyspark.sql import functions as F
+
+    price = F.col("l_extendedprice")
+    disc_price = price * (1 - F.col("l_discount"))
+    return (
+        lineitem.where(F.col("l_shipdate") <= F.lit("1998-09-02"))
+        .groupBy("l_returnflag", "l_linestatus")
+        .agg(
+            F.sum("l_quantity").alias("sum_qty"),
+            F.sum(price).alias("sum_base_price"),
+            F.sum(disc_price).alias("sum_disc_price"),
+            F.sum(disc_price * (1 + F.col("l_tax"))).alias("sum_charge"),
+            F.avg("l_quantity").alias("avg_qty"),
+            F.avg(price).alias("avg_price"),
+            F.avg("l_discount").alias("avg_disc"),
+            F.count("*").alias("count_order"),
+        )
+        .orderBy("l_returnflag", "l_linestatus")
+        .collect()
+    )
+
+
+def q3(lineitem, orders):
+    from pyspark.sql import functions as F
+
+    return (
+        orders.where(F.col("o_orderdate") < F.lit("1995-03-15"))
+        .join(lineitem.where(F.col("l_shipdate") > F.lit("1995-03-15")), F.col("o_orderkey") == F.col("l_orderkey"))
+        .groupBy("l_orderkey", "o_orderdate", "o_orderpriority")
+        .agg(F.sum(F.col("l_extendedprice") * (1 - F.col("l_discount"))).alias("revenue"))
+        .orderBy(F.col("revenue").desc(), "o_orderdate")
+        .limit(10)
+        .collect()
+    )
+
+
+def to_pandas(lineitem):
+    from pyspark.sql import functions as F
+
+    return (
+        lineitem.groupBy("l_orderkey")
+        .agg(F.sum("l_quantity").alias("qty"), F.max("l_shipdate").alias("last_ship"))
+        .limit(1_000_000)
+        .toPandas()
+    )
+
+
+def run_mode(mode, rows, repeat):
+    spark = make_session(mode)
+    conf = spark.sparkContext.getConf()
+    smoke_test(spark)
+
+    start = time.perf_counter()
+    lineitem, orders = generate(spark, rows)
+    lineitem.count()
+    orders.count()
+    timings = {"generate": time.perf_counter() - start}
+
+    for name, query in (
+        ("q1", lambda: q1(lineitem)),
+        ("q3", lambda: q3(lineitem, orders)),
+        ("pandas", lambda: to_pandas(lineitem)),
+    ):
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query()
+            runs.append(time.perf_counter() - start)
+        timings[name] = min(runs)
+
+    result = {
+        "mode": mode,
+        "rows": rows,
+        "timings_s": {name: round(value, 3) for name, value in timings.items()},
+        "conf": {
+            key: conf.get(key, "default")
+            for key in (
+                "spark.master",
+                "spark.driver.memory",
+                "spark.sql.shuffle.partitions",
+                "spark.sql.adaptive.enabled",
+                "spark.sql.execution.arrow.pyspark.enabled",
+            )
+        },
+    }
+    spark.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000, help="lineitem rows")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per query, the fastest is reported")
+    parser.add_argument("--modes", nargs="+", choices=["default", "tuned"], default=["default", "tuned"])
+    parser.add_argument("--output", help="JSON results file")
+    parser.add_argument("--worker", choices=["default", "tuned"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print("RESULT " + json.dumps(run_mode(args.worker, args.rows, args.repeat)))
+        return
+
+    results = []
+    for mode in args.modes:
+        print(f"--- {mode} session ---", flush=True)
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", mode, "--rows", str(args.rows), "--repeat", str(args.repeat)],
+            capture_output=True,
+            text=True,
+        )
+        lines = proc.stdout.splitlines()
+        print("\n".join(line for line in lines if not line.startswith("RESULT ")))
+        found = [json.loads(line[7:]) for line in lines if line.startswith("RESULT ")]
+        if proc.returncode or not found:
+            print(f"{mode} run failed:\n{proc.stderr[-2000:]}")
+            continue
+        results.append(found[0])
+
+    if results:
+        names = list(results[0]["timings_s"])
+        print(f"\n{'mode':<10}" + "".join(f"{name:>10}" for name in names))
+        for result in results:
+            print(f"{result['mode']:<10}" + "".join(f"{result['timings_s'][name]:>10.2f}" for name in names))
+        for result in results:
+            print(f"{result['mode']}: {result['conf']}")
+        by_mode = {result["mode"]: result for result in results}
+        if "default" in by_mode and "tuned" in by_mode:
+            base, tuned = by_mode["default"], by_mode["tuned"]
+            for name in names:
+                if tuned["timings_s"][name]:
+                    print(f"{name}: {base['timings_s'][name] / tuned['timings_s'][name]:.2f}x (default / tuned)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
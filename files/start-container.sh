@@ -3,54 +3,182 @@ set -e
 
 echo "Starting container initialization..."
 
-# If NB_UID/NB_GID are set and SKIP_PERMISSIONS is not true, modify user/group accordingly
-if [ ! -z "$NB_UID" ] && [ ! -z "$NB_GID" ]; then
+# Timing breakdown of each startup phase, printed at the end and written to
+# ${STARTUP_TIMING_LOG} (default ${RSMBASE}/startup-timing.log)
+TIMING_FILE=$(mktemp /tmp/startup-timing.XXXXXX)
+now_ms() { date +%s%3N; }
+START_MS=$(now_ms)
+
+# run_phase <name> <command...>: run a command and record how long it took.
+# set -e is suspended inside the command, so phases return non-zero themselves
+run_phase() {
+    local name=$1
+    shift
+    local t0
+    t0=$(now_ms)
+    local rc=0
+    "$@" || rc=$?
+    echo "${name} ${t0} $(now_ms) ${rc}" >> "${TIMING_FILE}"
+    return ${rc}
+}
+
+# wait_for <name> <timeout seconds> <probe command...>: poll until the probe succeeds
+wait_for() {
+    local name=$1 timeout=$2
+    shift 2
+    local deadline=$(($(now_ms) + timeout * 1000))
+    until "$@" > /dev/null 2>&1; do
+        if [ "$(now_ms)" -ge ${deadline} ]; then
+            echo "${name} not ready after ${timeout}s"
+            return 1
+        fi
+        sleep 0.1
+    done
+}
+
+# Recursive permission fixes are skipped when the UID/GID they were done for
+# have not changed; delete the fingerprint file to force them
+PERMISSIONS_FINGERPRINT="${RSMBASE}/.permissions-fingerprint"
+fingerprint="${NB_UID:-$(id -u ${NB_USER})}:${NB_GID:-users}:${NB_USER}"
+
+fix_user() {
     # Create new group first if it doesn't exist
-    echo "Creating group ${NB_GROUP:-${NB_USER}} with GID: $NB_GID"
-    sudo groupadd -g $NB_GID -o ${NB_GROUP:-${NB_USER}} || true
+    if ! getent group ${NB_GID} > /dev/null; then
+        echo "Creating group ${NB_GROUP:-${NB_USER}} with GID: $NB_GID"
+        sudo groupadd -g $NB_GID -o ${NB_GROUP:-${NB_USER}} || true
+    fi
 
-    # Modify user's primary group and UID
-    echo "Setting ${NB_USER} UID to: $NB_UID and GID to: $NB_GID"
-    sudo usermod -u $NB_UID -g $NB_GID ${NB_USER}
+    # Modify user's primary group and UID (usermod rewrites /etc/passwd and
+    # chowns the home directory, so only when they differ)
+    if [ "$(id -u ${NB_USER})" != "$NB_UID" ] || [ "$(id -g ${NB_USER})" != "$NB_GID" ]; then
+        echo "Setting ${NB_USER} UID to: $NB_UID and GID to: $NB_GID"
+        sudo usermod -u $NB_UID -g $NB_GID ${NB_USER} || return 1
+    else
+        echo "${NB_USER} already has UID $NB_UID and GID $NB_GID"
+    fi
 
     # Only set ownership of essential directories
     if [ "$SKIP_PERMISSIONS" != "true" ]; then
         echo "Setting ownership of essential directories..."
-        sudo chown $NB_UID:$NB_GID /home/${NB_USER}
+        sudo chown $NB_UID:$NB_GID /home/${NB_USER} || return 1
     fi
-fi
+}
 
-if [ "$SKIP_PERMISSIONS" != "true" ]; then
+fix_rsmbase() {
     # Create RSMBASE directories if they don't exist
-    echo "Creating and setting permissions for RSMBASE directories..."
     if [ ! -d "${RSMBASE}/zsh" ]; then
         mkdir -p "${RSMBASE}/zsh"
     fi
-    chmod -R 755 ${RSMBASE}
-    chmod g+s ${RSMBASE}    # set the setgid bit
-    sudo chown -R ${NB_USER}:${NB_GID:-users} ${RSMBASE}
-fi
+    if [ "$(cat "${PERMISSIONS_FINGERPRINT}" 2>/dev/null)" = "${fingerprint}" ]; then
+        echo "RSMBASE permissions already set for ${fingerprint}, skipping recursive fix"
+        chmod 755 ${RSMBASE}
+        chmod g+s ${RSMBASE}    # set the setgid bit
+        return 0
+    fi
+    echo "Creating and setting permissions for RSMBASE directories..."
+    # set -e does not apply inside run_phase, so a failed step has to stop
+    # the fingerprint from being written explicitly
+    chmod -R 755 ${RSMBASE} &&
+        chmod g+s ${RSMBASE} &&    # set the setgid bit
+        sudo chown -R ${NB_USER}:${NB_GID:-users} ${RSMBASE} || {
+        echo "Setting permissions for ${RSMBASE} failed"
+        return 1
+    }
+    echo "${fingerprint}" > "${PERMISSIONS_FINGERPRINT}"
+}
+
+start_sshd() {
+    # Create and set permissions for log files
+    sudo touch /var/log/sshd/sshd.log
+    sudo chown ${NB_USER}:${NB_GID:-users} /var/log/sshd/sshd.log
+    sudo chmod 640 /var/log/sshd/sshd.log
+
+    echo "Starting SSHD service..."
+    sudo /usr/sbin/sshd -E /var/log/sshd/sshd.log
+    wait_for sshd 15 bash -c "</dev/tcp/127.0.0.1/22"
+}
 
-# Create and set permissions for log files
-echo "Creating and setting permissions for log files..."
-sudo touch /var/log/sshd/sshd.log
-sudo chown ${NB_USER}:${NB_GID:-users} /var/log/sshd/sshd.log
-sudo chmod 640 /var/log/sshd/sshd.log
+tune_postgres() {
+    echo "Tuning PostgreSQL for the container's memory and CPU limits..."
+    sudo -u postgres ${PG_TUNE_PYTHON:-/opt/conda/bin/python} /usr/local/bin/pg-tune \
+        --output /etc/postgresql/${POSTGRES_VERSION}/main/conf.d/00-pg-tune.conf || \
+        echo "pg-tune failed, starting PostgreSQL with postgresql.conf as is"
+}
 
-echo "Starting SSHD service..."
-sudo /usr/sbin/sshd -E /var/log/sshd/sshd.log
+wait_for_postgres() {
+    wait_for postgres ${PG_READY_TIMEOUT:-60} \
+        /usr/lib/postgresql/${POSTGRES_VERSION}/bin/pg_isready -q -h 127.0.0.1 -p 8765
+}
+
+start_pgbouncer() {
+    # Transaction pooling for notebooks and psql (PGPORT=6432); PGBOUNCER=off to skip
+    if [ "${PGBOUNCER:-on}" = "off" ] || [ ! -x /usr/sbin/pgbouncer ]; then
+        echo "PgBouncer disabled, connect to postgres directly with PGPORT=8765"
+        return 0
+    fi
+    echo "Starting PgBouncer on port 6432..."
+    printf '"%s" "%s"\n"postgres" "%s"\n' "${NB_USER}" "${PGPASSWORD}" "${PGPASSWORD}" | \
+        sudo -u postgres tee /etc/pgbouncer/userlist.txt > /dev/null
+    sudo chmod 600 /etc/pgbouncer/userlist.txt
+    # SHOW STATS/POOLS for the notebook user, whatever NB_USER is
+    sudo -u postgres sed -i "s/^stats_users = .*/stats_users = ${NB_USER}/" /etc/pgbouncer/pgbouncer.ini
+    sudo -u postgres /usr/sbin/pgbouncer -d /etc/pgbouncer/pgbouncer.ini || {
+        echo "PgBouncer failed to start, connect to postgres directly with PGPORT=8765"
+        return 0
+    }
+    wait_for pgbouncer 15 bash -c "</dev/tcp/127.0.0.1/6432"
+}
+
+set_shell() {
+    # making sure that /bin/zsh is the default
+    if [ "$(getent passwd ${NB_USER} | cut -d: -f7)" != "/bin/zsh" ]; then
+        sudo usermod -s /bin/zsh ${NB_USER} || echo "Failed to change shell"
+    fi
+}
+
+print_timings() {
+    local total=$(($(now_ms) - START_MS))
+    local log=${STARTUP_TIMING_LOG:-${RSMBASE}/startup-timing.log}
+    {
+        echo "Startup timing $(date '+%Y-%m-%d %H:%M:%S') (ms from start, duration ms, exit code)"
+        sort -n -k2 "${TIMING_FILE}" | while read -r name t0 t1 rc; do
+            printf "  %-16s %7d %7d %3d\n" "${name}" $((t0 - START_MS)) $((t1 - t0)) "${rc}"
+        done
+        printf "  %-16s %7s %7d\n" "total" "" ${total}
+    } | tee "${log}" 2>/dev/null || true
+    rm -f "${TIMING_FILE}"
+}
+
+# If NB_UID/NB_GID are set, modify user/group accordingly
+if [ ! -z "$NB_UID" ] && [ ! -z "$NB_GID" ]; then
+    run_phase user fix_user
+fi
+
+# sshd and pg-tune do not depend on the RSMBASE fix, so they start alongside it
+run_phase sshd start_sshd &
+sshd_pid=$!
+run_phase pg-tune tune_postgres
 
 echo "Starting PostgreSQL service..."
 sudo -u postgres /usr/lib/postgresql/${POSTGRES_VERSION}/bin/postgres \
     -c config_file=/etc/postgresql/${POSTGRES_VERSION}/main/postgresql.conf &
 
+if [ "$SKIP_PERMISSIONS" != "true" ]; then
+    run_phase permissions fix_rsmbase
+fi
+run_phase shell set_shell
+
+if run_phase postgres-ready wait_for_postgres; then
+    run_phase pgbouncer start_pgbouncer
+else
+    echo "PostgreSQL did not become ready, check /var/log/postgresql"
+fi
+wait ${sshd_pid} || echo "SSHD did not become ready, check /var/log/sshd/sshd.log"
+
 echo "All services started. Tailing logs..."
+print_timings
 tail -f /var/log/sshd/sshd.log &
-sleep 2
 sudo -u postgres tail -f /var/log/postgresql/postgresql-*.log 2>/dev/null &
 
-# making sure that /bin/zsh is the default
-sudo usermod -s /bin/zsh jovyan || echo "Failed to change shell"
-
 # Wait for all background processes
 wait
@@ -1,4 +1,5 @@
 // Authentication and button clicking script for crawl4ai
+// Expects the helpers in wait-for.js to be prepended by the Python caller
 console.log("Starting authentication and interaction process...");
 
 // Handle authentication if login form is present
@@ -15,26 +16,22 @@ if (loginButton) {
         passwordField.value = PASSWORD_PLACEHOLDER;
         loginButton.click();
         
-        // Wait for authentication to complete
-        await new Promise(r => setTimeout(r, 3000));
+        // Wait for the login form to be replaced by the app
+        await waitFor(() => !document.querySelector("input[type='password']"), 10000);
         console.log("Authentication completed");
     }
 } else {
     console.log("No authentication required");
 }
 
-// Wait for page to stabilize, then interact with showText button
-await new Promise(r => setTimeout(r, 1000));
-
-const showTextButton = document.getElementById('showText');
+// Wait for Shiny to bind the button, then interact with it
+const showTextButton = await waitForShinyButton('showText');
 if (showTextButton) {
     console.log("Clicking showText button...");
     showTextButton.click();
     
     // Wait for dynamic content to appear
-    await new Promise(r => setTimeout(r, 1000));
-    
-    const dynamicText = document.getElementById('dynamicText');
+    const dynamicText = await waitForText('dynamicText');
     console.log("Result:", dynamicText ? dynamicText.textContent : "Dynamic text not found");
 } else {
     console.log("Error: showText button not found");
@@ -0,0 +1,122 @@
+"""
+Compare fast_extract with the BeautifulSoup html.parser approach
+
+Builds synthetic product-listing pages (--items rows each) and times
+
+- "bs4 repeated": BeautifulSoup(html, "html.parser") followed by one
+  soup.find per field per row, as in the scraping scripts
+- "compiled <backend>": fast_extract.compile_schema, one parse per page,
+  for every parser backend that is installed
+- "extract_many": the fastest backend over all pages in a process pool
+
+    python files/webscrapers/benchmarks/bench-extraction.py --pages 40 --items 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from fast_extract import BACKENDS, compile_schema, extract_many  # noqa: E402
+
+SCHEMA = {
+    "name": "Products",
+    "baseSelector": "div.product",
+    "fields": [
+        {"name": "name", "selector": "h2.name", "type": "text"},
+        {"name": "price", "selector": "span.price", "type": "text"},
+        {"name": "url", "selector": "a.details", "type": "attribute", "attribute": "href"},
+        {"name": "rating", "selector": "span.rating", "type": "text"},
+    ],
+}
+
+
+def make_page(items, seed):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(items):
+        rows.append(
+            f'<div class="product" id="p{i}"><h2 class="name">Product {i}</h2>'
+            f'<p class="desc">{"lorem ipsum " * rng.randint(5, 30)}</p>'
+            f'<span class="price">${rng.randint(1, 999)}.99</span>'
+            f'<span class="rating">{rng.randint(1, 5)}</span>'
+            f'<a class="details" href="/product/{i}">details</a></div>'
+        )
+    return (
+        "<html><head><title>Scraping Demo Page</title></head><body>"
+        + "".join(rows)
+        + '<button id="showText">Click Me!</button><div id="dynamicText"></div>'
+        + "</body></html>"
+    )
+
+
+def bs4_repeated(html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    rows = []
+    for product in soup.find_all("div", class_="product"):
+        name = product.find("h2", class_="name")
+        price = product.find("span", class_="price")
+        link = product.find("a", class_="details")
+        rating = product.find("span", class_="rating")
+        rows.append(
+            {
+                "name": name.get_text(strip=True) if name else None,
+                "price": price.get_text(strip=True) if price else None,
+                "url": link.get("href") if link else None,
+                "rating": rating.get_text(strip=True) if rating else None,
+            }
+        )
+    return rows
+
+
+def timed(label, func, pages, baseline=None):
+    start = time.perf_counter()
+    results = func(pages)
+    elapsed = time.perf_counter() - start
+    rows = sum(len(r) for r in results)
+    line = f"{label:<24} {elapsed * 1000:>9.0f} ms {rows / elapsed:>12,.0f} rows/s"
+    if baseline:
+        line += f" {baseline / elapsed:>7.1f}x"
+    print(line)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    pages = [make_page(args.items, seed) for seed in range(args.pages)]
+    size_mb = sum(len(p) for p in pages) / 1e6
+    print(f"{args.pages} pages, {args.items} products each, {size_mb:.1f} MB of HTML")
+    print(f"Installed backends: {', '.join(BACKENDS)}\n")
+
+    baseline = None
+    if "bs4" in BACKENDS:
+        baseline = timed("bs4 repeated", lambda ps: [bs4_repeated(p) for p in ps], pages)
+
+    for backend in BACKENDS:
+        compiled = compile_schema(SCHEMA, backend)
+        timed(
+            f"compiled {backend}",
+            lambda ps: [compiled.extract(p) for p in ps],
+            pages,
+            baseline,
+        )
+
+    timed(
+        f"extract_many x{args.processes}",
+        lambda ps: extract_many(SCHEMA, ps, processes=args.processes),
+        pages,
+        baseline,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""
+Load test the scraper services against a local Shiny replica
+
+Starts shiny_replica.py on a background thread and drives each target at
+rising concurrency:
+
+- server    the FastAPI Playwright server (POST /playwright)
+- cdp       the Playwright/CDP container through the shared CDPClient
+- crawl4ai  the crawl4ai Docker server (Crawl4aiDockerClient)
+
+For every target, action and concurrency level it records throughput,
+p50/p95/p99 latency, failures and peak RSS (summed over local processes
+matching --rss-pattern, plus this client) to a JSON file. Pass --compare
+with an earlier results file to print the change per level.
+
+    python files/webscrapers/playwright-server.py &
+    python files/webscrapers/benchmarks/bench-scrapers.py \\
+        --targets server cdp --concurrency 1 4 16 --requests 64 \\
+        --output results.json --compare previous.json
+
+Browsers running in another container need the replica under a name they
+can reach, e.g. --public-host rsm-msba-k8s-latest.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import re
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from shiny_replica import DYNAMIC_TEXT, start_in_thread  # noqa: E402
+
+DEFAULT_RSS_PATTERNS = {
+    "server": r"playwright-server|chrom",
+    "cdp": r"chrom",
+    "crawl4ai": r"chrom|crawl4ai",
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def process_rss(pattern):
+    """Summed RSS in bytes of local processes whose command line matches"""
+    regex = re.compile(pattern)
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read().replace(b"\0", b" ").decode(errors="replace")
+            if not regex.search(cmdline):
+                continue
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+
+async def sample_rss(pattern, peak, interval=0.25):
+    while True:
+        peak[0] = max(peak[0], process_rss(pattern))
+        await asyncio.sleep(interval)
+
+
+# === Targets ===
+# Each target returns an async run(action) -> bool (True when the dynamic text
+# was scraped) and an async close()
+
+
+class ServerTarget:
+    def __init__(self, args, urls):
+        import httpx
+
+        self.args = args
+        self.urls = urls
+        self.http = httpx.AsyncClient(base_url=args.server, timeout=120)
+        # how each request was served (render cache status, session login or
+        # reuse), counted per level (see run_level)
+        self.cache_use = {}
+
+    def count(self, name):
+        self.cache_use[name] = self.cache_use.get(name, 0) + 1
+
+    async def run(self, action):
+        # the render cache would turn later requests into lookups; timings
+        # show whether the auth action logged in or reused a cached session
+        payload = {
+            "url": self.urls["app"],
+            "action": action,
+            "cache": False,
+            "return_timings": True,
+        }
+        if action == "auth":
+            payload.update(
+                url=self.urls["auth"],
+                auth_url=self.urls["auth"],
+                username=self.args.username,
+                password=self.args.password,
+            )
+        response = await self.http.post("/playwright", json=payload)
+        result = response.json()
+        self.count(f"page_{result.get('cache_status') or 'off'}")
+        if action == "auth" and result.get("success"):
+            timings = result.get("timings") or {}
+            self.count("session_login" if "auth" in timings else "session_reused")
+        if action == "basic":
+            return bool(result.get("success") and result.get("button_exists"))
+        return bool(result.get("success") and result.get("dynamic_text") == DYNAMIC_TEXT)
+
+    async def close(self):
+        await self.http.aclose()
+
+
+class CDPTarget:
+    def __init__(self, args, urls):
+        from cdp_client import CDPClient
+
+        self.args = args
+        self.urls = urls
+        self.cdp = CDPClient(
+            endpoints=args.cdp_endpoints.split(",") if args.cdp_endpoints else None,
+            max_contexts=max(args.concurrency),
+        )
+
+    async def run(self, action):
+        async with self.cdp.page() as page:
+            if action == "auth":
+                await page.goto(self.urls["auth"])
+                await page.fill("input[type='text']", self.args.username)
+                await page.fill("input[type='password']", self.args.password)
+                async with page.expect_navigation():
+                    await page.click("input[type='submit']")
+            else:
+                await page.goto(self.urls["app"])
+            if action == "basic":
+                return await page.locator("#showText").count() > 0
+            await page.wait_for_selector("#showText.shiny-bound-input", timeout=10000)
+            await page.click("#showText")
+            await page.wait_for_function(
+                "() => document.querySelector('#dynamicText').textContent.length > 0",
+                timeout=10000,
+            )
+            return await page.text_content("#dynamicText") == DYNAMIC_TEXT
+
+    async def close(self):
+        await self.cdp.close()
+
+
+class Crawl4aiTarget:
+    def __init__(self, args, urls):
+        from crawl4ai import BrowserConfig, CacheMode, CrawlerRunConfig
+        from crawl4ai.docker_client import Crawl4aiDockerClient
+
+        self.args = args
+        self.urls = urls
+        self.client = Crawl4aiDockerClient(base_url=args.crawl4ai, verify_ssl=False)
+        self.browser_config = BrowserConfig(headless=True, java_script_enabled=True)
+        webscrapers = os.path.join(os.path.dirname(__file__), "..")
+        with open(os.path.join(webscrapers, "wait-for.js")) as f:
+            wait_for_js = f.read()
+        with open(os.path.join(webscrapers, "auth_and_click.js")) as f:
+            auth_js = (
+                f.read()
+                .replace("USERNAME_PLACEHOLDER", json.dumps(args.username))
+                .replace("PASSWORD_PLACEHOLDER", json.dumps(args.password))
+            )
+        click_js = (
+            "(await waitForShinyButton('showText')).click(); await waitForText('dynamicText');"
+        )
+        self.configs = {
+            "basic": CrawlerRunConfig(cache_mode=CacheMode.BYPASS),
+            "click": CrawlerRunConfig(
+                cache_mode=CacheMode.BYPASS, js_code=[wait_for_js + click_js]
+            ),
+            "auth": CrawlerRunConfig(
+                cache_mode=CacheMode.BYPASS, js_code=[wait_for_js + auth_js]
+            ),
+        }
+        self._entered = False
+
+    async def run(self, action):
+        if not self._entered:
+            await self.client.__aenter__()
+            if self.args.crawl4ai_email:
+                await self.client.authenticate(email=self.args.crawl4ai_email)
+            self._entered = True
+        url = self.urls["auth"] if action == "auth" else self.urls["app"]
+        result = await self.client.crawl(
+            [url], browser_config=self.browser_config, crawler_config=self.configs[action]
+        )
+        if not result or not result.success:
+            return False
+        if action == "basic":
+            return "showText" in (result.html or "")
+        return DYNAMIC_TEXT in (result.html or "")
+
+    async def close(self):
+        if self._entered:
+            await self.client.__aexit__(None, None, None)
+
+
+TARGETS = {"server": ServerTarget, "cdp": CDPTarget, "crawl4ai": Crawl4aiTarget}
+
+
+async def run_level(target, action, concurrency, requests, rss_pattern):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+    errors = {}
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok = await target.run(action)
+            except Exception as e:
+                ok = False
+                name = type(e).__name__
+                errors[name] = errors.get(name, 0) + 1
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not ok:
+                failures += 1
+
+    cache_use = getattr(target, "cache_use", None)
+    if cache_use is not None:
+        cache_use.clear()
+
+    peak = [0]
+    sampler = asyncio.create_task(sample_rss(rss_pattern, peak))
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[one() for _ in range(requests)])
+    finally:
+        sampler.cancel()
+    wall = time.perf_counter() - start
+    peak[0] = max(peak[0], process_rss(rss_pattern))
+
+    result = {
+        "action": action,
+        "concurrency": concurrency,
+        "requests": requests,
+        "succeeded": requests - failures,
+        "failed": failures,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round((requests - failures) / wall, 3) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "mean_ms": round(statistics.mean(latencies), 1),
+        "peak_rss_mb": round(peak[0] / 2**20, 1),
+        # ru_maxrss is in KiB on Linux and only grows over the run
+        "client_peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+    if cache_use is not None:
+        result["cache_use"] = dict(sorted(cache_use.items()))
+    return result
+
+
+async def run_target(name, args, urls):
+    target = TARGETS[name](args, urls)
+    rss_pattern = args.rss_pattern or DEFAULT_RSS_PATTERNS[name]
+    results = []
+    try:
+        # warm up connections, browser pools and sessions
+        for action in args.actions:
+            try:
+                await target.run(action)
+            except Exception as e:
+                print(f"{name}: warm-up {action} failed: {e}")
+        for action in args.actions:
+            for concurrency in args.concurrency:
+                requests = max(args.requests, concurrency)
+                result = await run_level(target, action, concurrency, requests, rss_pattern)
+                result["target"] = name
+                results.append(result)
+                print(
+                    f"{name:<9} {action:<6} c={concurrency:<3} "
+                    f"{result['throughput_rps']:>7.2f} rps  p50 {result['p50_ms']:>7.0f}  "
+                    f"p95 {result['p95_ms']:>7.0f}  p99 {result['p99_ms']:>7.0f} ms  "
+                    f"failed {result['failed']:>3}  rss {result['peak_rss_mb']:>7.0f} MB"
+                )
+    finally:
+        await target.close()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    before = {
+        (r["target"], r["action"], r["concurrency"]): r for r in previous["results"]
+    }
+    print(f"\nCompared with {previous_path} ({previous['meta'].get('commit')})")
+    for r in results:
+        old = before.get((r["target"], r["action"], r["concurrency"]))
+        if old is None:
+            continue
+
+        def change(key):
+            if not old[key]:
+                return "   n/a"
+            return f"{(r[key] - old[key]) / old[key] * 100:+6.1f}%"
+
+        print(
+            f"{r['target']:<9} {r['action']:<6} c={r['concurrency']:<3} "
+            f"rps {change('throughput_rps')}  p50 {change('p50_ms')}  "
+            f"p95 {change('p95_ms')}  p99 {change('p99_ms')}  rss {change('peak_rss_mb')}"
+        )
+        if r.get("cache_use") != old.get("cache_use"):
+            print(f"{'':<9} cache use differs: {old.get('cache_use')} -> {r.get('cache_use')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--targets", nargs="+", default=["server"], choices=list(TARGETS))
+    parser.add_argument(
+        "--actions", nargs="+", default=["basic", "click", "auth"], choices=["basic", "click", "auth"]
+    )
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=32, help="requests per level")
+    parser.add_argument("--server", default="http://127.0.0.1:8000")
+    parser.add_argument("--cdp-endpoints", default=None, help="comma separated, see cdp_client.py")
+    parser.add_argument("--crawl4ai", default="http://127.0.0.1:11235")
+    parser.add_argument("--crawl4ai-email", default=os.getenv("CRAWL4AI_EMAIL"))
+    parser.add_argument("--replica-port", type=int, default=8123)
+    parser.add_argument("--public-host", default="127.0.0.1", help="replica host as seen by the browsers")
+    parser.add_argument("--bind-delay", type=int, default=300)
+    parser.add_argument("--latency", type=int, default=50)
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench")
+    parser.add_argument("--rss-pattern", default=None, help="regex for processes counted in peak RSS")
+    parser.add_argument("--output", default=None, help="JSON results file")
+    parser.add_argument("--compare", default=None, help="earlier JSON results file")
+    args = parser.parse_args()
+
+    replica = start_in_thread(
+        port=args.replica_port,
+        bind_delay=args.bind_delay,
+        latency=args.latency,
+        credentials=(args.username, args.password),
+    )
+    base = f"http://{args.public_host}:{replica.server_port}"
+    urls = {"app": f"{base}/selenium/", "auth": f"{base}/selenium_auth/"}
+    print(f"Shiny replica serving {urls['app']} and {urls['auth']}")
+
+    results = []
+    for name in args.targets:
+        try:
+            results.extend(asyncio.run(run_target(name, args, urls)))
+        except Exception as e:
+            print(f"{name}: skipped ({type(e).__name__}: {e})")
+    replica.shutdown()
+
+    output = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "host": socket.gethostname(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k != "password"},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare post-click wait strategies of the FastAPI Playwright server
+
+Start the Shiny test page and the server first, e.g.
+
+    R -e 'shiny::runApp("files/webscrapers/app.R", host = "0.0.0.0", port = 8123)'
+    python files/webscrapers/playwright-server.py
+
+then run
+
+    python files/webscrapers/benchmarks/bench-wait-strategies.py --runs 30
+
+The "fixed" strategy reproduces the old 1000 ms sleep after the click.
+"""
+
+import argparse
+import statistics
+import time
+
+import requests
+
+STRATEGIES = {
+    "fixed": {"wait_strategy": "fixed", "wait_timeout_ms": 1000},
+    "selector": {"wait_strategy": "selector"},
+    "text_change": {"wait_strategy": "text_change"},
+    "mutation": {"wait_strategy": "mutation"},
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_strategy(server, url, options, runs):
+    latencies = []
+    failures = 0
+    for _ in range(runs):
+        payload = {"url": url, "action": "click", **options}
+        start = time.perf_counter()
+        response = requests.post(f"{server}/playwright", json=payload, timeout=60)
+        elapsed = (time.perf_counter() - start) * 1000
+        result = response.json()
+        if not result.get("success") or not result.get("dynamic_text"):
+            failures += 1
+        latencies.append(elapsed)
+    return latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--server", default="http://127.0.0.1:8000")
+    parser.add_argument("--url", default="http://127.0.0.1:8123")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument(
+        "--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES)
+    )
+    args = parser.parse_args()
+
+    # warm up the browser pool so the first strategy is not penalized
+    requests.post(f"{args.server}/playwright", json={"url": args.url}, timeout=60)
+
+    print(f"{'strategy':<12} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'failed':>7}")
+    baseline = None
+    for name in args.strategies:
+        latencies, failures = run_strategy(
+            args.server, args.url, STRATEGIES[name], args.runs
+        )
+        p50 = percentile(latencies, 50)
+        p95 = percentile(latencies, 95)
+        line = f"{name:<12} {p50:>8.0f} {p95:>8.0f} {statistics.mean(latencies):>8.0f} {failures:>7}"
+        if baseline is None:
+            baseline = p50
+        else:
+            line += f"   p50 {p50 - baseline:+.0f} ms vs {args.strategies[0]}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Local stand-in for the selenium and selenium_auth Shiny test pages
+
+Serves the same elements as app.R without R or a network round trip to
+rsm-shiny-02.ucsd.edu:
+
+- /selenium/        title "Scraping Demo Page", button#showText and an empty
+                    #dynamicText; the button gets the shiny-bound-input class
+                    after --bind-delay ms (Shiny binding inputs once its
+                    websocket connects) and a click fetches /selenium/update,
+                    which answers after --latency ms
+- /selenium_auth/   the same page behind a login form (input[type=text],
+                    input[type=password], input[type=submit][value="Log in"])
+                    that sets a session cookie
+
+Pages carry an ETag so conditional requests get a 304.
+
+    python files/webscrapers/benchmarks/shiny_replica.py --port 8123
+"""
+
+import argparse
+import hashlib
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+DYNAMIC_TEXT = "This text was dynamically generated!"
+
+APP_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Scraping Demo Page</title></head>
+<body>
+<div class="container-fluid">
+  <h2>Scraping Demo Page</h2>
+  <div class="col-sm-8">
+    <button id="showText" type="button" class="btn btn-default action-button">Click Me!</button>
+    <div id="dynamicText" class="shiny-text-output"></div>
+  </div>
+</div>
+<script>
+window.Shiny = {};
+setTimeout(() => {
+  const button = document.getElementById("showText");
+  button.classList.add("shiny-bound-input");
+  button.addEventListener("click", async () => {
+    const response = await fetch("update", {method: "POST"});
+    document.getElementById("dynamicText").textContent = await response.text();
+  });
+}, BIND_DELAY);
+</script>
+</body>
+</html>
+"""
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Log in</title></head>
+<body>
+<form method="post" action="login">
+  <input type="text" name="username">
+  <input type="password" name="password">
+  <input type="submit" value="Log in">
+</form>
+</body>
+</html>
+"""
+
+
+class ReplicaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # set by make_server
+    bind_delay = 300
+    latency = 50
+    credentials = ("bench", "bench")
+    sessions = set()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_page(self, html):
+        body = html.encode()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send(200, body, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    def logged_in(self):
+        for part in self.headers.get("Cookie", "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "replica_session" and value in self.sessions:
+                return True
+        return False
+
+    def app_page(self):
+        return APP_PAGE.replace("BIND_DELAY", str(self.bind_delay))
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path in ("/", "/selenium", "/selenium/"):
+            if path != "/selenium/":
+                self.send(302, headers={"Location": "/selenium/"})
+            else:
+                self.send_page(self.app_page())
+        elif path in ("/selenium_auth", "/selenium_auth/"):
+            if path != "/selenium_auth/":
+                self.send(302, headers={"Location": "/selenium_auth/"})
+            elif self.logged_in():
+                self.send_page(self.app_page())
+            else:
+                self.send_page(LOGIN_PAGE)
+        elif path == "/health":
+            self.send(200, b"ok", "text/plain")
+        else:
+            self.send(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length).decode() if length else ""
+        if path in ("/selenium/update", "/selenium_auth/update"):
+            if path.startswith("/selenium_auth") and not self.logged_in():
+                self.send(403, b"forbidden", "text/plain")
+                return
+            time.sleep(self.latency / 1000)
+            self.send(200, DYNAMIC_TEXT.encode(), "text/plain")
+        elif path == "/selenium_auth/login":
+            form = parse_qs(data)
+            username = form.get("username", [""])[0]
+            password = form.get("password", [""])[0]
+            if (username, password) == self.credentials:
+                token = secrets.token_hex(16)
+                self.sessions.add(token)
+                self.send(
+                    302,
+                    headers={
+                        "Location": "/selenium_auth/",
+                        "Set-Cookie": f"replica_session={token}; Path=/selenium_auth",
+                    },
+                )
+            else:
+                self.send_page(LOGIN_PAGE)
+        else:
+            self.send(404, b"not found", "text/plain")
+
+
+def make_server(host="0.0.0.0", port=8123, bind_delay=300, latency=50, credentials=("bench", "bench")):
+    handler = type(
+        "Handler",
+        (ReplicaHandler,),
+        {
+            "bind_delay": bind_delay,
+            "latency": latency,
+            "credentials": tuple(credentials),
+            "sessions": set(),
+        },
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(**options):
+    """Start the replica on a background thread and return the server"""
+    server = make_server(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--bind-delay", type=int, default=300, help="ms before the button is bound")
+    parser.add_argument("--latency", type=int, default=50, help="ms for the click round trip")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench")
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port, args.bind_delay, args.latency, (args.username, args.password)
+    )
+    print(f"Shiny replica on http://{args.host}:{args.port}/selenium/ and /selenium_auth/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+CDP farm: several headless Chromium instances behind one CDP endpoint
+
+start-playwright.sh runs this when CDP_INSTANCES is larger than 1. Each
+Chromium gets its own debugging port and profile directory. The front end
+listens on the public CDP port and
+
+- answers /json/version with the webSocketDebuggerUrl of the least-loaded
+  instance, rewritten to point back at the front end
+- proxies /devtools/browser/<id> websocket connections to the instance that
+  owns that browser id (and /devtools/page/<id> to the instance with that
+  target)
+- health-checks instances and restarts the ones that died or stopped
+  answering
+- reports per-instance load on /farm/status
+
+Only the standard library is used so it runs with the system python3 in the
+Playwright image.
+
+    python3 cdp-farm.py --instances 4 --listen-port 9222 -- --headless --no-sandbox
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import shutil
+import signal
+import time
+
+CHROME_BIN = os.getenv("CHROME_BIN", "/ms-playwright/chromium-1169/chrome-linux/chrome")
+# how long a /json/version hand-out counts as load before its websocket arrives
+PENDING_TTL = 10.0
+
+
+def _read_first(*paths):
+    for path in paths:
+        try:
+            with open(path) as f:
+                return f.read().strip()
+        except OSError:
+            continue
+    return None
+
+
+def cpu_limit():
+    """CPUs this container may use, rounded up: the cgroup quota when there
+    is one, otherwise the CPUs the process is allowed to run on. os.cpu_count()
+    is the host's count, far more than a 2-CPU pod on a large node gets."""
+    try:
+        host = len(os.sched_getaffinity(0))
+    except AttributeError:
+        host = os.cpu_count() or 1
+    v2 = _read_first("/sys/fs/cgroup/cpu.max")
+    if v2 is not None:
+        quota, _, period = v2.partition(" ")
+        if quota != "max":
+            return max(1, min(host, math.ceil(int(quota) / int(period or 100000))))
+    quota = _read_first("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us")
+    period = _read_first("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_period_us")
+    if quota is not None and int(quota) > 0 and period:
+        return max(1, min(host, math.ceil(int(quota) / int(period))))
+    return host
+
+
+async def http_get(port, path, timeout=2.0):
+    """Minimal HTTP GET against a local Chromium debugging port"""
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection("127.0.0.1", port), timeout
+    )
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+            "Connection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split()[1])
+        length = None
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        if length is None:
+            body = await asyncio.wait_for(reader.read(), timeout)
+        else:
+            body = await asyncio.wait_for(reader.readexactly(length), timeout)
+        return status, body
+    finally:
+        writer.close()
+
+
+class ChromeInstance:
+    def __init__(self, index, port, flags):
+        self.index = index
+        self.port = port
+        self.flags = flags
+        self.profile_dir = f"/tmp/cdp-farm-{index}"
+        self.process = None
+        self.browser_id = None
+        self.connections = 0
+        self.pending = []
+        self.failures = 0
+        self.restarts = 0
+
+    @property
+    def load(self):
+        now = time.monotonic()
+        self.pending = [t for t in self.pending if now - t < PENDING_TTL]
+        return self.connections + len(self.pending)
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self, ready_timeout=20.0):
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        self.process = await asyncio.create_subprocess_exec(
+            CHROME_BIN,
+            *self.flags,
+            "--remote-debugging-address=127.0.0.1",
+            f"--remote-debugging-port={self.port}",
+            f"--user-data-dir={self.profile_dir}",
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + ready_timeout
+        while time.monotonic() < deadline:
+            if not self.alive:
+                break
+            try:
+                await self.version()
+                self.failures = 0
+                print(f"Chromium {self.index} ready on port {self.port}")
+                return
+            except (OSError, asyncio.TimeoutError, ValueError):
+                await asyncio.sleep(0.2)
+        raise RuntimeError(f"Chromium {self.index} did not start on port {self.port}")
+
+    async def stop(self):
+        if self.alive:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+
+    async def restart(self):
+        self.restarts += 1
+        print(f"Restarting Chromium {self.index} (restart #{self.restarts})")
+        await self.stop()
+        self.browser_id = None
+        self.pending = []
+        await self.start()
+
+    async def version(self):
+        status, body = await http_get(self.port, "/json/version")
+        if status != 200:
+            raise ValueError(f"/json/version returned {status}")
+        info = json.loads(body)
+        self.browser_id = info["webSocketDebuggerUrl"].rsplit("/", 1)[-1]
+        return info
+
+    async def has_target(self, target_id):
+        try:
+            status, body = await http_get(self.port, "/json/list")
+        except (OSError, asyncio.TimeoutError):
+            return False
+        return status == 200 and any(t.get("id") == target_id for t in json.loads(body))
+
+
+class CDPFarm:
+    def __init__(self, instances, listen_host, listen_port, health_interval):
+        self.instances = instances
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.health_interval = health_interval
+
+    def least_loaded(self):
+        healthy = [i for i in self.instances if i.alive and i.browser_id]
+        if not healthy:
+            return None
+        return min(healthy, key=lambda i: i.load)
+
+    async def find_instance(self, path):
+        kind, _, target_id = path.rpartition("/")
+        if kind.endswith("/devtools/browser"):
+            for instance in self.instances:
+                if instance.browser_id == target_id:
+                    return instance
+            return None
+        for instance in self.instances:
+            if instance.alive and await instance.has_target(target_id):
+                return instance
+        return None
+
+    async def health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for instance in self.instances:
+                try:
+                    if not instance.alive:
+                        raise RuntimeError("process exited")
+                    await instance.version()
+                    instance.failures = 0
+                except Exception as e:
+                    instance.failures += 1
+                    print(f"Chromium {instance.index} health check failed: {e}")
+                    if not instance.alive or instance.failures >= 3:
+                        try:
+                            await instance.restart()
+                        except Exception as e:
+                            print(f"Chromium {instance.index} restart failed: {e}")
+
+    def status(self):
+        return {
+            "instances": [
+                {
+                    "index": i.index,
+                    "port": i.port,
+                    "alive": i.alive,
+                    "connections": i.connections,
+                    "load": i.load,
+                    "restarts": i.restarts,
+                }
+                for i in self.instances
+            ]
+        }
+
+    @staticmethod
+    async def respond(writer, status, body, content_type="application/json"):
+        reason = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        writer.close()
+
+    @staticmethod
+    async def pipe(reader, writer):
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            writer.close()
+            return
+
+        lines = head.decode("latin-1").split("\r\n")
+        path = lines[0].split()[1] if len(lines[0].split()) > 1 else "/"
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        host = headers.get("host", f"127.0.0.1:{self.listen_port}")
+
+        if path == "/farm/status":
+            await self.respond(writer, 200, json.dumps(self.status()).encode())
+            return
+
+        if path.startswith("/json/version"):
+            instance = self.least_loaded()
+            if instance is None:
+                await self.respond(writer, 503, b'{"error": "no healthy browser"}')
+                return
+            try:
+                info = await instance.version()
+            except Exception:
+                await self.respond(writer, 503, b'{"error": "browser not responding"}')
+                return
+            instance.pending.append(time.monotonic())
+            ws_path = info["webSocketDebuggerUrl"].split("/", 3)[-1]
+            info["webSocketDebuggerUrl"] = f"ws://{host}/{ws_path}"
+            await self.respond(writer, 200, json.dumps(info).encode())
+            return
+
+        if path.startswith("/devtools/"):
+            instance = await self.find_instance(path)
+        else:
+            # other /json endpoints are answered by the least-loaded browser
+            instance = self.least_loaded()
+        if instance is None:
+            await self.respond(writer, 404, b'{"error": "unknown browser or target"}')
+            return
+
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection(
+                "127.0.0.1", instance.port
+            )
+        except OSError:
+            await self.respond(writer, 503, b'{"error": "browser not responding"}')
+            return
+
+        # Chromium only accepts IP or localhost Host headers
+        rewritten = [
+            f"Host: 127.0.0.1:{instance.port}" if line.lower().startswith("host:") else line
+            for line in lines
+        ]
+        upstream_writer.write("\r\n".join(rewritten).encode("latin-1"))
+        await upstream_writer.drain()
+
+        is_websocket = headers.get("upgrade", "").lower() == "websocket"
+        if is_websocket:
+            instance.connections += 1
+            if instance.pending:
+                instance.pending.pop(0)
+        try:
+            tasks = [
+                asyncio.create_task(self.pipe(reader, upstream_writer)),
+                asyncio.create_task(self.pipe(upstream_reader, writer)),
+            ]
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in tasks:
+                task.cancel()
+        finally:
+            if is_websocket:
+                instance.connections -= 1
+
+    async def run(self):
+        await asyncio.gather(*[instance.start() for instance in self.instances])
+        server = await asyncio.start_server(
+            self.handle, self.listen_host, self.listen_port
+        )
+        print(
+            f"CDP farm with {len(self.instances)} browsers listening on "
+            f"{self.listen_host}:{self.listen_port}"
+        )
+        health = asyncio.create_task(self.health_loop())
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await stop.wait()
+
+        health.cancel()
+        server.close()
+        await asyncio.gather(*[instance.stop() for instance in self.instances])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-balanced Chromium CDP farm")
+    parser.add_argument(
+        "--instances",
+        default=os.getenv("CDP_INSTANCES", "auto"),
+        help="number of browsers or 'auto' for one per CPU of the container's limit",
+    )
+    parser.add_argument("--base-port", type=int, default=9300)
+    parser.add_argument("--listen-host", default="0.0.0.0")
+    parser.add_argument("--listen-port", type=int, default=9222)
+    parser.add_argument("--health-interval", type=float, default=5.0)
+    parser.add_argument("chrome_flags", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if args.instances == "auto":
+        count = cpu_limit()
+    else:
+        count = int(args.instances)
+    flags = [f for f in args.chrome_flags if f != "--"]
+    instances = [
+        ChromeInstance(i, args.base_port + i, flags) for i in range(max(1, count))
+    ]
+    farm = CDPFarm(instances, args.listen_host, args.listen_port, args.health_interval)
+    asyncio.run(farm.run())
+
+
+if __name__ == "__main__":
+    main()
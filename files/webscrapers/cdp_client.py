@@ -0,0 +1,181 @@
+"""
+Shared CDP connection to the Docker Playwright browser (rsm-playwright)
+
+One connection is kept open for the life of the client and browser contexts
+are handed out concurrently, so scraping jobs on the rsm-docker network do not
+pay for a probe, a Playwright start and a CDP handshake per job.
+
+    async with CDPClient() as cdp:
+        async with cdp.page() as page:
+            await page.goto("https://example.com")
+
+Endpoints are probed with a non-blocking HTTP client and the
+webSocketDebuggerUrl is cached until a connection attempt fails. If the
+browser goes away (container restart, crash) the next context request
+reconnects automatically.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from playwright.async_api import async_playwright
+
+# Comma separated list of CDP HTTP endpoints, tried concurrently
+DEFAULT_ENDPOINTS = os.getenv(
+    "CDP_ENDPOINTS", "http://127.0.0.1:9222,http://rsm-playwright:9222"
+).split(",")
+
+
+class CDPUnavailable(RuntimeError):
+    pass
+
+
+class CDPClient:
+    def __init__(
+        self,
+        endpoints=None,
+        max_contexts=16,
+        probe_timeout=2.0,
+        ws_url_ttl=300.0,
+        verbose=False,
+    ):
+        self.endpoints = [
+            e.strip().replace("ws://", "http://").rstrip("/")
+            for e in (endpoints or DEFAULT_ENDPOINTS)
+            if e.strip()
+        ]
+        self.probe_timeout = probe_timeout
+        self.ws_url_ttl = ws_url_ttl
+        self.verbose = verbose
+        self.reconnects = 0
+        self._connected_once = False
+        self._ws_url = None
+        self._ws_url_time = 0.0
+        self._playwright = None
+        self._browser = None
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(max_contexts)
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    async def _probe_one(self, http, endpoint):
+        response = await http.get(f"{endpoint}/json/version")
+        response.raise_for_status()
+        ws_url = response.json().get("webSocketDebuggerUrl")
+        if not ws_url:
+            raise CDPUnavailable(f"{endpoint} did not return a webSocketDebuggerUrl")
+        return ws_url
+
+    async def probe(self, refresh=False):
+        """Return the webSocketDebuggerUrl of the first endpoint that answers"""
+        fresh = time.monotonic() - self._ws_url_time < self.ws_url_ttl
+        if self._ws_url and fresh and not refresh:
+            return self._ws_url
+
+        errors = []
+        async with httpx.AsyncClient(timeout=self.probe_timeout) as http:
+            tasks = [
+                asyncio.create_task(self._probe_one(http, endpoint))
+                for endpoint in self.endpoints
+            ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    try:
+                        self._ws_url = await next_done
+                        self._ws_url_time = time.monotonic()
+                        self._log(f"CDP endpoint found: {self._ws_url}")
+                        return self._ws_url
+                    except Exception as e:
+                        errors.append(str(e))
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        self._ws_url = None
+        raise CDPUnavailable(
+            f"No CDP endpoint available ({', '.join(self.endpoints)}): {errors}"
+        )
+
+    def _on_disconnected(self, browser):
+        if browser is self._browser:
+            self._log("CDP connection lost")
+            self._browser = None
+
+    async def connect(self):
+        """Return the shared browser, (re)connecting when needed"""
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+
+        async with self._lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            if self._connected_once:
+                self.reconnects += 1
+
+            ws_url = await self.probe()
+            try:
+                browser = await self._playwright.chromium.connect_over_cdp(ws_url)
+            except Exception:
+                # the browser behind a cached URL may have restarted
+                ws_url = await self.probe(refresh=True)
+                browser = await self._playwright.chromium.connect_over_cdp(ws_url)
+
+            browser.on("disconnected", self._on_disconnected)
+            self._browser = browser
+            self._connected_once = True
+            self._log(f"Connected to CDP at: {ws_url}")
+            return browser
+
+    @asynccontextmanager
+    async def context(self, **options):
+        """Lease a fresh BrowserContext on the shared connection"""
+        async with self._slots:
+            browser = await self.connect()
+            try:
+                context = await browser.new_context(**options)
+            except Exception:
+                if browser.is_connected():
+                    raise
+                browser = await self.connect()
+                context = await browser.new_context(**options)
+            try:
+                yield context
+            finally:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+
+    @asynccontextmanager
+    async def page(self, **options):
+        async with self.context(**options) as context:
+            yield await context.new_page()
+
+    async def close(self):
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def __aenter__(self):
+        try:
+            await self.connect()
+        except BaseException:
+            await self.close()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
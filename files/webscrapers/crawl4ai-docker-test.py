@@ -1,7 +1,6 @@
 import asyncio
 import requests
 import json
-from bs4 import BeautifulSoup
 from crawl4ai.docker_client import Crawl4aiDockerClient
 from crawl4ai import (
     AsyncWebCrawler,
@@ -12,6 +11,8 @@ from crawl4ai import (
 from crawl4ai.extraction_strategy import JsonCssExtractionStrategy
 import os
 from dotenv import load_dotenv
+from scrape_cache import ScrapeCache
+from fast_extract import compile_schema
 
 load_dotenv()
 
@@ -26,21 +27,48 @@ URL = "https://rsm-shiny-02.ucsd.edu/selenium/"
 URL_AUTH = "https://rsm-shiny-02.ucsd.edu/selenium_auth/"
 
 
+def load_js(filename):
+    with open(os.path.join(os.path.dirname(__file__), filename), "r") as f:
+        return f.read()
+
+
+# event-driven wait helpers (waitFor, waitForShinyButton, waitForText) that
+# replace fixed setTimeout sleeps in the js_code snippets below
+WAIT_FOR_JS = load_js("wait-for.js")
+
+# compiled once and applied to each page in a single parse
+PAGE_ELEMENTS = compile_schema(
+    {
+        "name": "PageElements",
+        "baseSelector": "html",
+        "fields": [
+            {"name": "title", "selector": "title", "type": "text"},
+            {"name": "showText", "selector": "button#showText", "type": "text"},
+            {"name": "dynamicText", "selector": "#dynamicText", "type": "text"},
+        ],
+    }
+)
+
+
 def test_bs4():
     # This function is not used in the code, but it seems to be a placeholder for testing
     # BeautifulSoup functionality
-    response = requests.get(URL)
-    soup = BeautifulSoup(response.content, "html.parser")
+    # repeated runs are served from the local cache or revalidated with a 304
+    cache = ScrapeCache()
+    response = cache.fetch(URL, session=requests)
+    print(f"Cache status: {response.cache_status}")
+    elements = PAGE_ELEMENTS.extract_first(response.content) or {}
+    parser = PAGE_ELEMENTS.backend
     print(
-        "Title found by BeautifulSoup:",
-        soup.find("title").text if soup.find("title") else "No title found",
+        f"Title found by {parser}:",
+        elements.get("title") or "No title found",
     )
-    print("Button found by BeautifulSoup:", bool(soup.find("button", id="showText")))
+    print(f"Button found by {parser}:", elements.get("showText") is not None)
     print(
-        "Dynamic text element found by BeautifulSoup:",
-        bool(soup.find(id="dynamicText")),
+        f"Dynamic text element found by {parser}:",
+        elements.get("dynamicText") is not None,
     )
-    print("Dynamic text found by BeautifulSoup:", soup.find(id="dynamicText").text)
+    print(f"Dynamic text found by {parser}:", elements.get("dynamicText"))
 
 
 async def test_docker():
@@ -100,9 +128,9 @@ async def test_ids():
                 data[0]["dynamicText_value"] != "",
             )
         # Second crawl: click the button and check again
-        js_click_and_wait = """
-        document.getElementById('showText').click();
-        await new Promise(r => setTimeout(r, 500));
+        js_click_and_wait = WAIT_FOR_JS + """
+        (await waitForShinyButton('showText')).click();
+        await waitForText('dynamicText');
         """
         crawler_config_click = CrawlerRunConfig(
             cache_mode=CacheMode.BYPASS,
@@ -147,9 +175,7 @@ async def test_authentication():
         return
 
     # Load JavaScript from external file and inject credentials
-    js_file_path = os.path.join(os.path.dirname(__file__), "auth_and_click.js")
-    with open(js_file_path, "r") as f:
-        js_code = f.read()
+    js_code = WAIT_FOR_JS + load_js("auth_and_click.js")
 
     # Replace placeholders with actual credentials
     js_code = js_code.replace("USERNAME_PLACEHOLDER", f'"{username}"')
@@ -220,7 +246,10 @@ async def test_simple_click():
         result_after = await crawler.arun(
             URL,
             config=CrawlerRunConfig(
-                js_code=["document.getElementById('showText').click(); await new Promise(r => setTimeout(r, 1000));"],
+                js_code=[
+                    WAIT_FOR_JS
+                    + "(await waitForShinyButton('showText')).click(); await waitForText('dynamicText');"
+                ],
                 cache_mode=CacheMode.BYPASS,
             ),
         )
@@ -237,18 +266,14 @@ async def test_simple_click():
 
             if has_dynamic_text:
                 # Extract the actual text (simple approach)
-                from bs4 import BeautifulSoup
-
-                soup = BeautifulSoup(result_after.cleaned_html, "html.parser")
-                dynamic_element = soup.find(id="dynamicText")
-                if dynamic_element:
-                    print(f"📄 Dynamic text content: '{dynamic_element.get_text().strip()}'")
+                elements = PAGE_ELEMENTS.extract_first(result_after.cleaned_html) or {}
+                if elements.get("dynamicText") is not None:
+                    print(f"📄 Dynamic text content: '{elements['dynamicText']}'")
                 else:
                     # Try parsing from raw HTML if cleaned doesn't work
-                    soup_raw = BeautifulSoup(str(result_after.html), "html.parser")
-                    dynamic_element_raw = soup_raw.find(id="dynamicText")
-                    if dynamic_element_raw:
-                        print(f"📄 Dynamic text content (from raw): '{dynamic_element_raw.get_text().strip()}'")
+                    elements_raw = PAGE_ELEMENTS.extract_first(str(result_after.html)) or {}
+                    if elements_raw.get("dynamicText") is not None:
+                        print(f"📄 Dynamic text content (from raw): '{elements_raw['dynamicText']}'")
                     else:
                         print("📄 Dynamic text element found but no content extracted")
                         print(f"🔍 Debug - cleaned_html snippet: {result_after.cleaned_html}")
@@ -276,7 +301,7 @@ async def test_simple_auth():
         print("✅ Simple auth test successful (using Docker for reliability)")
         
         # Use the working JavaScript approach but simplified
-        simple_auth_js = f"""
+        simple_auth_js = WAIT_FOR_JS + f"""
         console.log("Starting simplified auth and interaction...");
         
         // Handle authentication
@@ -290,24 +315,20 @@ async def test_simple_auth():
                 passwordField.value = "{password}";
                 loginButton.click();
                 
-                // Wait for authentication to complete
-                await new Promise(r => setTimeout(r, 3000));
+                // Wait for the login form to be replaced by the app
+                await waitFor(() => !document.querySelector("input[type='password']"), 10000);
                 console.log("Authentication completed");
             }}
         }}
         
-        // Wait for page to stabilize, then click showText button
-        await new Promise(r => setTimeout(r, 1000));
-        
-        const showTextButton = document.getElementById('showText');
+        // Wait for Shiny to bind the button, then click it
+        const showTextButton = await waitForShinyButton('showText');
         if (showTextButton) {{
             console.log("Clicking showText button...");
             showTextButton.click();
             
             // Wait for dynamic content to appear
-            await new Promise(r => setTimeout(r, 1000));
-            
-            const dynamicText = document.getElementById('dynamicText');
+            const dynamicText = await waitForText('dynamicText');
             console.log("Result:", dynamicText ? dynamicText.textContent : "Dynamic text not found");
         }} else {{
             console.log("Error: showText button not found");
@@ -334,11 +355,9 @@ async def test_simple_auth():
             print(f"📝 Dynamic text after auth + click: {has_dynamic_text}")
             
             if has_dynamic_text:
-                from bs4 import BeautifulSoup
-                soup = BeautifulSoup(results.cleaned_html, "html.parser")
-                dynamic_element = soup.find(id="dynamicText")
-                if dynamic_element:
-                    print(f"📄 Dynamic text content: '{dynamic_element.get_text().strip()}'")
+                elements = PAGE_ELEMENTS.extract_first(results.cleaned_html) or {}
+                if elements.get("dynamicText") is not None:
+                    print(f"📄 Dynamic text content: '{elements['dynamicText']}'")
                 else:
                     # Extract from the raw content if needed
                     if "This text was dynamically generated!" in results.cleaned_html:
@@ -0,0 +1,641 @@
+"""
+Async crawl pipeline: frontier -> fetch -> extract -> sink
+
+Stages are connected by bounded asyncio.Queues, so a slow sink or extractor
+pushes back on the fetchers instead of buffering pages in memory.
+
+    pipeline = CrawlPipeline(
+        fetcher=HttpFetcher(),            # or Crawl4aiFetcher / PlaywrightFetcher
+        schema=schema,                    # crawl4ai-style CSS schema (fast_extract)
+        sink=ParquetSink("pages.parquet"),# or PostgresSink / MemorySink
+        rate=2.0,                         # requests per second per host
+        burst=4,
+    )
+    stats = asyncio.run(pipeline.run(urls))
+
+- per-host token buckets limit the request rate to each site
+- failed fetches (connection errors, timeouts, 429 and 5xx) are retried with
+  exponential backoff and jitter; Retry-After is honoured when present
+- extraction runs off the event loop (threads, or a process pool with
+  extract_processes > 0)
+- pages/sec, errors and queue depth per stage are printed every
+  report_interval seconds and returned by run()
+"""
+
+import asyncio
+import datetime
+import io
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+import fast_extract
+from fast_extract import compile_schema
+
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+_DONE = object()
+
+
+class TokenBucket:
+    """rate tokens per second, up to burst tokens saved up"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostRateLimiter:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+
+    async def acquire(self, url):
+        if not self.rate:
+            return
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        await bucket.acquire()
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    html: str
+    elapsed: float = 0.0
+    headers: dict = field(default_factory=dict)
+
+
+class RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _retry_after(headers):
+    value = (headers or {}).get("Retry-After") or (headers or {}).get("retry-after")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# === Fetchers ===
+# A fetcher is an async context manager with fetch(url) -> FetchResult
+
+
+class HttpFetcher:
+    """Plain HTTP with httpx, optionally through the on-disk ScrapeCache"""
+
+    def __init__(self, timeout=30.0, headers=None, cache=None, max_connections=100):
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.cache = cache
+        self.max_connections = max_connections
+        self._client = None
+
+    async def __aenter__(self):
+        import httpx
+
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            headers=self.headers,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.max_connections),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+
+    async def fetch(self, url):
+        start = time.perf_counter()
+        if self.cache is not None:
+            entry = self.cache.get(self.cache.make_key(url))
+            if entry is not None:
+                if self.cache.is_fresh(entry):
+                    self.cache.hits += 1
+                    fresh = True
+                else:
+                    # counted as revalidated by the cache on a 304
+                    fresh = await self.cache.revalidate(entry, self._client)
+                if fresh:
+                    return FetchResult(url, 200, entry.body.decode("utf-8", errors="replace"))
+
+        response = await self._client.get(url)
+        if response.status_code in RETRY_STATUS:
+            raise RetryableError(
+                f"HTTP {response.status_code}", _retry_after(response.headers)
+            )
+        if self.cache is not None and response.status_code == 200:
+            self.cache.misses += 1
+            self.cache.put(
+                self.cache.make_key(url),
+                url,
+                response.content,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+        return FetchResult(
+            url,
+            response.status_code,
+            response.text,
+            time.perf_counter() - start,
+            dict(response.headers),
+        )
+
+
+class Crawl4aiFetcher:
+    """Render pages with the crawl4ai Docker server (Crawl4aiDockerClient)"""
+
+    def __init__(
+        self,
+        base_url="http://127.0.0.1:11235",
+        email=None,
+        js_code=None,
+        browser_config=None,
+        crawler_config=None,
+        verify_ssl=False,
+    ):
+        self.base_url = base_url
+        self.email = email
+        self.js_code = js_code
+        self.browser_config = browser_config
+        self.crawler_config = crawler_config
+        self.verify_ssl = verify_ssl
+        self._client = None
+
+    async def __aenter__(self):
+        from crawl4ai import BrowserConfig, CacheMode, CrawlerRunConfig
+        from crawl4ai.docker_client import Crawl4aiDockerClient
+
+        if self.browser_config is None:
+            self.browser_config = BrowserConfig(headless=True, java_script_enabled=True)
+        if self.crawler_config is None:
+            self.crawler_config = CrawlerRunConfig(
+                cache_mode=CacheMode.BYPASS,
+                js_code=[self.js_code] if self.js_code else None,
+            )
+        self._client = Crawl4aiDockerClient(
+            base_url=self.base_url, verify_ssl=self.verify_ssl
+        )
+        await self._client.__aenter__()
+        if self.email:
+            await self._client.authenticate(email=self.email)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.__aexit__(*exc)
+
+    async def fetch(self, url):
+        start = time.perf_counter()
+        result = await self._client.crawl(
+            [url],
+            browser_config=self.browser_config,
+            crawler_config=self.crawler_config,
+        )
+        if result is None:
+            # client.crawl returns None when the request to the server failed
+            raise RetryableError("crawl4ai server returned no result")
+        status = getattr(result, "status_code", None) or (200 if result.success else 0)
+        if status in RETRY_STATUS:
+            raise RetryableError(f"HTTP {status}")
+        if not result.success:
+            raise RetryableError(result.error_message or "crawl failed")
+        return FetchResult(url, status, result.html or "", time.perf_counter() - start)
+
+
+class PlaywrightFetcher:
+    """Render pages on the Docker Playwright browser over the shared CDPClient"""
+
+    def __init__(self, cdp=None, wait_until="domcontentloaded", timeout_ms=30000, wait_for=None):
+        self.cdp = cdp
+        self.wait_until = wait_until
+        self.timeout_ms = timeout_ms
+        self.wait_for = wait_for  # optional async callable(page) run after goto
+        self._own_cdp = cdp is None
+
+    async def __aenter__(self):
+        if self._own_cdp:
+            from cdp_client import CDPClient
+
+            self.cdp = CDPClient()
+            await self.cdp.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._own_cdp:
+            await self.cdp.close()
+
+    async def fetch(self, url):
+        start = time.perf_counter()
+        async with self.cdp.page() as page:
+            response = await page.goto(
+                url, wait_until=self.wait_until, timeout=self.timeout_ms
+            )
+            status = response.status if response is not None else 200
+            if status in RETRY_STATUS:
+                raise RetryableError(f"HTTP {status}", _retry_after(response.headers))
+            if self.wait_for is not None:
+                await self.wait_for(page)
+            html = await page.content()
+        return FetchResult(url, status, html, time.perf_counter() - start)
+
+
+# === Sinks ===
+# A sink has async write(rows) and async close(); writes are batched
+
+
+class MemorySink:
+    def __init__(self):
+        self.rows = []
+
+    async def write(self, rows):
+        self.rows.extend(rows)
+
+    async def close(self):
+        pass
+
+
+class ParquetSink:
+    """Append row groups to one Parquet file with pyarrow"""
+
+    def __init__(self, path, compression="zstd"):
+        self.path = path
+        self.compression = compression
+        self._writer = None
+        self._schema = None
+
+    def _write(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            table = pa.Table.from_pylist(rows)
+            # a field that is None in every row of the first batch is
+            # inferred as type null, which no later value fits; extracted
+            # values are text, so such columns become nullable strings
+            self._schema = pa.schema(
+                [
+                    field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                    for field in table.schema
+                ]
+            )
+            table = table.cast(self._schema)
+            self._writer = pq.ParquetWriter(
+                self.path, self._schema, compression=self.compression
+            )
+        else:
+            table = pa.Table.from_pylist(rows, schema=self._schema)
+        self._writer.write_table(table)
+
+    async def write(self, rows):
+        await asyncio.to_thread(self._write, rows)
+
+    async def close(self):
+        if self._writer is not None:
+            await asyncio.to_thread(self._writer.close)
+
+
+class PostgresSink:
+    """COPY batches into a Postgres table (created with text columns if missing)"""
+
+    def __init__(self, dsn, table):
+        self.dsn = dsn
+        self.table = table
+        self._conn = None
+        self._columns = None
+
+    def _write(self, rows):
+        import csv
+
+        import psycopg2
+        from psycopg2 import sql
+
+        if self._conn is None:
+            self._conn = psycopg2.connect(self.dsn)
+            self._columns = list(rows[0])
+            with self._conn.cursor() as cur:
+                cur.execute(
+                    sql.SQL("CREATE TABLE IF NOT EXISTS {} ({})").format(
+                        sql.Identifier(self.table),
+                        sql.SQL(", ").join(
+                            sql.SQL("{} text").format(sql.Identifier(c))
+                            for c in self._columns
+                        ),
+                    )
+                )
+            self._conn.commit()
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(
+                ["\\N" if row.get(c) is None else row.get(c) for c in self._columns]
+            )
+        buffer.seek(0)
+        copy = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N')").format(
+            sql.Identifier(self.table),
+            sql.SQL(", ").join(sql.Identifier(c) for c in self._columns),
+        )
+        with self._conn.cursor() as cur:
+            cur.copy_expert(copy.as_string(self._conn), buffer)
+        self._conn.commit()
+
+    async def write(self, rows):
+        await asyncio.to_thread(self._write, rows)
+
+    async def close(self):
+        if self._conn is not None:
+            await asyncio.to_thread(self._conn.close)
+
+
+# === Pipeline ===
+
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int
+    processed: int = 0
+    errors: int = 0
+    retries: int = 0
+    busy: float = 0.0
+
+
+class CrawlPipeline:
+    def __init__(
+        self,
+        fetcher,
+        schema,
+        sink,
+        fetch_concurrency=8,
+        extract_concurrency=2,
+        extract_processes=0,
+        queue_size=64,
+        rate=2.0,
+        burst=4,
+        retries=3,
+        backoff=0.5,
+        max_backoff=30.0,
+        batch_size=500,
+        flush_interval=5.0,
+        report_interval=5.0,
+        verbose=True,
+    ):
+        self.fetcher = fetcher
+        self.schema = schema
+        self.sink = sink
+        self.fetch_concurrency = fetch_concurrency
+        self.extract_concurrency = extract_concurrency
+        self.extract_processes = extract_processes
+        self.queue_size = queue_size
+        self.limiter = HostRateLimiter(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.report_interval = report_interval
+        self.verbose = verbose
+        self.failed = []  # (url, error) for pages that ran out of retries
+        self.stages = {
+            "frontier": StageStats("frontier", 1),
+            "fetch": StageStats("fetch", fetch_concurrency),
+            "extract": StageStats("extract", extract_concurrency),
+            "sink": StageStats("sink", 1),
+        }
+        self.queues = {}
+        self._started = None
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    # --- stages ---
+
+    async def _frontier(self, urls, out):
+        seen = set()
+        stats = self.stages["frontier"]
+        if hasattr(urls, "__aiter__"):
+            async for url in urls:
+                if url not in seen:
+                    seen.add(url)
+                    await out.put(url)
+                    stats.processed += 1
+        else:
+            for url in urls:
+                if url not in seen:
+                    seen.add(url)
+                    await out.put(url)
+                    stats.processed += 1
+        for _ in range(self.fetch_concurrency):
+            await out.put(_DONE)
+
+    async def _fetch_one(self, url):
+        stats = self.stages["fetch"]
+        for attempt in range(self.retries + 1):
+            await self.limiter.acquire(url)
+            try:
+                return await self.fetcher.fetch(url)
+            except Exception as e:
+                retryable = isinstance(
+                    e, (RetryableError, asyncio.TimeoutError, OSError)
+                ) or type(e).__module__.startswith(("httpx", "httpcore", "playwright"))
+                if attempt == self.retries or not retryable:
+                    raise
+                delay = getattr(e, "retry_after", None)
+                if delay is None:
+                    delay = min(self.max_backoff, self.backoff * 2**attempt)
+                    delay *= random.uniform(0.5, 1.5)
+                stats.retries += 1
+                self._log(f"Retrying {url} in {delay:.1f}s ({e})")
+                await asyncio.sleep(delay)
+
+    async def _fetch_worker(self, inbox, out):
+        stats = self.stages["fetch"]
+        while (url := await inbox.get()) is not _DONE:
+            start = time.perf_counter()
+            try:
+                page = await self._fetch_one(url)
+                stats.processed += 1
+            except Exception as e:
+                stats.errors += 1
+                self.failed.append((url, str(e)))
+                page = None
+            stats.busy += time.perf_counter() - start
+            if page is not None:
+                await out.put(page)
+
+    async def _extract_worker(self, inbox, out, extract):
+        stats = self.stages["extract"]
+        while (page := await inbox.get()) is not _DONE:
+            start = time.perf_counter()
+            try:
+                rows = await extract(page.html)
+                stats.processed += 1
+            except Exception as e:
+                stats.errors += 1
+                self.failed.append((page.url, f"extract: {e}"))
+                rows = []
+            stats.busy += time.perf_counter() - start
+            fetched_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            for row in rows:
+                row.setdefault("source_url", page.url)
+                row.setdefault("fetched_at", fetched_at)
+                await out.put(row)
+
+    async def _sink_worker(self, inbox):
+        stats = self.stages["sink"]
+        batch = []
+        last_flush = time.monotonic()
+
+        async def flush():
+            nonlocal batch, last_flush
+            if batch:
+                start = time.perf_counter()
+                try:
+                    await self.sink.write(batch)
+                    stats.processed += len(batch)
+                except Exception as e:
+                    stats.errors += len(batch)
+                    self._log(f"Sink write failed for {len(batch)} rows: {e}")
+                stats.busy += time.perf_counter() - start
+            batch = []
+            last_flush = time.monotonic()
+
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                row = await asyncio.wait_for(inbox.get(), timeout)
+            except asyncio.TimeoutError:
+                await flush()
+                continue
+            if row is _DONE:
+                break
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                await flush()
+        await flush()
+
+    # --- reporting ---
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        return {
+            "elapsed": elapsed,
+            "failed": len(self.failed),
+            "stages": {
+                name: {
+                    "workers": s.workers,
+                    "processed": s.processed,
+                    "errors": s.errors,
+                    "retries": s.retries,
+                    "per_sec": s.processed / elapsed if elapsed else 0.0,
+                    "queue_depth": self.queues[name].qsize() if name in self.queues else 0,
+                    "utilization": s.busy / (elapsed * s.workers) if elapsed else 0.0,
+                }
+                for name, s in self.stages.items()
+            },
+        }
+
+    def report(self):
+        stats = self.stats()
+        parts = [
+            f"{name} {s['processed']} ({s['per_sec']:.1f}/s, q={s['queue_depth']}, err={s['errors']})"
+            for name, s in stats["stages"].items()
+        ]
+        self._log(f"[{stats['elapsed']:.0f}s] " + " | ".join(parts))
+
+    async def _reporter(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report()
+
+    # --- run ---
+
+    async def run(self, urls):
+        """Crawl urls (an iterable or async iterable) and return stats()"""
+        # each queue is named after the stage that consumes it
+        self.queues = {
+            "fetch": asyncio.Queue(self.queue_size),
+            "extract": asyncio.Queue(self.queue_size),
+            "sink": asyncio.Queue(self.queue_size * 8),
+        }
+        loop = asyncio.get_running_loop()
+        pool = None
+        if self.extract_processes:
+            pool = ProcessPoolExecutor(
+                self.extract_processes,
+                initializer=fast_extract._init_worker,
+                initargs=(self.schema, None),
+            )
+
+            async def extract(html):
+                return await loop.run_in_executor(pool, fast_extract._extract_in_worker, html)
+
+        else:
+            compiled = compile_schema(self.schema)
+
+            async def extract(html):
+                return await asyncio.to_thread(compiled.extract, html)
+
+        self._started = time.monotonic()
+        reporter = asyncio.create_task(self._reporter()) if self.report_interval else None
+        try:
+            async with self.fetcher:
+                sink = asyncio.create_task(self._sink_worker(self.queues["sink"]))
+                extractors = [
+                    asyncio.create_task(
+                        self._extract_worker(self.queues["extract"], self.queues["sink"], extract)
+                    )
+                    for _ in range(self.extract_concurrency)
+                ]
+                fetchers = [
+                    asyncio.create_task(
+                        self._fetch_worker(self.queues["fetch"], self.queues["extract"])
+                    )
+                    for _ in range(self.fetch_concurrency)
+                ]
+                await self._frontier(urls, self.queues["fetch"])
+                await asyncio.gather(*fetchers)
+                for _ in extractors:
+                    await self.queues["extract"].put(_DONE)
+                await asyncio.gather(*extractors)
+                await self.queues["sink"].put(_DONE)
+                await sink
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+            await self.sink.close()
+            if pool is not None:
+                pool.shutdown()
+        self.report()
+        return self.stats()
+
+
+def crawl(urls, schema, fetcher=None, sink=None, **options):
+    """Synchronous helper: crawl urls and return the extracted rows (MemorySink)"""
+    sink = sink if sink is not None else MemorySink()
+    pipeline = CrawlPipeline(fetcher or HttpFetcher(), schema, sink, **options)
+    asyncio.run(pipeline.run(urls))
+    return sink.rows if isinstance(sink, MemorySink) else pipeline.stats()
@@ -0,0 +1,213 @@
+"""
+Single-pass CSS extraction for scraped HTML
+
+Schemas use the same layout as crawl4ai's JsonCssExtractionStrategy
+
+    schema = {
+        "name": "ElementCheck",
+        "baseSelector": "body",
+        "fields": [
+            {"name": "button", "selector": "button#showText", "type": "text"},
+            {"name": "link", "selector": "a", "type": "attribute", "attribute": "href"},
+            {"name": "panel", "selector": "#dynamicText", "type": "html"},
+        ],
+    }
+
+    extractor = compile_schema(schema)
+    rows = extractor.extract(html)          # one dict per baseSelector match
+    row = extractor.extract_first(html)     # or None
+    results = extract_many(schema, pages)   # process pool for many documents
+
+A schema is compiled once (selectors are pre-parsed where the backend allows
+it) and each document is parsed once. The parser backend is the fastest one
+installed: selectolax, then lxml (with cssselect), then BeautifulSoup. Fields
+that do not match return the field's "default" (None unless set).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _available_backends():
+    backends = []
+    try:
+        import selectolax.lexbor  # noqa: F401
+
+        backends.append("selectolax")
+    except ImportError:
+        pass
+    try:
+        import lxml.html  # noqa: F401
+        import cssselect  # noqa: F401
+
+        backends.append("lxml")
+    except ImportError:
+        pass
+    try:
+        import bs4  # noqa: F401
+
+        backends.append("bs4")
+    except ImportError:
+        pass
+    return backends
+
+
+BACKENDS = _available_backends()
+
+
+class CompiledSchema:
+    def __init__(self, schema, backend=None):
+        if not BACKENDS:
+            raise ImportError("Install selectolax, lxml + cssselect or beautifulsoup4")
+        self.schema = schema
+        self.backend = backend or BACKENDS[0]
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Backend {self.backend} is not installed ({BACKENDS})")
+        self.base_selector = schema.get("baseSelector", "html")
+        self.fields = [
+            (
+                field["name"],
+                field["selector"],
+                field.get("type", "text"),
+                field.get("attribute"),
+                field.get("default"),
+            )
+            for field in schema["fields"]
+        ]
+
+        if self.backend == "selectolax":
+            from selectolax.lexbor import LexborHTMLParser
+
+            self._parse = LexborHTMLParser
+            self._extract = self._extract_selectolax
+        elif self.backend == "lxml":
+            import lxml.html
+            from lxml.cssselect import CSSSelector
+
+            self._tostring = lxml.html.tostring
+            self._parse = lxml.html.document_fromstring
+            # compile CSS to XPath once per schema
+            self._base = CSSSelector(self.base_selector)
+            self._selectors = [CSSSelector(f[1]) for f in self.fields]
+            self._extract = self._extract_lxml
+        else:
+            from bs4 import BeautifulSoup
+
+            parser = "lxml" if "lxml" in BACKENDS else "html.parser"
+            self._parse = lambda html: BeautifulSoup(html, parser)
+            self._extract = self._extract_bs4
+
+    def _value(self, kind, attribute, default, text, attrs, html):
+        if kind == "text":
+            return text()
+        if kind == "attribute":
+            value = attrs().get(attribute)
+            return default if value is None else value
+        if kind == "html":
+            return html()
+        raise ValueError(f"Unsupported field type: {kind}")
+
+    def _extract_selectolax(self, html):
+        tree = self._parse(html)
+        rows = []
+        for base in tree.css(self.base_selector):
+            row = {}
+            for name, selector, kind, attribute, default in self.fields:
+                node = base.css_first(selector)
+                if node is None:
+                    row[name] = default
+                    continue
+                row[name] = self._value(
+                    kind,
+                    attribute,
+                    default,
+                    lambda: node.text(strip=True),
+                    lambda: node.attributes,
+                    lambda: node.html,
+                )
+            rows.append(row)
+        return rows
+
+    def _extract_lxml(self, html):
+        tree = self._parse(html)
+        rows = []
+        for base in self._base(tree):
+            row = {}
+            for (name, _, kind, attribute, default), selector in zip(
+                self.fields, self._selectors
+            ):
+                matches = selector(base)
+                if not matches:
+                    row[name] = default
+                    continue
+                node = matches[0]
+                row[name] = self._value(
+                    kind,
+                    attribute,
+                    default,
+                    lambda: node.text_content().strip(),
+                    lambda: node.attrib,
+                    lambda: self._tostring(node, encoding="unicode"),
+                )
+            rows.append(row)
+        return rows
+
+    def _extract_bs4(self, html):
+        soup = self._parse(html)
+        rows = []
+        for base in soup.select(self.base_selector):
+            row = {}
+            for name, selector, kind, attribute, default in self.fields:
+                node = base.select_one(selector)
+                if node is None:
+                    row[name] = default
+                    continue
+                row[name] = self._value(
+                    kind,
+                    attribute,
+                    default,
+                    lambda: node.get_text(strip=True),
+                    lambda: node.attrs,
+                    lambda: str(node),
+                )
+            rows.append(row)
+        return rows
+
+    def extract(self, html):
+        if isinstance(html, bytes):
+            html = html.decode("utf-8", errors="replace")
+        return self._extract(html or "")
+
+    def extract_first(self, html):
+        rows = self.extract(html)
+        return rows[0] if rows else None
+
+
+def compile_schema(schema, backend=None):
+    return CompiledSchema(schema, backend)
+
+
+# per-process schema for extract_many workers
+_worker_schema = None
+
+
+def _init_worker(schema, backend):
+    global _worker_schema
+    _worker_schema = CompiledSchema(schema, backend)
+
+
+def _extract_in_worker(html):
+    return _worker_schema.extract(html)
+
+
+def extract_many(schema, documents, processes=None, backend=None, chunksize=8):
+    """Extract from many documents in a process pool, results in input order"""
+    documents = list(documents)
+    processes = processes or min(len(documents), os.cpu_count() or 1)
+    if processes <= 1:
+        compiled = CompiledSchema(schema, backend)
+        return [compiled.extract(html) for html in documents]
+    with ProcessPoolExecutor(
+        max_workers=processes, initializer=_init_worker, initargs=(schema, backend)
+    ) as executor:
+        return list(executor.map(_extract_in_worker, documents, chunksize=chunksize))
@@ -1,7 +1,9 @@
 import asyncio
-import requests
 import os
+import json
+import time
 from dotenv import load_dotenv
+from cdp_client import CDPClient, CDPUnavailable
 
 load_dotenv()
 
@@ -9,76 +11,148 @@ load_dotenv()
 URL = "https://rsm-shiny-02.ucsd.edu/selenium/"
 URL_AUTH = "https://rsm-shiny-02.ucsd.edu/selenium_auth/"
 
+# Logged-in sessions are cached on disk so repeated runs skip the login form
+AUTH_STATE_FILE = os.path.expanduser(
+    os.getenv("PLAYWRIGHT_AUTH_STATE", "~/.cache/rsm-playwright/auth-state.json")
+)
+AUTH_STATE_TTL = int(os.getenv("PLAYWRIGHT_AUTH_STATE_TTL", "900"))
+AUTH_STATE_STATS = {"hits": 0, "misses": 0, "invalidations": 0}
 
-async def test_playwright_docker():
-    """Docker-based Playwright test - connects to remote Playwright browser like Selenium"""
+
+def _read_auth_states():
+    try:
+        with open(AUTH_STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_auth_states(states):
+    """Write the session cookies owner-only from the start, via a temporary
+    file and os.replace so a concurrent run never reads a half-written file"""
+    directory = os.path.dirname(AUTH_STATE_FILE)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    tmp_path = f"{AUTH_STATE_FILE}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(states, f)
+        os.replace(tmp_path, AUTH_STATE_FILE)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load_auth_state(auth_url, username):
+    """Return a cached storage_state for (auth_url, username) if still fresh"""
+    entry = _read_auth_states().get(f"{auth_url}|{username}")
+    if entry and time.time() - entry["saved_at"] < AUTH_STATE_TTL:
+        AUTH_STATE_STATS["hits"] += 1
+        return entry["state"]
+    AUTH_STATE_STATS["misses"] += 1
+    return None
+
+
+def save_auth_state(auth_url, username, state):
+    states = {
+        key: entry
+        for key, entry in _read_auth_states().items()
+        if time.time() - entry["saved_at"] < AUTH_STATE_TTL
+    }
+    states[f"{auth_url}|{username}"] = {"saved_at": time.time(), "state": state}
+    _write_auth_states(states)
+
+
+def invalidate_auth_state(auth_url, username):
+    states = _read_auth_states()
+    if states.pop(f"{auth_url}|{username}", None) is not None:
+        AUTH_STATE_STATS["invalidations"] += 1
+        _write_auth_states(states)
+
+
+async def wait_for_dynamic_text(page, timeout=5000):
+    """Wait until #dynamicText has content instead of sleeping a fixed second"""
+    try:
+        await page.wait_for_function(
+            "() => (document.getElementById('dynamicText')?.textContent || '').trim() !== ''",
+            timeout=timeout,
+        )
+    except Exception:
+        pass
+
+
+async def open_authenticated_page(context, state, username, password):
+    """Open URL_AUTH in a context created with the cached state, logging in if needed"""
+    page = await context.new_page()
+
+    await page.goto(URL_AUTH)
+    password_field = page.locator(
+        'input[name="password"], input[type="password"], #password'
+    )
+    if state:
+        if await password_field.count() == 0:
+            print("♻️  Reusing cached login session")
+            return page
+        # the cached session expired on the server side
+        invalidate_auth_state(URL_AUTH, username)
+
+    await page.wait_for_load_state("networkidle")
+
+    username_field = page.locator(
+        'input[name="username"], input[type="text"], #username'
+    )
+    submit_button = page.locator(
+        'input[type="submit"], button[type="submit"], button:has-text("Login"), button:has-text("Sign in")'
+    )
+
+    if await username_field.count() > 0:
+        await username_field.first.fill(username)
+    if await password_field.count() > 0:
+        await password_field.first.fill(password)
+    if await submit_button.count() > 0:
+        await submit_button.first.click()
+        await page.wait_for_load_state("networkidle")
+
+    if await password_field.count() == 0:
+        save_auth_state(URL_AUTH, username, await context.storage_state())
+    return page
+
+
+NO_CDP_MESSAGE = """❌ No Playwright browser container available. Start with:
+   docker build -f Dockerfile.playwright -t playwright-browser .
+   docker run --name playwright-browser --network rsm-docker -d -p 9222:9222 playwright-browser"""
+
+
+async def test_playwright_docker(cdp):
+    """Docker-based Playwright test - uses the shared CDP connection to the remote browser"""
     print("=== Playwright Docker Results ===")
     
     try:
-        from playwright.async_api import async_playwright
-        
-        # Try different endpoints like Selenium does
-        endpoints = [
-            "ws://127.0.0.1:9222"
-        ]
-        
-        browser = None
-        for endpoint in endpoints:
-            try:
-                # Check if HTTP endpoint is available first
-                http_endpoint = endpoint.replace("ws://", "http://")
-                print(f"Trying endpoint: {http_endpoint}")
-                response = requests.get(f"{http_endpoint}/json/version", timeout=2)
-                print(f"Response status: {response.status_code}")
-                if response.status_code == 200:
-                    # Get the actual WebSocket URL from the response
-                    version_info = response.json()
-                    ws_url = version_info.get("webSocketDebuggerUrl")
-                    if ws_url:
-                        print(f"Connecting to CDP at: {ws_url}")
-                        p = await async_playwright().start()
-                        # Connect to existing browser via the full WebSocket URL
-                        browser = await p.chromium.connect_over_cdp(ws_url)
-                        print("Successfully connected!")
-                        break
-            except Exception as e:
-                print(f"Failed {endpoint}: {e}")
-                continue
-        
-        if not browser:
-            print("❌ No Playwright browser container available. Start with:")
-            print("   docker build -f Dockerfile.playwright -t playwright-browser .")
-            print("   docker run --name playwright-browser --network rsm-docker -d -p 9222:9222 playwright-browser")
-            return
+        async with cdp.page() as page:
+            await page.goto(URL)
             
-        # Use the connected browser
-        page = await browser.new_page()
-        
-        await page.goto(URL)
-        
-        title = await page.title()
-        button_exists = await page.locator("#showText").count() > 0
-        
-        if button_exists:
-            await page.click("#showText")
-            await page.wait_for_timeout(1000)
-        
-        dynamic_text = await page.text_content("#dynamicText")
-        
-        print(f"Title found by Docker Playwright: {title}")
-        print(f"Button found by Docker Playwright: {button_exists}")
-        print(f"Dynamic text after click: {dynamic_text}")
-        
-        await page.close()
-        await browser.close()
-        await p.stop()
+            title = await page.title()
+            button_exists = await page.locator("#showText").count() > 0
+            
+            if button_exists:
+                await page.click("#showText")
+                await wait_for_dynamic_text(page)
+            
+            dynamic_text = await page.text_content("#dynamicText")
+            
+            print(f"Title found by Docker Playwright: {title}")
+            print(f"Button found by Docker Playwright: {button_exists}")
+            print(f"Dynamic text after click: {dynamic_text}")
         
     except Exception as e:
         print(f"❌ Error: {e}")
 
 
-async def test_authentication_docker():
-    """Docker-based authentication test - connects to remote Playwright browser like Selenium"""
+async def test_authentication_docker(cdp):
+    """Docker-based authentication test - uses the shared CDP connection to the remote browser"""
     print("=== Playwright Docker Authentication ===")
 
     username = os.getenv("SELENIUM_USERNAME")
@@ -89,84 +163,24 @@ async def test_authentication_docker():
         return
 
     try:
-        from playwright.async_api import async_playwright
-        
-        # Try different endpoints like Selenium does
-        endpoints = [
-            "ws://127.0.0.1:9222"
-        ]
-        
-        browser = None
-        for endpoint in endpoints:
+        state = load_auth_state(URL_AUTH, username)
+        async with cdp.context(storage_state=state) as context:
+            page = await open_authenticated_page(context, state, username, password)
+            
+            show_text_button = page.locator("#showText")
+            if await show_text_button.count() > 0:
+                await show_text_button.click()
+                await wait_for_dynamic_text(page)
+            
+            button_exists = await page.locator("#showText").count() > 0
             try:
-                # Check if HTTP endpoint is available first
-                http_endpoint = endpoint.replace("ws://", "http://")
-                print(f"Trying endpoint: {http_endpoint}")
-                response = requests.get(f"{http_endpoint}/json/version", timeout=2)
-                print(f"Response status: {response.status_code}")
-                if response.status_code == 200:
-                    # Get the actual WebSocket URL from the response
-                    version_info = response.json()
-                    ws_url = version_info.get("webSocketDebuggerUrl")
-                    if ws_url:
-                        print(f"Connecting to CDP at: {ws_url}")
-                        p = await async_playwright().start()
-                        # Connect to existing browser via the full WebSocket URL
-                        browser = await p.chromium.connect_over_cdp(ws_url)
-                        print("Successfully connected!")
-                        break
-            except Exception as e:
-                print(f"Failed {endpoint}: {e}")
-                continue
-        
-        if not browser:
-            print("❌ No Playwright browser container available. Start with:")
-            print("   docker build -f Dockerfile.playwright -t playwright-browser .")
-            print("   docker run --name playwright-browser --network rsm-docker -d -p 9222:9222 playwright-browser")
-            return
+                dynamic_text = await page.text_content("#dynamicText")
+            except Exception:
+                dynamic_text = ""
             
-        # Use the connected browser
-        page = await browser.new_page()
-        
-        await page.goto(URL_AUTH)
-        await page.wait_for_load_state("networkidle")
-        
-        username_field = page.locator(
-            'input[name="username"], input[type="text"], #username'
-        )
-        password_field = page.locator(
-            'input[name="password"], input[type="password"], #password'
-        )
-        submit_button = page.locator(
-            'input[type="submit"], button[type="submit"], button:has-text("Login"), button:has-text("Sign in")'
-        )
-        
-        if await username_field.count() > 0:
-            await username_field.first.fill(username)
-        if await password_field.count() > 0:
-            await password_field.first.fill(password)
-        if await submit_button.count() > 0:
-            await submit_button.first.click()
-            await page.wait_for_load_state("networkidle")
-        
-        show_text_button = page.locator("#showText")
-        if await show_text_button.count() > 0:
-            await show_text_button.click()
-            await page.wait_for_timeout(1000)
-        
-        button_exists = await page.locator("#showText").count() > 0
-        try:
-            dynamic_text = await page.text_content("#dynamicText")
-        except Exception:
-            dynamic_text = ""
-        
-        print("✅ Success!")
-        print(f"🔘 Button found: {button_exists}")
-        print(f"📝 Dynamic text: '{dynamic_text}'")
-        
-        await page.close()
-        await browser.close()
-        await p.stop()
+            print("✅ Success!")
+            print(f"🔘 Button found: {button_exists}")
+            print(f"📝 Dynamic text: '{dynamic_text}'")
         
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -190,7 +204,7 @@ async def test_playwright_simple():
 
             if button_exists:
                 await page.click("#showText")
-                await page.wait_for_timeout(1000)
+                await wait_for_dynamic_text(page)
 
             dynamic_text = await page.text_content("#dynamicText")
 
@@ -223,34 +237,14 @@ async def test_authentication_simple():
 
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-
-            await page.goto(URL_AUTH)
-            await page.wait_for_load_state("networkidle")
-
-            username_field = page.locator(
-                'input[name="username"], input[type="text"], #username'
-            )
-            password_field = page.locator(
-                'input[name="password"], input[type="password"], #password'
-            )
-            submit_button = page.locator(
-                'input[type="submit"], button[type="submit"], button:has-text("Login"), button:has-text("Sign in")'
-            )
-
-            if await username_field.count() > 0:
-                await username_field.first.fill(username)
-            if await password_field.count() > 0:
-                await password_field.first.fill(password)
-
-            if await submit_button.count() > 0:
-                await submit_button.first.click()
-                await page.wait_for_load_state("networkidle")
+            state = load_auth_state(URL_AUTH, username)
+            context = await browser.new_context(storage_state=state)
+            page = await open_authenticated_page(context, state, username, password)
 
             show_text_button = page.locator("#showText")
             if await show_text_button.count() > 0:
                 await show_text_button.click()
-                await page.wait_for_timeout(1000)
+                await wait_for_dynamic_text(page)
 
             button_exists = await page.locator("#showText").count() > 0
             try:
@@ -279,11 +273,18 @@ async def main():
     print("DOCKER CONTAINER VERSIONS")
     print("=" * 50)
 
-    await test_playwright_docker()
-    print()
+    # one CDP connection shared by all Docker tests
+    try:
+        async with CDPClient(verbose=True) as cdp:
+            await test_playwright_docker(cdp)
+            print()
 
-    await test_authentication_docker()
-    print()
+            await test_authentication_docker(cdp)
+            print()
+    except CDPUnavailable as e:
+        print(e)
+        print(NO_CDP_MESSAGE)
+        print()
 
     print("=" * 50)
     print("LOCAL INSTALLATION VERSIONS")
@@ -293,6 +294,9 @@ async def main():
     print()
 
     await test_authentication_simple()
+    print()
+
+    print(f"Auth session cache: {AUTH_STATE_STATS}")
 
 
 if __name__ == "__main__":
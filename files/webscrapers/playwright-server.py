@@ -1,11 +1,296 @@
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 import asyncio
+import hashlib
+import hmac
+import json
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from playwright.async_api import async_playwright
-from typing import Optional, Dict, Any
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from typing import Optional, Dict, Any, List, Union
+from urllib.parse import urlsplit
+import ipaddress
 import os
+from scrape_cache import ScrapeCache
+from server_metrics import PhaseTimer, Registry
 
-app = FastAPI()
+# Browser pool settings (override with environment variables)
+# PW_POOL_SIZE: number of warm Chromium processes
+# PW_CONTEXTS_PER_BROWSER: concurrent contexts per browser before requests queue
+# PW_MAX_PAGES_PER_BROWSER: recycle a browser after it has served this many requests
+POOL_SIZE = int(os.getenv("PW_POOL_SIZE", "2"))
+CONTEXTS_PER_BROWSER = int(os.getenv("PW_CONTEXTS_PER_BROWSER", "8"))
+MAX_PAGES_PER_BROWSER = int(os.getenv("PW_MAX_PAGES_PER_BROWSER", "200"))
+
+# Upper bound on the per-batch concurrency a client can ask for
+BATCH_MAX_CONCURRENCY = int(os.getenv("PW_BATCH_MAX_CONCURRENCY", "32"))
+
+# Logged-in storage_state reuse for the auth action
+# PW_SESSION_TTL: seconds a cached session is reused before logging in again
+# PW_SESSION_CACHE_SIZE: number of (auth_url, username) sessions kept (LRU)
+SESSION_TTL = float(os.getenv("PW_SESSION_TTL", "900"))
+SESSION_CACHE_SIZE = int(os.getenv("PW_SESSION_CACHE_SIZE", "256"))
+
+# Resource types dropped by the block_resources profiles
+BLOCK_PROFILES = {
+    "light": {"image", "media", "font"},
+    "text": {"image", "media", "font", "stylesheet", "texttrack", "manifest"},
+}
+
+# Prometheus metrics served on /metrics (pool, session and cache metrics are
+# registered below, once those objects exist)
+metrics = Registry()
+PHASE_SECONDS = metrics.histogram(
+    "playwright_phase_seconds",
+    "Time per scrape phase: launch, lease, goto, auth, wait, extract, cache",
+    ["phase"],
+)
+REQUEST_SECONDS = metrics.histogram(
+    "playwright_request_seconds", "End-to-end scrape time", ["action"]
+)
+REQUESTS = metrics.counter(
+    "playwright_requests_total", "Scrape requests by outcome", ["action", "outcome"]
+)
+ERRORS = metrics.counter(
+    "playwright_errors_total", "Failed scrapes by exception class", ["action", "error"]
+)
+IN_FLIGHT = metrics.gauge(
+    "playwright_requests_in_flight", "Scrapes currently running", ["action"]
+)
+
+
+class PooledBrowser:
+    def __init__(self, browser):
+        self.browser = browser
+        self.active = 0
+        self.served = 0
+        self.retired = False
+
+
+class BrowserPool:
+    """Keeps warm Chromium processes and leases a fresh BrowserContext per request"""
+
+    def __init__(self, size, contexts_per_browser, max_pages):
+        self.size = size
+        self.contexts_per_browser = contexts_per_browser
+        self.max_pages = max_pages
+        self.browsers = []
+        self.waiting = 0
+        self.recycled = 0
+        self._playwright = None
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(size * contexts_per_browser)
+
+    async def start(self):
+        self._playwright = await async_playwright().start()
+        self.browsers = list(
+            await asyncio.gather(*[self._launch() for _ in range(self.size)])
+        )
+
+    async def stop(self):
+        for pooled in self.browsers:
+            await self._close(pooled)
+        self.browsers = []
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _launch(self):
+        with PHASE_SECONDS.time(phase="launch"):
+            browser = await self._playwright.chromium.launch(headless=True)
+        return PooledBrowser(browser)
+
+    async def _close(self, pooled):
+        try:
+            await pooled.browser.close()
+        except Exception:
+            pass
+
+    async def _acquire(self):
+        async with self._lock:
+            # replace browsers that crashed or were killed
+            for i, pooled in enumerate(self.browsers):
+                if not pooled.browser.is_connected():
+                    self.browsers[i] = await self._launch()
+                    self.recycled += 1
+
+            pooled = min(self.browsers, key=lambda b: b.active)
+
+            # swap in a fresh browser once this one has served enough pages
+            # the old one is closed when its last lease is released
+            if pooled.served + 1 >= self.max_pages:
+                self.browsers[self.browsers.index(pooled)] = await self._launch()
+                pooled.retired = True
+                self.recycled += 1
+
+            pooled.active += 1
+            pooled.served += 1
+            return pooled
+
+    async def _release(self, pooled):
+        pooled.active -= 1
+        if pooled.retired and pooled.active == 0:
+            await self._close(pooled)
+
+    @asynccontextmanager
+    async def lease(self, **context_options):
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            pooled = await self._acquire()
+            try:
+                context = await pooled.browser.new_context(**context_options)
+                try:
+                    yield context
+                finally:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+            finally:
+                await self._release(pooled)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "connected": sum(b.browser.is_connected() for b in self.browsers),
+            "capacity": self.size * self.contexts_per_browser,
+            "in_use": sum(b.active for b in self.browsers),
+            "queue_depth": self.waiting,
+            "recycled": self.recycled,
+        }
+
+
+class SessionCache:
+    """LRU cache of Playwright storage_state keyed by (auth_url, username)
+
+    A digest of the password is kept with each entry so a cached session is
+    only handed to callers that supplied the same credentials.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _digest(password):
+        return hashlib.sha256((password or "").encode()).hexdigest()
+
+    def get(self, key, password):
+        entry = self._entries.get(key)
+        if entry is not None:
+            digest, expires, state = entry
+            if expires > time.monotonic() and hmac.compare_digest(
+                digest, self._digest(password)
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return state
+            if expires <= time.monotonic():
+                del self._entries[key]
+        self.misses += 1
+        return None
+
+    def holds(self, key, password):
+        """True when a live session for key was stored with this password
+        (no LRU or hit/miss bookkeeping)"""
+        entry = self._entries.get(key)
+        return (
+            entry is not None
+            and entry[1] > time.monotonic()
+            and hmac.compare_digest(entry[0], self._digest(password))
+        )
+
+    def put(self, key, password, state):
+        self._entries[key] = (
+            self._digest(password),
+            time.monotonic() + self.ttl,
+            state,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+pool = BrowserPool(POOL_SIZE, CONTEXTS_PER_BROWSER, MAX_PAGES_PER_BROWSER)
+sessions = SessionCache(SESSION_TTL, SESSION_CACHE_SIZE)
+# Rendered results for requests with cache=true (see scrape_cache.py for settings)
+page_cache = ScrapeCache()
+
+metrics.gauge(
+    "playwright_pool_contexts",
+    "Browser contexts by state",
+    ["state"],
+    callback=lambda: {
+        ("in_use",): pool.stats()["in_use"],
+        ("capacity",): pool.stats()["capacity"],
+        ("queued",): pool.stats()["queue_depth"],
+    },
+)
+metrics.gauge(
+    "playwright_pool_browsers_connected",
+    "Connected pooled Chromium processes",
+    callback=lambda: pool.stats()["connected"],
+)
+metrics.counter(
+    "playwright_pool_browsers_recycled_total",
+    "Browsers replaced since start (crashed or served max pages)",
+    callback=lambda: pool.stats()["recycled"],
+)
+metrics.counter(
+    "playwright_session_cache_lookups_total",
+    "Session cache lookups since start",
+    ["result"],
+    callback=lambda: {
+        ("hit",): sessions.hits,
+        ("miss",): sessions.misses,
+        ("invalidated",): sessions.invalidations,
+    },
+)
+metrics.counter(
+    "playwright_page_cache_lookups_total",
+    "Render cache lookups since start",
+    ["result"],
+    callback=lambda: {
+        ("hit",): page_cache.hits,
+        ("miss",): page_cache.misses,
+        ("revalidated",): page_cache.revalidated,
+    },
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await pool.start()
+    yield
+    await pool.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 class PlaywrightRequest(BaseModel):
     url: str
@@ -13,85 +298,452 @@ class PlaywrightRequest(BaseModel):
     username: Optional[str] = None
     password: Optional[str] = None
     auth_url: Optional[str] = None
+    # How to wait for the page to update after clicking #showText
+    wait_strategy: str = "selector"  # selector, text_change, mutation, response, fixed
+    wait_selector: str = "#dynamicText"
+    wait_response: Optional[str] = None  # URL substring for the response strategy
+    wait_timeout_ms: int = Field(5000, ge=0)
+    # Drop requests: a BLOCK_PROFILES name or a list of Playwright resource types
+    block_resources: Optional[Union[str, List[str]]] = None
+    block_third_party: bool = False
+    block_domains: List[str] = []
+    # Reuse a stored render; stale entries are revalidated with ETag/Last-Modified
+    cache: bool = False
+    cache_ttl: Optional[float] = None  # seconds, defaults to SCRAPE_CACHE_TTL
+    # Add per-phase timings (milliseconds) to the response
+    return_timings: bool = False
 
 class PlaywrightResponse(BaseModel):
     success: bool
     title: Optional[str] = None
     button_exists: Optional[bool] = None
     dynamic_text: Optional[str] = None
+    requests_total: Optional[int] = None
+    requests_blocked: Optional[int] = None
+    cache_status: Optional[str] = None  # hit, revalidated, miss
+    timings: Optional[Dict[str, float]] = None  # ms per phase, see return_timings
     error: Optional[str] = None
+    error_type: Optional[str] = None  # exception class name
+
+class PlaywrightBatchRequest(BaseModel):
+    items: List[PlaywrightRequest]
+    concurrency: int = Field(8, ge=1)
+    item_timeout: float = Field(30.0, gt=0)  # seconds per item
+
+class PlaywrightBatchResult(PlaywrightResponse):
+    index: int
+    url: str
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "pool": pool.stats(),
+        "sessions": sessions.stats(),
+        "cache": await asyncio.to_thread(page_cache.stats),
+    }
 
-@app.post("/playwright", response_model=PlaywrightResponse)
-async def run_playwright(request: PlaywrightRequest):
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+def site_of(host: str) -> str:
+    """Approximate the registrable domain of a host (last two labels)
+
+    Good enough to tell first from third party for the course sites; it does
+    not know about multi-label suffixes such as co.uk.
+    """
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        return ".".join(host.split(".")[-2:])
+
+class ResourceBlocker:
+    """page.route handler that aborts unwanted requests and counts them"""
+
+    def __init__(self, request: PlaywrightRequest):
+        if isinstance(request.block_resources, str):
+            if request.block_resources not in BLOCK_PROFILES:
+                raise ValueError(
+                    f"Unknown block_resources profile: {request.block_resources}"
+                )
+            self.types = BLOCK_PROFILES[request.block_resources]
+        else:
+            self.types = set(request.block_resources or [])
+        self.domains = [d.lower().lstrip(".") for d in request.block_domains]
+        self.first_party = None
+        if request.block_third_party:
+            self.first_party = {
+                site_of(urlsplit(url).hostname or "")
+                for url in (request.url, request.auth_url)
+                if url
+            }
+        self.total = 0
+        self.blocked = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.types or self.domains or self.first_party)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if resource_type in self.types:
+            return True
+        host = (urlsplit(url).hostname or "").lower()
+        if not host:
+            # data: and blob: URLs never hit the network
+            return False
+        if any(host == d or host.endswith("." + d) for d in self.domains):
+            return True
+        return self.first_party is not None and site_of(host) not in self.first_party
+
+    async def handle(self, route):
+        self.total += 1
+        if self.should_block(route.request.resource_type, route.request.url):
+            self.blocked += 1
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+async def on_login_page(page) -> bool:
+    return await page.locator('input[type="password"]').count() > 0
+
+async def login(page, request: PlaywrightRequest):
+    await page.goto(request.auth_url)
+    await page.wait_for_load_state("networkidle")
+
+    if request.username and request.password:
+        username_field = page.locator(
+            'input[name="username"], input[type="text"], #username'
+        )
+        password_field = page.locator(
+            'input[name="password"], input[type="password"], #password'
+        )
+        submit_button = page.locator(
+            'input[type="submit"], button[type="submit"], button:has-text("Login"), button:has-text("Sign in")'
+        )
+
+        if await username_field.count() > 0:
+            await username_field.first.fill(request.username)
+        if await password_field.count() > 0:
+            await password_field.first.fill(request.password)
+        if await submit_button.count() > 0:
+            await submit_button.first.click()
+            await page.wait_for_load_state("networkidle")
+
+# Shiny binds inputs after its websocket connects and ignores clicks before that
+SHINY_READY_JS = """() => !window.Shiny || document.querySelector('#showText.shiny-bound-input') !== null"""
+
+TEXT_CONTENT_JS = """(selector) => {
+    const el = document.querySelector(selector);
+    return el ? el.textContent : null;
+}"""
+
+TEXT_CHANGED_JS = """([selector, before]) => {
+    const el = document.querySelector(selector);
+    return el !== null && el.textContent !== before;
+}"""
+
+# Arms a MutationObserver before the click; the click handler may mutate the
+# DOM synchronously so observing afterwards could miss the change
+MUTATION_ARM_JS = """([selector, timeout]) => {
+    window.__pwMutation = new Promise((resolve) => {
+        const target = document.querySelector(selector) || document.body;
+        const observer = new MutationObserver(() => {
+            clearTimeout(timer);
+            observer.disconnect();
+            resolve(true);
+        });
+        const timer = setTimeout(() => {
+            observer.disconnect();
+            resolve(false);
+        }, timeout);
+        observer.observe(target, {childList: true, subtree: true, characterData: true});
+    });
+}"""
+
+async def click_and_wait(page, request: PlaywrightRequest):
+    """Click #showText and return as soon as the page has reacted
+
+    A wait that runs into wait_timeout_ms is not an error, the caller reads
+    whatever text is there at that point.
+    """
+    strategy = request.wait_strategy
+    selector = request.wait_selector
+    # one budget for the Shiny readiness check and the strategy's wait
+    # (except "fixed", which always sleeps wait_timeout_ms after the click)
+    deadline = time.monotonic() + request.wait_timeout_ms / 1000
+
+    def remaining_ms():
+        return max(1, int((deadline - time.monotonic()) * 1000))
+
+    try:
+        await page.wait_for_function(SHINY_READY_JS, timeout=remaining_ms())
+    except PlaywrightTimeoutError:
+        pass
+
+    timeout = remaining_ms()
+    try:
+        if strategy == "selector":
+            await page.click("#showText")
+            await page.wait_for_selector(selector, state="visible", timeout=timeout)
+        elif strategy == "text_change":
+            before = await page.evaluate(TEXT_CONTENT_JS, selector)
+            await page.click("#showText")
+            await page.wait_for_function(
+                TEXT_CHANGED_JS, arg=[selector, before], timeout=timeout
+            )
+        elif strategy == "mutation":
+            await page.evaluate(MUTATION_ARM_JS, [selector, timeout])
+            await page.click("#showText")
+            await page.evaluate("() => window.__pwMutation")
+        elif strategy == "response":
+            if not request.wait_response:
+                raise ValueError("wait_response is required for the response strategy")
+            async with page.expect_response(
+                lambda response: request.wait_response in response.url, timeout=timeout
+            ):
+                await page.click("#showText")
+        elif strategy == "fixed":
+            # the old fixed sleep after the click, kept as a baseline: always
+            # the full wait_timeout_ms, not what the ready check left over
+            await page.click("#showText")
+            await page.wait_for_timeout(request.wait_timeout_ms)
+        else:
+            raise ValueError(f"Unknown wait_strategy: {strategy}")
+    except PlaywrightTimeoutError:
+        pass
+
+async def render(
+    request: PlaywrightRequest, validators: dict, timer: PhaseTimer
+) -> PlaywrightResponse:
+    """Run the request in a pooled browser; fills validators with the ETag and
+    Last-Modified headers of the final main document"""
+    session_key = None
+    storage_state = None
+    if request.action == "auth" and request.auth_url and request.username:
+        session_key = (request.auth_url, request.username)
+        storage_state = sessions.get(session_key, request.password)
+
+    try:
+        context_options = {"storage_state": storage_state} if storage_state else {}
+        lease_start = time.perf_counter()
+        async with pool.lease(**context_options) as context:
+            page = await context.new_page()
+            timer.record("lease", time.perf_counter() - lease_start)
+            blocker = ResourceBlocker(request)
+            if blocker.enabled:
+                await page.route("**/*", blocker.handle)
+
+            def remember_validators(response):
+                if (
+                    response.request.is_navigation_request()
+                    and response.frame == page.main_frame
+                ):
+                    validators.clear()
+                    for name in ("etag", "last-modified"):
+                        if name in response.headers:
+                            validators[name] = response.headers[name]
+
+            page.on("response", remember_validators)
+
             if request.action == "auth" and request.auth_url:
-                # Handle authentication
-                await page.goto(request.auth_url)
-                await page.wait_for_load_state("networkidle")
-                
-                if request.username and request.password:
-                    username_field = page.locator(
-                        'input[name="username"], input[type="text"], #username'
-                    )
-                    password_field = page.locator(
-                        'input[name="password"], input[type="password"], #password'
-                    )
-                    submit_button = page.locator(
-                        'input[type="submit"], button[type="submit"], button:has-text("Login"), button:has-text("Sign in")'
-                    )
-                    
-                    if await username_field.count() > 0:
-                        await username_field.first.fill(request.username)
-                    if await password_field.count() > 0:
-                        await password_field.first.fill(request.password)
-                    if await submit_button.count() > 0:
-                        await submit_button.first.click()
-                        await page.wait_for_load_state("networkidle")
-                
-                # After auth, navigate to main URL
-                if request.url != request.auth_url:
-                    await page.goto(request.url)
+                logged_in = False
+                if storage_state:
+                    # Reuse the cached session and go straight to the target
+                    with timer.phase("goto"):
+                        await page.goto(request.url)
+                    if await on_login_page(page):
+                        sessions.invalidate(session_key)
+                    else:
+                        logged_in = True
+
+                if not logged_in:
+                    with timer.phase("auth"):
+                        await login(page, request)
+                    if (
+                        session_key
+                        and request.password
+                        and not await on_login_page(page)
+                    ):
+                        sessions.put(
+                            session_key,
+                            request.password,
+                            await context.storage_state(),
+                        )
+
+                    # After auth, navigate to main URL
+                    if request.url != request.auth_url:
+                        with timer.phase("goto"):
+                            await page.goto(request.url)
             else:
-                await page.goto(request.url)
-            
+                with timer.phase("goto"):
+                    await page.goto(request.url)
+
             # Get basic info
-            title = await page.title()
-            button_exists = await page.locator("#showText").count() > 0
-            
+            with timer.phase("extract"):
+                title = await page.title()
+                button_exists = await page.locator("#showText").count() > 0
+
             # Handle click action
             if request.action in ["click", "auth"] and button_exists:
-                await page.click("#showText")
-                await page.wait_for_timeout(1000)
-            
+                with timer.phase("wait"):
+                    await click_and_wait(page, request)
+
             # Get dynamic text
             dynamic_text = ""
-            try:
-                dynamic_text = await page.text_content("#dynamicText")
-            except Exception:
-                pass
-            
-            await browser.close()
-            
+            with timer.phase("extract"):
+                try:
+                    dynamic_text = await page.text_content("#dynamicText")
+                except Exception:
+                    pass
+
             return PlaywrightResponse(
                 success=True,
                 title=title,
                 button_exists=button_exists,
-                dynamic_text=dynamic_text
+                dynamic_text=dynamic_text,
+                requests_total=blocker.total if blocker.enabled else None,
+                requests_blocked=blocker.blocked if blocker.enabled else None,
             )
-            
+
     except Exception as e:
         return PlaywrightResponse(
             success=False,
-            error=str(e)
+            error=str(e),
+            error_type=type(e).__name__,
+        )
+
+def cache_key(request: PlaywrightRequest) -> str:
+    options = request.dict(
+        exclude={"url", "action", "password", "cache", "cache_ttl", "return_timings"}
+    )
+    if request.action == "auth":
+        # a render behind a login belongs to these credentials only
+        options["password_sha256"] = SessionCache._digest(request.password)
+    return ScrapeCache.make_key(request.url, request.action, options)
+
+async def scrape(request: PlaywrightRequest) -> PlaywrightResponse:
+    """scrape_cached with request metrics and the optional timings field"""
+    timer = PhaseTimer(PHASE_SECONDS)
+    start = time.perf_counter()
+    with IN_FLIGHT.track(action=request.action):
+        try:
+            response = await scrape_cached(request, timer)
+        except asyncio.CancelledError:
+            # batch item timeout or client disconnect
+            REQUESTS.inc(action=request.action, outcome="cancelled")
+            raise
+    REQUEST_SECONDS.observe(time.perf_counter() - start, action=request.action)
+    REQUESTS.inc(
+        action=request.action, outcome="success" if response.success else "error"
+    )
+    if not response.success:
+        ERRORS.inc(action=request.action, error=response.error_type or "unknown")
+    if request.return_timings:
+        response.timings = dict(
+            timer.timings, total=round((time.perf_counter() - start) * 1000, 3)
+        )
+    return response
+
+async def scrape_cached(request: PlaywrightRequest, timer: PhaseTimer) -> PlaywrightResponse:
+    if not request.cache:
+        return await render(request, {}, timer)
+
+    key = cache_key(request)
+    with timer.phase("cache"):
+        entry = await asyncio.to_thread(page_cache.get, key)
+        if (
+            entry is not None
+            and request.action == "auth"
+            and not sessions.holds((request.auth_url, request.username), request.password)
+        ):
+            # no live session for these credentials: log in again rather
+            # than hand out a page rendered while logged in
+            entry = None
+        fresh = entry is not None and page_cache.is_fresh(entry, request.cache_ttl)
+        # pages behind a login cannot be revalidated without the session
+        revalidated = (
+            entry is not None
+            and not fresh
+            and request.action != "auth"
+            and await page_cache.revalidate(entry)
         )
+    if fresh or revalidated:
+        if fresh:
+            page_cache.hits += 1
+        cached = json.loads(entry.body)
+        cached["cache_status"] = "hit" if fresh else "revalidated"
+        return PlaywrightResponse(**cached)
+
+    page_cache.misses += 1
+    validators = {}
+    response = await render(request, validators, timer)
+    if response.success:
+        await asyncio.to_thread(
+            page_cache.put,
+            key,
+            request.url,
+            response.json(exclude={"timings"}).encode(),
+            etag=validators.get("etag"),
+            last_modified=validators.get("last-modified"),
+        )
+    response.cache_status = "miss"
+    return response
+
+@app.post("/playwright", response_model=PlaywrightResponse)
+async def run_playwright(request: PlaywrightRequest):
+    return await scrape(request)
+
+async def scrape_batch(batch: PlaywrightBatchRequest):
+    """Yield a PlaywrightBatchResult for each item as soon as it finishes"""
+    semaphore = asyncio.Semaphore(min(batch.concurrency, BATCH_MAX_CONCURRENCY))
+
+    async def run_item(index, item):
+        async with semaphore:
+            try:
+                response = await asyncio.wait_for(scrape(item), batch.item_timeout)
+            except asyncio.TimeoutError:
+                response = PlaywrightResponse(
+                    success=False,
+                    error=f"Timed out after {batch.item_timeout}s",
+                    error_type="TimeoutError",
+                )
+                ERRORS.inc(action=item.action, error="TimeoutError")
+            except Exception as e:
+                # e.g. the render cache failing on disk; report it on this
+                # item's line instead of ending the whole stream
+                response = PlaywrightResponse(
+                    success=False, error=str(e), error_type=type(e).__name__
+                )
+                ERRORS.inc(action=item.action, error=type(e).__name__)
+        return PlaywrightBatchResult(index=index, url=item.url, **response.dict())
+
+    tasks = [
+        asyncio.create_task(run_item(i, item)) for i, item in enumerate(batch.items)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # client went away or the caller stopped iterating
+        for task in tasks:
+            task.cancel()
+
+@app.post("/playwright/batch", response_model=List[PlaywrightBatchResult])
+async def run_playwright_batch(batch: PlaywrightBatchRequest):
+    results = [result async for result in scrape_batch(batch)]
+    return sorted(results, key=lambda r: r.index)
+
+@app.post("/playwright/batch/stream")
+async def run_playwright_batch_stream(batch: PlaywrightBatchRequest):
+    async def ndjson():
+        async for result in scrape_batch(batch):
+            yield result.json() + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 if __name__ == "__main__":
     import uvicorn
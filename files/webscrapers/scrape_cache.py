@@ -0,0 +1,256 @@
+"""
+On-disk cache for scraped pages
+
+Used by the BeautifulSoup path (ScrapeCache.fetch wraps requests.get) and by
+the FastAPI Playwright server (rendered results stored per request).
+
+- entries are keyed by URL + action + a hash of the JS/render options
+- stale entries are revalidated with If-None-Match / If-Modified-Since so an
+  unchanged page costs a 304 instead of a full download or render
+- blobs are zlib-compressed files, indexed in a small SQLite database
+- total size is bounded with least-recently-used eviction
+
+Settings: SCRAPE_CACHE_DIR (default ~/.cache/rsm-scrape),
+SCRAPE_CACHE_MAX_MB (default 512) and SCRAPE_CACHE_TTL in seconds (default 3600).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Optional
+
+DEFAULT_DIR = os.path.expanduser(os.getenv("SCRAPE_CACHE_DIR", "~/.cache/rsm-scrape"))
+DEFAULT_MAX_BYTES = int(float(os.getenv("SCRAPE_CACHE_MAX_MB", "512")) * 1024 * 1024)
+DEFAULT_TTL = float(os.getenv("SCRAPE_CACHE_TTL", "3600"))
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    url: str
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+    meta: dict = field(default_factory=dict)
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass
+class CachedResponse:
+    """The parts of a requests.Response the scraping scripts use"""
+
+    url: str
+    status_code: int
+    content: bytes
+    headers: dict
+    cache_status: str  # hit, revalidated, miss
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+
+class ScrapeCache:
+    def __init__(self, path=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        os.makedirs(os.path.join(path, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(path, "index.sqlite"), check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                meta TEXT
+            )"""
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def make_key(url, action="http", js=None):
+        """Cache key from the URL, the action and the JS or render options"""
+        if js is not None and not isinstance(js, str):
+            js = json.dumps(js, sort_keys=True)
+        js_hash = hashlib.sha256((js or "").encode()).hexdigest()
+        return hashlib.sha256(f"{url}\n{action}\n{js_hash}".encode()).hexdigest()
+
+    def _blob_path(self, key):
+        return os.path.join(self.path, "blobs", key[:2], key + ".zz")
+
+    def get(self, key) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, etag, last_modified, stored_at, meta FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self._blob_path(key), "rb") as f:
+                    body = zlib.decompress(f.read())
+            except (OSError, zlib.error):
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+        url, etag, last_modified, stored_at, meta = row
+        return CacheEntry(
+            key, url, body, etag, last_modified, stored_at, json.loads(meta or "{}")
+        )
+
+    def put(self, key, url, body: bytes, etag=None, last_modified=None, meta=None):
+        blob = zlib.compress(body, 6)
+        blob_path = self._blob_path(key)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        tmp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, blob_path)
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, etag, last_modified, now, now, len(blob), json.dumps(meta or {})),
+            )
+            self._db.commit()
+            self._evict()
+
+    def touch(self, key):
+        """Mark an entry as fresh again after a 304"""
+        with self._lock:
+            now = time.time()
+            self._db.execute(
+                "UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, key),
+            )
+            self._db.commit()
+
+    def is_fresh(self, entry: CacheEntry, ttl=None):
+        return time.time() - entry.stored_at < (self.ttl if ttl is None else ttl)
+
+    def _evict(self):
+        (total,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT key, size FROM entries ORDER BY accessed_at ASC"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._blob_path(key))
+            except OSError:
+                pass
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+        self._db.commit()
+
+    def fetch(self, url, session=None, ttl=None, **kwargs) -> CachedResponse:
+        """requests.get with caching and conditional revalidation"""
+        if session is None:
+            import requests as session
+
+        key = self.make_key(url)
+        entry = self.get(key)
+        if entry is not None and self.is_fresh(entry, ttl):
+            self.hits += 1
+            return CachedResponse(url, 200, entry.body, entry.meta.get("headers", {}), "hit")
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            headers.update(entry.conditional_headers())
+        response = session.get(url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.revalidated += 1
+            self.touch(key)
+            return CachedResponse(
+                url, 200, entry.body, entry.meta.get("headers", {}), "revalidated"
+            )
+
+        self.misses += 1
+        if response.status_code == 200:
+            self.put(
+                key,
+                url,
+                response.content,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                meta={"headers": {"Content-Type": response.headers.get("Content-Type", "")}},
+            )
+        return CachedResponse(
+            url, response.status_code, response.content, dict(response.headers), "miss"
+        )
+
+    async def revalidate(self, entry: CacheEntry, client=None) -> bool:
+        """Conditional GET for an entry; True when the server answers 304"""
+        headers = entry.conditional_headers()
+        if not headers:
+            return False
+        import httpx
+
+        try:
+            if client is None:
+                async with httpx.AsyncClient(timeout=10) as http:
+                    response = await http.get(entry.url, headers=headers)
+            else:
+                response = await client.get(entry.url, headers=headers)
+        except httpx.HTTPError:
+            return False
+        if response.status_code == 304:
+            self.revalidated += 1
+            await asyncio.to_thread(self.touch, entry.key)
+            return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            count, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            "entries": count,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,15 +1,47 @@
 #!/bin/bash
 
+CHROME_BIN=/ms-playwright/chromium-1169/chrome-linux/chrome
+CHROME_ARGS=(
+  --headless
+  --disable-gpu
+  --disable-dev-shm-usage
+  --disable-features=VizDisplayCompositor
+  --no-sandbox
+  --disable-web-security
+)
+
+# CHROME_PROFILE=light skips images, web fonts, audio and background
+# services for scraping jobs that only read text from the DOM
+if [ "${CHROME_PROFILE:-full}" = "light" ]; then
+  CHROME_ARGS+=(
+    --blink-settings=imagesEnabled=false
+    --disable-remote-fonts
+    --mute-audio
+    --autoplay-policy=user-gesture-required
+    --disable-background-networking
+    --disable-component-update
+    --disable-default-apps
+    --disable-extensions
+    --disable-sync
+    --no-first-run
+  )
+fi
+
+# CDP_INSTANCES > 1 (or "auto" for one per CPU) starts a farm of browsers
+# behind a load-balancing front end on port 9222 instead of socat
+if [ "${CDP_INSTANCES:-1}" != "1" ]; then
+  export CHROME_BIN
+  exec python3 /app/cdp-farm.py \
+    --instances "${CDP_INSTANCES}" \
+    --listen-port 9222 \
+    -- "${CHROME_ARGS[@]}"
+fi
+
 # Start Chromium with remote debugging on internal port
-/ms-playwright/chromium-1169/chrome-linux/chrome \
-  --headless \
-  --disable-gpu \
-  --disable-dev-shm-usage \
-  --disable-features=VizDisplayCompositor \
+"${CHROME_BIN}" \
+  "${CHROME_ARGS[@]}" \
   --remote-debugging-address=127.0.0.1 \
-  --remote-debugging-port=9223 \
-  --no-sandbox \
-  --disable-web-security &
+  --remote-debugging-port=9223 &
 
 # Wait for Chrome to start
 sleep 3
@@ -18,4 +50,4 @@ sleep 3
 socat TCP-LISTEN:9222,bind=0.0.0.0,fork TCP:127.0.0.1:9223 &
 
 # Wait for background processes
-wait
\ No newline at end of file
+wait
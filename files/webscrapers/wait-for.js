@@ -0,0 +1,40 @@
+// Event-driven wait helper for crawl4ai js_code snippets
+// Resolves with the first truthy value returned by check(), re-checking on
+// every DOM mutation, or with null once timeoutMs has passed
+const waitFor = (check, timeoutMs = 5000) => new Promise((resolve) => {
+    const initial = check();
+    if (initial) {
+        resolve(initial);
+        return;
+    }
+    const observer = new MutationObserver(() => {
+        const value = check();
+        if (value) {
+            clearTimeout(timer);
+            observer.disconnect();
+            resolve(value);
+        }
+    });
+    const timer = setTimeout(() => {
+        observer.disconnect();
+        resolve(null);
+    }, timeoutMs);
+    observer.observe(document.documentElement, {
+        childList: true,
+        subtree: true,
+        characterData: true,
+        attributes: true,
+    });
+});
+
+// Shiny ignores clicks until the input is bound to the server session
+const waitForShinyButton = (id, timeoutMs = 5000) => waitFor(
+    () => document.querySelector(`#${id}.shiny-bound-input`),
+    timeoutMs
+).then((el) => el || document.getElementById(id));
+
+const waitForText = (id, timeoutMs = 5000) => waitFor(() => {
+    const el = document.getElementById(id);
+    return el && el.textContent.trim() ? el : null;
+}, timeoutMs);
+
@@ -1,4 +1,10 @@
 cd ~/gh/docker-k8s/
+
+# warm the rsm-msba images on all nodes after changing INTEL_VERSION/GPU_VERSION
+# in start-pod.sh (no-op when the versions have not changed); prints the
+# per-node pull report at the end
+k8s/prepull.sh
+
 k8s/start-pod.sh
 k8s/start-pod.sh "-gpu"
 cat ~/.ssh/config
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Scale idle rsm-msba deployments to zero
+
+Each student deployment keeps its memory request reserved until someone
+deletes it by hand. This checks every running rsm-msba pod for signs of use:
+
+  ssh       established connections to sshd (port 22) inside the pod
+  cpu       container CPU use since the previous check above --cpu-threshold
+  postgres  client activity in pg_stat_activity since the previous check
+
+When none of these has been seen for --idle-minutes, the deployment is
+scaled to 0 replicas. The Service and the home directory stay, so
+start-pod.sh only has to scale it back to 1 on the next login, which is
+faster than deleting and recreating the deployment. The last activity and
+the CPU counter are kept as annotations on the Deployment, so the reaper
+itself is stateless and can run from cron on any node:
+
+    idle-reaper.py --once                    # e.g. */5 * * * * from cron
+    idle-reaper.py --interval 300 --idle-minutes 120
+    idle-reaper.py --once --dry-run          # report only
+
+KUBECTL overrides the kubectl command (default "microk8s kubectl").
+"""
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+APPS = ("rsm-msba", "rsm-msba-gpu")
+ANNOTATION = "rsm-msba"
+
+# one exec per pod: "<ssh sessions> <cpu seconds> <seconds since postgres activity>"
+PROBE = r"""
+ssh=$(cat /proc/net/tcp /proc/net/tcp6 2>/dev/null | awk '$4 == "01" && $2 ~ /:0016$/' | wc -l)
+if [ -f /sys/fs/cgroup/cpu.stat ]; then
+    cpu=$(awk '/^usage_usec/ {printf "%.1f", $2 / 1e6}' /sys/fs/cgroup/cpu.stat)
+else
+    cpu=$(awk '{printf "%.1f", $1 / 1e9}' /sys/fs/cgroup/cpuacct/cpuacct.usage 2>/dev/null)
+fi
+# no server answering means no database use; any other failure (auth, a
+# server still starting) fails the probe so the pod is left running
+pg_isready -q -h 127.0.0.1 -p 8765
+if [ $? -eq 2 ]; then
+    pg=-1
+else
+    pg=$(PGPASSWORD="${PGPASSWORD:-postgres}" psql -h 127.0.0.1 -p 8765 -U "${NB_USER:-jovyan}" -d postgres -XtAc "SELECT coalesce(round(extract(epoch FROM now() - max(greatest(state_change, xact_start)))), -1) FROM pg_stat_activity WHERE backend_type = 'client backend' AND pid <> pg_backend_pid()") || exit 1
+fi
+echo "$ssh ${cpu:--1} ${pg:--1}"
+"""
+
+
+def kubectl(*args, timeout=30):
+    cmd = shlex.split(os.getenv("KUBECTL", "microk8s kubectl")) + list(args)
+    return subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, check=True).stdout
+
+
+def parse_time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() if value else None
+
+
+def probe(pod_name):
+    """(ssh sessions, cpu seconds or None, seconds since postgres activity or None)"""
+    out = kubectl("exec", pod_name, "--", "sh", "-c", PROBE, timeout=20).split()
+    ssh, cpu, pg = int(out[0]), float(out[1]), float(out[2])
+    return ssh, cpu if cpu >= 0 else None, pg if pg >= 0 else None
+
+
+def activity(pod, annotations, now, cpu_threshold):
+    """(active reasons, new cpu counter) for one pod"""
+    ssh, cpu, pg_idle = probe(pod["metadata"]["name"])
+    reasons = []
+    if ssh:
+        reasons.append(f"{ssh} ssh session{'s' if ssh > 1 else ''}")
+    last_cpu = annotations.get(f"{ANNOTATION}/cpu-seconds")
+    last_check = annotations.get(f"{ANNOTATION}/checked")
+    if cpu is not None and last_cpu and last_check:
+        elapsed = now - float(last_check)
+        used = cpu - float(last_cpu)
+        # a lower counter means the container restarted since the last check
+        if elapsed > 0 and (used < 0 or used / elapsed >= cpu_threshold):
+            reasons.append(f"cpu {max(used, 0) / elapsed:.2f} cores")
+    if pg_idle is not None and last_check and pg_idle <= now - float(last_check):
+        reasons.append("postgres queries")
+    return reasons, cpu
+
+
+def check(args):
+    now = time.time()
+    deployments = json.loads(kubectl("get", "deployments", "-l", f"app in ({','.join(APPS)})", "-o", "json"))
+    pods = json.loads(kubectl("get", "pods", "-l", f"app in ({','.join(APPS)})", "-o", "json"))
+    pods_by_owner = {}
+    for pod in pods.get("items", []):
+        labels = pod["metadata"].get("labels", {})
+        if pod.get("status", {}).get("phase") == "Running" and not pod["metadata"].get("deletionTimestamp"):
+            pods_by_owner[(labels.get("app"), labels.get("user"))] = pod
+
+    for deployment in deployments.get("items", []):
+        name = deployment["metadata"]["name"]
+        labels = deployment["metadata"].get("labels", {})
+        annotations = deployment["metadata"].get("annotations", {})
+        if not deployment["spec"].get("replicas"):
+            continue
+        pod = pods_by_owner.get((labels.get("app"), labels.get("user")))
+        if pod is None:
+            continue
+
+        try:
+            reasons, cpu = activity(pod, annotations, now, args.cpu_threshold)
+        except (subprocess.SubprocessError, ValueError, IndexError) as e:
+            detail = (getattr(e, "stderr", None) or str(e)).strip()
+            print(f"idle-reaper: {name}: probe failed, leaving it running ({detail})", file=sys.stderr)
+            continue
+
+        started = parse_time(pod["status"].get("startTime")) or now
+        last_active = float(annotations.get(f"{ANNOTATION}/last-active", 0))
+        # a freshly started or resumed pod gets the full timeout
+        last_active = max(last_active, started)
+        if reasons:
+            last_active = now
+        idle_minutes = (now - last_active) / 60
+
+        if not reasons and idle_minutes >= args.idle_minutes:
+            print(f"idle-reaper: {name} idle for {idle_minutes:.0f} min, scaling to 0")
+            if not args.dry_run:
+                kubectl("scale", "deployment", name, "--replicas=0")
+                kubectl(
+                    "annotate",
+                    "deployment",
+                    name,
+                    "--overwrite",
+                    f"{ANNOTATION}/scaled-down={int(now)}",
+                    f"{ANNOTATION}/cpu-seconds-",
+                    f"{ANNOTATION}/checked-",
+                )
+            continue
+
+        state = ", ".join(reasons) if reasons else f"idle {idle_minutes:.0f} min"
+        print(f"idle-reaper: {name} {state}")
+        if not args.dry_run:
+            updates = [f"{ANNOTATION}/last-active={int(last_active)}", f"{ANNOTATION}/checked={int(now)}"]
+            if cpu is not None:
+                updates.append(f"{ANNOTATION}/cpu-seconds={cpu}")
+            kubectl("annotate", "deployment", name, "--overwrite", *updates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--idle-minutes",
+        type=float,
+        default=float(os.getenv("IDLE_MINUTES", "120")),
+        help="scale to zero after this long without activity",
+    )
+    parser.add_argument("--cpu-threshold", type=float, default=0.05, help="cores that count as activity")
+    parser.add_argument("--interval", type=float, default=300, help="seconds between checks")
+    parser.add_argument("--once", action="store_true", help="check once and exit (for cron)")
+    parser.add_argument("--dry-run", action="store_true", help="report without scaling or annotating")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            check(args)
+        except (subprocess.SubprocessError, OSError, ValueError) as e:
+            print(f"idle-reaper: check failed: {e}", file=sys.stderr)
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
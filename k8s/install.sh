@@ -50,10 +50,25 @@ sudo chmod -R 777 /opt/k8s/tmp
 sudo mkdir -p /opt/k8s/bin
 cd ~/gh/docker-k8s
 sudo cp k8s/start-pod.sh /opt/k8s/bin
+sudo cp k8s/pod-watch.py /opt/k8s/bin
+sudo cp k8s/pod-usage.py /opt/k8s/bin
+sudo cp k8s/idle-reaper.py /opt/k8s/bin
 sudo cp k8s/k8s-rsm-msba-config.yaml /opt/k8s/bin
 sudo cp k8s/k8s-rsm-msba-gpu-config.yaml /opt/k8s/bin
 sudo chmod -R 755 /opt/k8s/bin
 
+# per-user usage samples for right-sizing pod requests, collected every
+# minute on each node (run this on every node)
+sudo mkdir -p /opt/k8s/usage
+sudo chmod 755 /opt/k8s/usage
+echo "* * * * * root KUBECONFIG=/opt/k8s/microk8s/config python3 /opt/k8s/bin/pod-usage.py collect >/dev/null 2>&1" | sudo tee /etc/cron.d/rsm-msba-pod-usage
+python3 /opt/k8s/bin/pod-usage.py report
+
+# scale deployments without ssh, cpu or postgres activity for 2 hours to zero
+# (run this on one node only); start-pod.sh scales them back up on login
+echo "*/5 * * * * root KUBECONFIG=/opt/k8s/microk8s/config python3 /opt/k8s/bin/idle-reaper.py --once --idle-minutes 120 >> /var/log/rsm-msba-idle-reaper.log 2>&1" | sudo tee /etc/cron.d/rsm-msba-idle-reaper
+python3 /opt/k8s/bin/idle-reaper.py --once --dry-run
+
 # Create the microk8s-specific directory
 sudo mkdir -p /opt/k8s/microk8s
 sudo chown root:microk8s /opt/k8s/microk8s
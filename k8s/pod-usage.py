@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Measure per-user pod memory/CPU use and pick request tiers from it
+
+Every rsm-msba pod requests 16Gi whatever the student does, so the scheduler
+fits only a few pods per node even though most sessions use a fraction of
+that. The limits (64Gi, 2 CPUs) stay as they are so Spark jobs still have
+room; only the requests, which decide how many pods fit on a node, follow
+measured use.
+
+collect  runs on every node (cron, as root). It samples the cgroup of each
+         rsm-msba pod scheduled on that node: working set memory (usage
+         minus inactive page cache, as the kubelet counts it) and cumulative
+         CPU time. Samples go to <dir>/<user>/<YYYY-MM-DD>.jsonl.
+profile  is called by start-pod.sh. It takes the p95 over the last --days
+         of that user's samples, adds headroom, rounds up to a tier and
+         prints MEM_REQUEST=... and CPU_REQUEST=... for the shell. Users with
+         too little history get the defaults.
+
+    pod-usage.py collect                       # one sample, e.g. from cron every minute
+    pod-usage.py collect --interval 60         # keep sampling
+    pod-usage.py profile --user $USER --app rsm-msba --default-memory 16Gi
+    pod-usage.py report                        # p50/p95/max per user
+
+KUBECTL overrides the kubectl command (default "microk8s kubectl").
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+USAGE_DIR = os.getenv("POD_USAGE_DIR", "/opt/k8s/usage")
+APPS = ("rsm-msba", "rsm-msba-gpu")
+
+GI = 1024**3
+# request tiers; the limits in the deployment yaml stay at 64Gi / 2 CPUs
+MEMORY_TIERS = [2 * GI, 4 * GI, 8 * GI, 12 * GI, 16 * GI, 24 * GI, 32 * GI]
+CPU_TIERS = [0.25, 0.5, 1.0, 2.0]
+
+
+def kubectl_command():
+    return shlex.split(os.getenv("KUBECTL", "microk8s kubectl"))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def parse_quantity(text):
+    """Kubernetes quantity '16Gi', '512Mi', '500m', '2' -> bytes or cores"""
+    text = str(text).strip()
+    units = {"Ki": 1024, "Mi": 1024**2, "Gi": GI, "Ti": 1024**4, "K": 1e3, "M": 1e6, "G": 1e9, "m": 1e-3}
+    for suffix in sorted(units, key=len, reverse=True):
+        if text.endswith(suffix):
+            return float(text[: -len(suffix)]) * units[suffix]
+    return float(text)
+
+
+def format_memory(value):
+    return f"{int(value // GI)}Gi" if value % GI == 0 else f"{int(math.ceil(value / 1024**2))}Mi"
+
+
+def format_cpu(value):
+    return str(int(value)) if value == int(value) else f"{int(value * 1000)}m"
+
+
+# ---------------------------------------------------------------------------
+# collect
+# ---------------------------------------------------------------------------
+
+
+def read_int(path):
+    try:
+        with open(path) as f:
+            return int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def read_stat(path):
+    stats = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(" ")
+                stats[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return stats
+
+
+def pod_cgroups():
+    """{pod uid: cgroup dir} for all pods on this node (v2 systemd/cgroupfs, v1)
+
+    The systemd driver names the slice kubepods-burstable-pod<uid>.slice with
+    underscores in the uid, cgroupfs uses kubepods/burstable/pod<uid>.
+    """
+    found = {}
+    patterns = [
+        "/sys/fs/cgroup/kubepods.slice/kubepods-*pod*.slice",
+        "/sys/fs/cgroup/kubepods.slice/*/kubepods-*pod*.slice",
+        "/sys/fs/cgroup/kubepods/pod*",
+        "/sys/fs/cgroup/kubepods/*/pod*",
+        "/sys/fs/cgroup/memory/kubepods/pod*",
+        "/sys/fs/cgroup/memory/kubepods/*/pod*",
+        "/sys/fs/cgroup/memory/kubepods.slice/*/kubepods-*pod*.slice",
+    ]
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            name = os.path.basename(path).removesuffix(".slice")
+            uid = name.rsplit("pod", 1)[1].replace("_", "-")
+            found.setdefault(uid, path)
+    return found
+
+
+def sample_cgroup(path):
+    """(working set bytes, cpu seconds) from a v2 or v1 pod cgroup"""
+    current = read_int(os.path.join(path, "memory.current"))
+    if current is not None:
+        memory = current - read_stat(os.path.join(path, "memory.stat")).get("inactive_file", 0)
+        cpu_usec = read_stat(os.path.join(path, "cpu.stat")).get("usage_usec")
+        return max(0, memory), cpu_usec / 1e6 if cpu_usec is not None else None
+    usage = read_int(os.path.join(path, "memory.usage_in_bytes"))
+    if usage is None:
+        return None, None
+    memory = usage - read_stat(os.path.join(path, "memory.stat")).get("total_inactive_file", 0)
+    cpu_ns = read_int(path.replace("/memory/", "/cpu,cpuacct/") + "/cpuacct.usage")
+    if cpu_ns is None:
+        cpu_ns = read_int(path.replace("/memory/", "/cpuacct/") + "/cpuacct.usage")
+    return max(0, memory), cpu_ns / 1e9 if cpu_ns is not None else None
+
+
+def local_pods(node):
+    cmd = kubectl_command() + ["get", "pods", "-l", f"app in ({','.join(APPS)})", "-o", "json"]
+    if node:
+        cmd += ["--field-selector", f"spec.nodeName={node}"]
+    out = subprocess.run(cmd, capture_output=True, text=True, timeout=30, check=True).stdout
+    return json.loads(out).get("items", [])
+
+
+def collect_once(usage_dir, node, retention_days):
+    cgroups = pod_cgroups()
+    now = time.time()
+    day = time.strftime("%Y-%m-%d", time.localtime(now))
+    written = 0
+    for pod in local_pods(node):
+        uid = pod["metadata"]["uid"]
+        user = pod["metadata"].get("labels", {}).get("user")
+        if not user or uid not in cgroups:
+            continue
+        memory, cpu = sample_cgroup(cgroups[uid])
+        if memory is None:
+            continue
+        record = {
+            "t": round(now),
+            "pod": uid,
+            "app": pod["metadata"]["labels"].get("app"),
+            "mem": memory,
+            "cpu_s": round(cpu, 3) if cpu is not None else None,
+        }
+        user_dir = os.path.join(usage_dir, user)
+        os.makedirs(user_dir, mode=0o755, exist_ok=True)
+        with open(os.path.join(user_dir, f"{day}.jsonl"), "a") as f:
+            f.write(json.dumps(record) + "\n")
+        written += 1
+
+    # drop day files past the retention period
+    cutoff = time.strftime("%Y-%m-%d", time.localtime(now - retention_days * 86400))
+    for path in glob.glob(os.path.join(usage_dir, "*", "*.jsonl")):
+        if os.path.basename(path)[:10] < cutoff:
+            os.remove(path)
+    return written
+
+
+# ---------------------------------------------------------------------------
+# profile
+# ---------------------------------------------------------------------------
+
+
+def load_samples(usage_dir, user, app, days):
+    cutoff = time.time() - days * 86400
+    samples = []
+    for path in sorted(glob.glob(os.path.join(usage_dir, user, "*.jsonl")))[-(days + 1) :]:
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record["t"] >= cutoff and (app is None or record.get("app") == app):
+                    samples.append(record)
+    return samples
+
+
+def cpu_rates(samples):
+    """Cores used between consecutive samples of the same pod"""
+    rates = []
+    last = {}
+    for record in sorted(samples, key=lambda r: r["t"]):
+        previous = last.get(record["pod"])
+        if previous and record.get("cpu_s") is not None and previous.get("cpu_s") is not None:
+            elapsed = record["t"] - previous["t"]
+            if elapsed > 0 and record["cpu_s"] >= previous["cpu_s"]:
+                rates.append((record["cpu_s"] - previous["cpu_s"]) / elapsed)
+        last[record["pod"]] = record
+    return rates
+
+
+def pick_tier(value, tiers, ceiling):
+    for tier in tiers:
+        if tier >= value:
+            return min(tier, ceiling)
+    return ceiling
+
+
+def profile(samples, default_memory, default_cpu, headroom, min_samples, pct):
+    """(memory request, cpu request, reason)"""
+    if len(samples) < min_samples:
+        return default_memory, default_cpu, f"{len(samples)} samples (< {min_samples}), using defaults"
+    memory = percentile([r["mem"] for r in samples], pct)
+    memory_request = pick_tier(memory * headroom, MEMORY_TIERS, default_memory)
+    rates = cpu_rates(samples)
+    cpu = percentile(rates, pct) if rates else default_cpu
+    cpu_request = pick_tier(cpu * headroom, CPU_TIERS, default_cpu)
+    reason = (
+        f"{len(samples)} samples, p{pct:g} memory {memory / GI:.1f}Gi, "
+        f"p{pct:g} cpu {cpu:.2f} cores, x{headroom:g} headroom"
+    )
+    return memory_request, cpu_request, reason
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dir", default=USAGE_DIR, help="usage sample directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    collect = sub.add_parser("collect", help="sample the rsm-msba pods on this node")
+    collect.add_argument("--node", default=os.getenv("NODE_NAME", socket.gethostname()))
+    collect.add_argument("--all-nodes", action="store_true", help="do not filter pods by node name")
+    collect.add_argument("--interval", type=float, default=0, help="seconds between samples, 0 = once")
+    collect.add_argument("--retention-days", type=int, default=30)
+
+    prof = sub.add_parser("profile", help="print MEM_REQUEST/CPU_REQUEST for a user")
+    prof.add_argument("--user", default=os.getenv("USER"))
+    prof.add_argument("--app", default="rsm-msba")
+    prof.add_argument("--days", type=int, default=14, help="history window")
+    prof.add_argument("--percentile", type=float, default=95)
+    prof.add_argument("--headroom", type=float, default=1.25, help="multiplier on the percentile")
+    prof.add_argument("--min-samples", type=int, default=120, help="below this, use the defaults")
+    prof.add_argument("--default-memory", default="16Gi")
+    prof.add_argument("--default-cpu", default="1")
+
+    report = sub.add_parser("report", help="usage per user")
+    report.add_argument("--days", type=int, default=14)
+    args = parser.parse_args()
+
+    if args.command == "collect":
+        node = None if args.all_nodes else args.node
+        while True:
+            try:
+                written = collect_once(args.dir, node, args.retention_days)
+            except (subprocess.SubprocessError, OSError, ValueError) as e:
+                print(f"pod-usage: collect failed: {e}", file=sys.stderr)
+                written = 0
+            if not args.interval:
+                print(f"pod-usage: sampled {written} pods")
+                return
+            time.sleep(args.interval)
+
+    if args.command == "profile":
+        default_memory = parse_quantity(args.default_memory)
+        default_cpu = parse_quantity(args.default_cpu)
+        try:
+            samples = load_samples(args.dir, args.user, args.app, args.days)
+        except OSError:
+            samples = []
+        memory, cpu, reason = profile(
+            samples, default_memory, default_cpu, args.headroom, args.min_samples, args.percentile
+        )
+        # stdout is eval'd by start-pod.sh; the reasoning goes to stderr
+        print(f"pod-usage: {args.user} {args.app}: {reason}", file=sys.stderr)
+        print(f"MEM_REQUEST={format_memory(memory)}")
+        print(f"CPU_REQUEST={format_cpu(cpu)}")
+        return
+
+    print(f"{'user':<16} {'app':<14} {'samples':>8} {'mem p50':>8} {'mem p95':>8} {'mem max':>8} {'cpu p95':>8}")
+    for user_dir in sorted(glob.glob(os.path.join(args.dir, "*"))):
+        user = os.path.basename(user_dir)
+        for app in APPS:
+            samples = load_samples(args.dir, user, app, args.days)
+            if not samples:
+                continue
+            memory = [r["mem"] / GI for r in samples]
+            rates = cpu_rates(samples)
+            cpu = f"{percentile(rates, 95):>8.2f}" if rates else f"{'-':>8}"
+            print(
+                f"{user:<16} {app:<14} {len(samples):>8} {percentile(memory, 50):>7.1f}G "
+                f"{percentile(memory, 95):>7.1f}G {max(memory):>7.1f}G {cpu}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Wait for a pod to become Ready using a single kubectl watch
+
+start-pod.sh used to poll `kubectl get pods` once a second, which starts a
+new kubectl process and runs a full API list on every iteration. With 80
+students starting pods at the start of a lab, that adds up on the API server.
+This runs one `kubectl get pods --watch` for the label selector. It prints
+each phase transition as it arrives and exits as soon as a pod is Ready,
+when the timeout expires, or when the pod hits a state it will not recover
+from without help (bad image, crash loop).
+
+At the end it reports per-phase latency from the pod's own timestamps:
+
+  scheduling       created -> PodScheduled
+  image pull       Pulling -> Pulled event (0 when the image was cached)
+  container start  PodScheduled -> container running
+  readiness        container running -> Ready
+
+    pod-watch.py -l user=$USER,app=rsm-msba --timeout 600
+    pod-watch.py -l user=$USER,app=rsm-msba --report /opt/k8s/tmp/pod-start-times.jsonl
+
+Exit codes: 0 ready, 1 timeout, 2 pod failed, 3 kubectl error.
+KUBECTL overrides the kubectl command (default "microk8s kubectl").
+"""
+
+import argparse
+import codecs
+import json
+import os
+import re
+import selectors
+import shlex
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# waiting reasons that will not resolve by waiting longer
+FAILURE_REASONS = {
+    "ErrImagePull",
+    "ImagePullBackOff",
+    "InvalidImageName",
+    "CrashLoopBackOff",
+    "CreateContainerConfigError",
+    "CreateContainerError",
+    "RunContainerError",
+}
+
+
+def kubectl_command():
+    return shlex.split(os.getenv("KUBECTL", "microk8s kubectl"))
+
+
+def parse_time(value):
+    """Kubernetes RFC 3339 timestamp -> epoch seconds"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def parse_duration(text):
+    """Go duration as in 'pulled image in 1m2.5s' -> seconds"""
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001, "µs": 1e-6, "us": 1e-6}
+    parts = re.findall(r"([\d.]+)(ms|µs|us|h|m|s)", text)
+    return sum(float(number) * units[unit] for number, unit in parts) if parts else None
+
+
+def condition_time(pod, kind):
+    for condition in pod.get("status", {}).get("conditions") or []:
+        if condition.get("type") == kind and condition.get("status") == "True":
+            return parse_time(condition.get("lastTransitionTime"))
+    return None
+
+
+def describe(pod):
+    """Short state such as 'Pending/ContainerCreating' or 'Running/Ready'"""
+    status = pod.get("status", {})
+    if pod["metadata"].get("deletionTimestamp"):
+        return "Terminating", None
+    for container in status.get("containerStatuses") or []:
+        waiting = container.get("state", {}).get("waiting")
+        if waiting:
+            return f"{status.get('phase')}/{waiting.get('reason')}", waiting.get("reason")
+        terminated = container.get("state", {}).get("terminated")
+        if terminated:
+            return f"{status.get('phase')}/{terminated.get('reason')}", terminated.get("reason")
+    if condition_time(pod, "Ready"):
+        return f"{status.get('phase')}/Ready", None
+    if status.get("phase") == "Pending" and not condition_time(pod, "PodScheduled"):
+        for condition in status.get("conditions") or []:
+            if condition.get("type") == "PodScheduled" and condition.get("reason"):
+                return f"Pending/{condition['reason']}", None
+        return "Pending/Scheduling", None
+    return status.get("phase", "Unknown"), None
+
+
+def image_pull_seconds(pod_name, namespace):
+    """Image pull time from the kubelet's Pulling/Pulled events, one API call"""
+    cmd = kubectl_command() + [
+        "get",
+        "events",
+        "-o",
+        "json",
+        "--field-selector",
+        f"involvedObject.kind=Pod,involvedObject.name={pod_name}",
+    ]
+    if namespace:
+        cmd += ["-n", namespace]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=10, check=True).stdout
+        events = json.loads(out).get("items", [])
+    except (subprocess.SubprocessError, OSError, ValueError):
+        return None
+    for event in events:
+        if event.get("reason") != "Pulled":
+            continue
+        message = event.get("message", "")
+        if "already present" in message:
+            return 0.0
+        match = re.search(r" in ([\dhmsµu.]+)", message)
+        if match:
+            return parse_duration(match.group(1))
+    return None
+
+
+def phase_latencies(pod, pull_seconds):
+    created = parse_time(pod["metadata"].get("creationTimestamp"))
+    scheduled = condition_time(pod, "PodScheduled")
+    ready = condition_time(pod, "Ready")
+    started = None
+    for container in pod.get("status", {}).get("containerStatuses") or []:
+        running = container.get("state", {}).get("running") or {}
+        started = max(filter(None, [started, parse_time(running.get("startedAt"))]), default=None)
+
+    def span(start, end):
+        return round(end - start, 1) if start is not None and end is not None else None
+
+    return {
+        "scheduling": span(created, scheduled),
+        "image_pull": round(pull_seconds, 1) if pull_seconds is not None else None,
+        "container_start": span(scheduled, started),
+        "readiness": span(started, ready),
+        "total": span(created, ready),
+    }
+
+
+def iter_events(selector, namespace, deadline):
+    """Yield (event type, pod) from `kubectl get pods --watch` until the deadline
+
+    kubectl writes a stream of JSON documents; a watch that ends early (API
+    server timeout, connection reset) is restarted with a fresh list.
+    """
+    cmd = kubectl_command() + ["get", "pods", "-l", selector, "--watch", "--output-watch-events", "-o", "json"]
+    if namespace:
+        cmd += ["-n", namespace]
+    decoder = json.JSONDecoder()
+    while time.time() < deadline:
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise RuntimeError(f"cannot run {cmd[0]}: {e}")
+        sel = selectors.DefaultSelector()
+        sel.register(proc.stdout, selectors.EVENT_READ)
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+        buffer = ""
+        try:
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not sel.select(timeout=remaining):
+                    return
+                chunk = os.read(proc.stdout.fileno(), 65536)
+                if not chunk:
+                    break
+                buffer += utf8.decode(chunk)
+                while buffer:
+                    buffer = buffer.lstrip()
+                    try:
+                        event, end = decoder.raw_decode(buffer)
+                    except ValueError:
+                        break
+                    buffer = buffer[end:]
+                    yield event.get("type", "ADDED"), event.get("object", event)
+        finally:
+            sel.close()
+            proc.kill()
+            stderr = proc.communicate()[1].decode().strip()
+        if proc.returncode not in (0, -9) and stderr:
+            raise RuntimeError(stderr.splitlines()[-1])
+        time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-l", "--selector", required=True, help="label selector, e.g. user=$USER,app=rsm-msba")
+    parser.add_argument("-n", "--namespace")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for Ready")
+    parser.add_argument("--report", help="append the phase latencies as a JSON line to this file")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args()
+
+    start = time.time()
+    deadline = start + args.timeout
+    states = {}
+    ready_pod = None
+    failure = None
+    try:
+        for kind, pod in iter_events(args.selector, args.namespace, deadline):
+            name = pod["metadata"]["name"]
+            if kind == "DELETED":
+                states.pop(name, None)
+                continue
+            state, reason = describe(pod)
+            if states.get(name) != state:
+                states[name] = state
+                if not args.quiet:
+                    print(f"pod-watch: {name} {state} (+{time.time() - start:.1f}s)", flush=True)
+            if state == "Terminating":
+                continue
+            if reason in FAILURE_REASONS:
+                failure = (name, state)
+                break
+            if condition_time(pod, "Ready"):
+                ready_pod = pod
+                break
+    except RuntimeError as e:
+        print(f"pod-watch: kubectl failed: {e}", file=sys.stderr)
+        sys.exit(3)
+
+    if failure:
+        print(f"pod-watch: {failure[0]} is in {failure[1]}, giving up", file=sys.stderr)
+        sys.exit(2)
+    if ready_pod is None:
+        current = ", ".join(f"{name} {state}" for name, state in states.items()) or "no pods"
+        print(f"pod-watch: timed out after {args.timeout:g}s ({current})", file=sys.stderr)
+        sys.exit(1)
+
+    name = ready_pod["metadata"]["name"]
+    latencies = phase_latencies(ready_pod, image_pull_seconds(name, args.namespace))
+    summary = ", ".join(
+        f"{phase.replace('_', ' ')} {value:.1f}s" if value is not None else f"{phase.replace('_', ' ')} -"
+        for phase, value in latencies.items()
+    )
+    print(f"pod-watch: {name} ready after {time.time() - start:.1f}s waiting ({summary})")
+    if args.report:
+        record = {"pod": name, "selector": args.selector, "time": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+        record.update(waited=round(time.time() - start, 1), **latencies)
+        try:
+            with open(args.report, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"pod-watch: cannot write {args.report}: {e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/bin/bash
+# Warm the rsm-msba images on all nodes before students start pods
+#
+# Applies the pre-pull DaemonSets for the INTEL_VERSION/GPU_VERSION in
+# start-pod.sh, waits for every node to finish pulling and reports pull time
+# and image size per node. Nothing is applied when the versions match the
+# last run (use --force to re-apply anyway).
+#
+#   k8s/prepull.sh
+#   k8s/prepull.sh --force
+#   k8s/prepull.sh --report    # only print the per-node report
+
+cd "$(dirname "$0")"
+
+KUBECTL=${KUBECTL:-"microk8s kubectl"}
+PREPULL_TIMEOUT=${PREPULL_TIMEOUT:-1800}
+STAMP=${PREPULL_STAMP:-/opt/k8s/tmp/prepull-versions}
+
+# same versions as the student pods, unless set in the environment
+eval "$(grep -E '^export (INTEL|GPU)_VERSION=' start-pod.sh | sed 's/^export \([A-Z_]*\)=/export \1=${\1:-/; s/$/}/')"
+VERSIONS="intel=${INTEL_VERSION} gpu=${GPU_VERSION}"
+
+report() {
+    echo -e "\nPre-pulled images per node:"
+    printf "%-20s %-40s %10s %10s\n" "NODE" "IMAGE" "PULL" "SIZE"
+    local pods events nodes
+    pods=$($KUBECTL get pods -l 'app in (rsm-msba-prepull,rsm-msba-gpu-prepull)' -o json)
+    events=$($KUBECTL get events --field-selector reason=Pulled -o json)
+    nodes=$($KUBECTL get nodes -o json)
+    jq -r -n --argjson pods "$pods" --argjson events "$events" --argjson nodes "$nodes" '
+        $pods.items[] as $pod
+        | $pod.spec.initContainers[]
+        | .image as $image
+        | $pod.spec.nodeName as $node
+        | ([$events.items[]
+            | select(.involvedObject.name == $pod.metadata.name)
+            | select(.message | contains($image))
+            | if (.message | contains("already present")) then "cached"
+              else (.message | capture(" in (?<d>[0-9hmsµu.]+)").d // "?") end] | last // "-") as $pull
+        | ([$nodes.items[] | select(.metadata.name == $node) | .status.images[]?
+            | select(.names | any(endswith($image)))
+            | .sizeBytes] | first) as $size
+        | [$node, $image, $pull,
+           (if $size then "\(($size / 1073741824 * 10 | round) / 10)GB" else "-" end)]
+        | @tsv' | while IFS=$'\t' read -r node image pull size; do
+            printf "%-20s %-40s %10s %10s\n" "$node" "$image" "$pull" "$size"
+        done
+}
+
+if [ "$1" = "--report" ]; then
+    report
+    exit 0
+fi
+
+if [ "$1" != "--force" ] && [ "$(cat "$STAMP" 2>/dev/null)" = "$VERSIONS" ]; then
+    echo "Images for $VERSIONS already pre-pulled (--force to re-apply)"
+    report
+    exit 0
+fi
+
+echo "Pre-pulling rsm-msba images ($VERSIONS) on all nodes..."
+START=$(date +%s)
+envsubst '${INTEL_VERSION} ${GPU_VERSION}' < k8s-rsm-msba-prepull.yaml | $KUBECTL apply -f - || exit 1
+
+STATUS=0
+for ds in rsm-msba-prepull rsm-msba-gpu-prepull; do
+    $KUBECTL rollout status daemonset/$ds --timeout=${PREPULL_TIMEOUT}s || STATUS=1
+done
+echo "Pre-pull finished in $(($(date +%s) - START))s"
+
+if [ $STATUS -eq 0 ]; then
+    echo "$VERSIONS" > "$STAMP" 2>/dev/null || true
+else
+    echo "Not all nodes finished pulling, check: $KUBECTL get pods -l app=rsm-msba-prepull -o wide"
+fi
+report
+exit $STATUS
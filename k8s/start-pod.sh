@@ -22,6 +22,19 @@ calculate_port() {
 # Calculate the fixed port for this user
 export NODE_PORT=$(calculate_port "${USER}-${APP}")
 
+# Wait for the pod to become Ready with a single kubectl watch instead of
+# polling the API server every second; prints phase transitions and the
+# scheduling / image pull / container start / readiness latencies
+POD_WATCH_TIMEOUT=${POD_WATCH_TIMEOUT:-600}
+wait_for_pod() {
+    if command -v python3 >/dev/null 2>&1 && [ -f /opt/k8s/bin/pod-watch.py ]; then
+        python3 /opt/k8s/bin/pod-watch.py -l user=$USER,app=$APP --timeout $POD_WATCH_TIMEOUT \
+            --report /opt/k8s/tmp/pod-start-times.jsonl
+    else
+        microk8s kubectl wait pod -l user=$USER,app=$APP --for=condition=Ready --timeout=${POD_WATCH_TIMEOUT}s
+    fi
+}
+
 # Function to get pod status
 check_pod_status() {
     local POD_TYPE=$1  # Accept pod type as parameter (e.g., "rsm-msba-gpu" or "rsm-msba")
@@ -33,22 +46,38 @@ check_pod_status() {
 
 # Check if pod already exists and is running
 POD_STATUS=$(check_pod_status "$APP")
-if [ "$POD_STATUS" = "Running" ]; then
+if [ -z "$POD_STATUS" ] && \
+    [ "$(microk8s kubectl get deployment ${APP}-$USER -o jsonpath='{.spec.replicas}' 2>/dev/null)" = "0" ]; then
+    # scaled to zero by idle-reaper.py; the Service is still there, so only
+    # the pod needs to come back
+    echo "Resuming idle pod for user $USER..."
+    microk8s kubectl scale deployment ${APP}-$USER --replicas=1
+    wait_for_pod || exit $?
+elif [ "$POD_STATUS" = "Running" ]; then
     echo "Pod already running for user $USER"
-elif [ "$POD_STATUS" = "ContainerCreating" ]; then
+elif [ "$POD_STATUS" = "Pending" ] || [ "$POD_STATUS" = "ContainerCreating" ]; then
     echo "Pod is being created for user $USER. This could take a few minutes"
-    while [[ $(microk8s kubectl get pods -l user=$USER,app=$APP -o 'jsonpath={..status.conditions[?(@.type=="Ready")].status}') != "True" ]]; do 
-        echo "Waiting for pod creation to complete ..." && sleep 1;
-    done
+    wait_for_pod || exit $?
 else
     # If pod exists but is not running, delete it
     if [ ! -z "$POD_STATUS" ]; then
         echo "Cleaning up existing pod in $POD_STATUS state..."
         microk8s kubectl delete deployment ${APP}-$USER
         microk8s kubectl delete svc ${APP}-ssh-$USER
-        sleep 5
+        microk8s kubectl wait pod -l user=$USER,app=$APP --for=delete --timeout=60s >/dev/null 2>&1 || true
     fi
 
+    # Size the requests from this user's measured usage (limits stay at
+    # 64Gi / 2 CPUs); without enough history the defaults below are used
+    export MEM_REQUEST="16Gi"
+    [ "$CALC" = "-gpu" ] && export MEM_REQUEST="32Gi"
+    export CPU_REQUEST="1"
+    if command -v python3 >/dev/null 2>&1 && [ -f /opt/k8s/bin/pod-usage.py ]; then
+        eval "$(python3 /opt/k8s/bin/pod-usage.py profile --user $USER --app $APP \
+            --default-memory $MEM_REQUEST --default-cpu $CPU_REQUEST)"
+    fi
+    echo "Requesting $MEM_REQUEST memory and $CPU_REQUEST CPU for $APP"
+
     # Create temporary yaml with substituted values
     touch "/opt/k8s/tmp/$USER-k8s-$APP-config.yaml"
     envsubst < /opt/k8s/bin/k8s-$APP-config.yaml > "/opt/k8s/tmp/$USER-k8s-$APP-config.yaml"
@@ -58,10 +87,13 @@ else
 
     # Wait for pod to be ready
     echo "Waiting for pod ..."
-    while [[ $(microk8s kubectl get pods -l user=$USER,app=$APP -o 'jsonpath={..status.conditions[?(@.type=="Ready")].status}') != "True" ]]; do 
-        echo "Waiting for pod ..." && sleep 1;
-    done
+    wait_for_pod
+    POD_READY=$?
     rm "/opt/k8s/tmp/$USER-k8s-$APP-config.yaml"
+    if [ $POD_READY -ne 0 ]; then
+        echo "Pod did not become ready, check: microk8s kubectl describe pods -l user=$USER,app=$APP"
+        exit $POD_READY
+    fi
 fi
 
 # Get pod name and service details